@@ -0,0 +1,91 @@
+"""
+Vyhodnocování odpovědí v kvízech.
+
+AnswerMatcher se sestaví jednou pro otázku (normalizované správné odpovědi
+a aliasy), každá zpráva z chatu se pak jen normalizuje jedním str.translate
+a porovná: přesná shoda, odpověď obsažená ve zprávě jako celá slova, nebo
+překlep v mezích omezené editační vzdálenosti.
+"""
+
+import string
+
+# Diakritika -> ASCII, interpunkce -> mezera (vstup se nejdřív převede na malá písmena)
+_DIACRITICS = str.maketrans(
+    "áäčďéěëíľĺňóöôřŕšťúůüýžæ",
+    "aacdeeeillnooorrstuuuyza",
+)
+_PUNCTUATION = str.maketrans({char: " " for char in string.punctuation + "–„“”’"})
+_TRANSLATION = {**_DIACRITICS, **_PUNCTUATION}
+
+MIN_FUZZY_LENGTH = 6      # kratší odpovědi se musí shodovat přesně (jinak projdou běžná slova: klub/kluk -> Klus)
+MIN_CONTAINED_LENGTH = 4  # kratší odpovědi se nehledají uvnitř delší zprávy
+
+
+def normalize_answer(text: str) -> str:
+    """Normalize text for comparison - lowercase, no accents/punctuation, single spaces"""
+    return " ".join(text.lower().translate(_TRANSLATION).split())
+
+
+def allowed_typos(length: int) -> int:
+    """Kolik překlepů tolerovat u odpovědi dané délky"""
+    if length < MIN_FUZZY_LENGTH:
+        return 0
+    if length < 10:
+        return 1
+    return 2
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """Levenshteinova vzdálenost, nebo limit + 1 jakmile je jisté, že limit překročí"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, char_b in enumerate(b, 1):
+            value = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+            current.append(value)
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+class AnswerMatcher:
+    """Předpočítané správné odpovědi jedné otázky"""
+
+    def __init__(self, answers):
+        normalized = []
+        for answer in answers:
+            answer = normalize_answer(answer)
+            if answer and answer not in normalized:
+                normalized.append(answer)
+        self.answers = frozenset(normalized)
+        # (odpověď, povolené překlepy) jen pro odpovědi, u kterých fuzzy dává smysl
+        self._fuzzy = [(answer, allowed_typos(len(answer))) for answer in normalized if len(answer) >= MIN_FUZZY_LENGTH]
+        self._contained = [f" {answer} " for answer in normalized if len(answer) >= MIN_CONTAINED_LENGTH]
+
+    def matches(self, text: str) -> bool:
+        """Je zpráva správnou odpovědí?"""
+        guess = normalize_answer(text)
+        if not guess:
+            return False
+        if guess in self.answers:
+            return True
+
+        padded = f" {guess} "
+        for answer in self._contained:
+            if answer in padded:
+                return True
+
+        for answer, limit in self._fuzzy:
+            if limit and bounded_distance(guess, answer, limit) <= limit:
+                return True
+        return False
@@ -0,0 +1,187 @@
+"""
+Správa MongoDB indexů pro Valhalla Bot a dashboard API.
+
+Spouští se při startu bota (on_ready) i FastAPI serveru (startup event).
+create_index je idempotentní - existující indexy se přeskočí, chybějící se
+vytvoří a zaloguje se, co chybělo nebo se právě staví. Index se stejnými klíči,
+ale jinými volbami (unique, expireAfterSeconds), se odstraní a vytvoří znovu.
+"""
+
+import logging
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+GAME_SESSION_TTL = 24 * 3600  # sekundy
+
+# {kolekce: [(klíče, volby)]}
+REQUIRED_INDEXES = {
+    "game_users": [
+        ([("guild_id", ASCENDING), ("user_id", ASCENDING)], {"unique": True, "name": "guild_user"}),
+        ([("guild_id", ASCENDING), ("xp", DESCENDING)], {"name": "guild_xp"}),  # /top, !top
+        ([("xp", DESCENDING)], {"name": "xp"}),  # /api/leaderboard
+        ([("user_id", ASCENDING)], {"name": "user_id"}),  # /api/player/{user_id}
+    ],
+    "reaction_roles": [
+        ([("message_id", ASCENDING)], {"unique": True, "name": "message_id"}),
+        ([("guild_id", ASCENDING)], {"name": "guild_id"}),
+    ],
+    "game_sessions": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_id"}),
+        # Pojistka: session, kterou bot GAME_SESSION_TTL neobnovil (last_seen), je osiřelá
+        ([("last_seen", ASCENDING)], {"expireAfterSeconds": GAME_SESSION_TTL, "name": "last_seen_ttl"}),
+    ],
+    "guild_bot_settings": [
+        ([("guild_id", ASCENDING)], {"unique": True, "name": "guild_id"}),
+        ([("guild_id", ASCENDING), ("version", ASCENDING)], {"name": "guild_version"}),  # refresh nastavení v botovi
+    ],
+    "guild_settings": [
+        ([("guild_id", ASCENDING)], {"unique": True, "name": "guild_id"}),
+    ],
+    "user_sessions": [
+        ([("session_token", ASCENDING)], {"unique": True, "name": "session_token"}),
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0, "name": "expires_at_ttl"}),  # expires_at musí být BSON datum
+    ],
+    "dashboard_users": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_id"}),
+        ([("email", ASCENDING)], {"unique": True, "name": "email"}),
+    ],
+    "server_stats": [
+        ([("guild_id", ASCENDING)], {"unique": True, "name": "guild_id"}),
+    ],
+    "daily_user_stats": [
+        ([("guild_id", ASCENDING), ("day", ASCENDING), ("user_id", ASCENDING)], {"unique": True, "name": "guild_day_user"}),
+    ],
+    "server_daily_stats": [
+        ([("guild_id", ASCENDING), ("day", ASCENDING)], {"unique": True, "name": "guild_day"}),
+    ],
+    "voice_sessions": [
+        ([("user_id", ASCENDING)], {"unique": True, "name": "user_id"}),
+    ],
+    "giveaways": [
+        ([("giveaway_id", ASCENDING)], {"unique": True, "name": "giveaway_id"}),
+        ([("ended", ASCENDING)], {"name": "ended"}),  # obnova po restartu
+        ([("message_id", ASCENDING)], {"name": "message_id"}),  # /greroll
+    ],
+    "giveaway_entries": [
+        ([("giveaway_id", ASCENDING), ("user_id", ASCENDING)], {"unique": True, "name": "giveaway_user"}),
+    ],
+    "polls": [
+        ([("poll_id", ASCENDING)], {"unique": True, "name": "poll_id"}),
+        ([("ended", ASCENDING)], {"name": "ended"}),
+    ],
+    "poll_votes": [
+        ([("poll_id", ASCENDING), ("user_id", ASCENDING)], {"unique": True, "name": "poll_user"}),
+    ],
+    "bot_guilds": [
+        ([("id", ASCENDING)], {"unique": True, "name": "id"}),
+    ],
+    "xp_ledger": [
+        ([("user_id", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)], {"name": "user_ts_id"}),  # /api/player/{user_id}/history
+        ([("ts", ASCENDING)], {"name": "ts"}),  # kompaktování
+    ],
+    "xp_daily_summary": [
+        ([("guild_id", ASCENDING), ("user_id", ASCENDING), ("day", ASCENDING)], {"unique": True, "name": "guild_user_day"}),
+        ([("user_id", ASCENDING), ("day", DESCENDING)], {"name": "user_day"}),
+    ],
+    "quiz_history": [
+        ([("user_id", ASCENDING), ("date", DESCENDING)], {"name": "user_date"}),
+    ],
+    "command_logs": [
+        ([("timestamp", DESCENDING)], {"name": "timestamp"}),
+    ],
+}
+
+
+# Indexy, které se mají odstranit {kolekce: [název]}
+OBSOLETE_INDEXES = {
+    "game_sessions": ["start_ttl"],  # TTL podle začátku mazal sessions hrající déle než den
+    "xp_ledger": ["user_ts"],  # historie stránkuje podle (ts, _id), nahrazen user_ts_id
+}
+
+
+# Volby, ve kterých se existující index musí shodovat s požadovaným
+COMPARED_OPTIONS = {"unique": False, "expireAfterSeconds": None}
+
+
+def _options_differ(info: dict, options: dict) -> list:
+    """Vrať volby, ve kterých se existující index liší od požadovaného"""
+    return [
+        option for option, default in COMPARED_OPTIONS.items()
+        if info.get(option, default) != options.get(option, default)
+    ]
+
+
+async def _log_index_builds(db):
+    """Zaloguj indexy, které se právě staví (vyžaduje oprávnění pro currentOp)"""
+    try:
+        result = await db.client.admin.command({
+            "currentOp": 1,
+            "$or": [{"command.createIndexes": {"$exists": True}}, {"msg": {"$regex": "^Index Build"}}]
+        })
+    except Exception:
+        return
+    for op in result.get("inprog", []):
+        collection = op.get("command", {}).get("createIndexes") or op.get("ns")
+        logger.warning(f"[INDEX] Index se staví: {collection} ({op.get('msg', 'probíhá')})")
+
+
+async def ensure_indexes(db) -> dict:
+    """Vytvoř všechny chybějící indexy. Vrátí {"created": [...], "failed": [...]}"""
+    created = []
+    failed = []
+
+    for collection_name, indexes in REQUIRED_INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = await collection.index_information()
+        except OperationFailure:
+            existing = {}
+        obsolete = OBSOLETE_INDEXES.get(collection_name, [])
+        existing_by_keys = {
+            tuple(info["key"]): (name, info) for name, info in existing.items() if name not in obsolete
+        }
+
+        for name in obsolete:
+            if name not in existing:
+                continue
+            logger.warning(f"[INDEX] Odstraňuji zastaralý index {collection_name}.{name}")
+            try:
+                await collection.drop_index(name)
+            except OperationFailure as e:
+                logger.error(f"[INDEX] Nelze odstranit {collection_name}.{name}: {e}")
+
+        for keys, options in indexes:
+            name, info = existing_by_keys.get(tuple(keys), (None, None))
+            if info is not None:
+                differ = _options_differ(info, options)
+                if not differ:
+                    continue
+                # Např. neunikátní index se stejnými klíči - unikátní by create_index nikdy nezaložil
+                logger.warning(
+                    f"[INDEX] Index {collection_name}.{name} má jiné volby ({', '.join(differ)}) - vytvářím znovu"
+                )
+                try:
+                    await collection.drop_index(name)
+                except OperationFailure as e:
+                    logger.error(f"[INDEX] Nelze odstranit {collection_name}.{name}: {e}")
+                    failed.append(f"{collection_name}.{options['name']}")
+                    continue
+            else:
+                logger.warning(f"[INDEX] Chybí index {collection_name}.{options['name']} - vytvářím")
+
+            try:
+                await collection.create_index(keys, **options)
+                created.append(f"{collection_name}.{options['name']}")
+            except OperationFailure as e:
+                # Typicky duplicitní data u unikátního indexu
+                logger.error(f"[INDEX] Nelze vytvořit {collection_name}.{options['name']}: {e}")
+                failed.append(f"{collection_name}.{options['name']}")
+
+    await _log_index_builds(db)
+
+    if created:
+        logger.info(f"[INDEX] Vytvořeno {len(created)} indexů: {', '.join(created)}")
+    return {"created": created, "failed": failed}
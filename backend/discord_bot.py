@@ -14,7 +14,11 @@ import shutil
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 import uuid
+from itertools import islice
 import math
+import signal
+import time
+from collections import OrderedDict
 
 # Auto-install FFmpeg if not present
 def ensure_ffmpeg():
@@ -35,14 +39,36 @@ ensure_ffmpeg()
 load_dotenv()
 
 # MongoDB setup for XP system
-from pymongo import MongoClient
+# Motor (async) - databázové volání nesmí blokovat event loop (heartbeat, voice)
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, DeleteOne, DeleteMany, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from db_indexes import ensure_indexes
+from leaderboard import GuildLeaderboard
+from answer_matcher import AnswerMatcher
+from notifications import NotificationDispatcher, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from message_edits import MessageEditScheduler
+from timers import TimerService
 
 mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 db_name = os.environ.get("DB_NAME", "quiz_bot")
-mongo_client = MongoClient(mongo_url)
+mongo_client = AsyncIOMotorClient(mongo_url, tz_aware=True)
 db = mongo_client[db_name]
 users_collection = db["game_users"]
 server_stats_collection = db["server_stats"]  # Pro statistiky serveru
+daily_stats_collection = db["daily_user_stats"]  # Denní statistiky {guild_id, day, user_id, messages, voice_minutes}
+server_daily_collection = db["server_daily_stats"]  # Denní součty serveru {guild_id, day, messages, voice_minutes}
+voice_sessions_collection = db["voice_sessions"]  # Checkpointy probíhajících voice sessions {user_id, guild_id, join_time, checkpoint_at}
+bot_guilds_collection = db["bot_guilds"]  # Servery, kde je bot (pro dashboard)
+bot_stats_collection = db["bot_stats"]
+xp_ledger_collection = db["xp_ledger"]  # Append-only záznamy XP {guild_id, user_id, source, amount, ts}
+xp_summary_collection = db["xp_daily_summary"]  # Zkompaktovaný ledger {guild_id, user_id, day, total, by_source}
+timers_collection = db["timers"]  # Trvalé časovače {_id, kind, due, payload}
+giveaways_collection = db["giveaways"]  # Giveawaye {giveaway_id, message_id, channel_id, prize, end_time, participants_count, ended, winners}
+giveaway_entries_collection = db["giveaway_entries"]  # Přihlášky {giveaway_id, user_id, joined_at} - unikátní dvojice
+polls_collection = db["polls"]  # Ankety {poll_id, message_id, channel_id, question, options, end_time, ended}
+poll_votes_collection = db["poll_votes"]  # Hlasy {poll_id, user_id, option, name, voted_at} - unikátní dvojice
+migrations_collection = db["bot_migrations"]  # Dokončené jednorázové migrace {_id: název, done_at}
 
 # Bot setup
 intents = discord.Intents.default()
@@ -51,7 +77,16 @@ intents.presences = True  # Pro sledování her
 intents.members = True    # Pro sledování členů
 intents.voice_states = True  # Pro sledování voice aktivity
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+class ValhallaBot(commands.Bot):
+    async def close(self):
+        """Před odpojením zapiš rozpracovaná data do DB"""
+        try:
+            await flush_pending_writes()
+        except Exception as e:
+            print(f"❌ Chyba při zápisu dat před vypnutím: {e}", flush=True)
+        await super().close()
+
+bot = ValhallaBot(command_prefix='!', intents=intents)
 
 # ============== COMMAND LOGGING ==============
 
@@ -211,64 +246,157 @@ GAME_UNLOCK_BONUS = 25
 GAME_NOTIFICATION_CHANNEL = 1468355022159872073  # Kanál pro herní notifikace
 GAME_PING_ROLE = 485172457544744972  # Role pro ping při splnění
 
+# Herní notifikace jdou přes frontu - bursty se sdruží do zpráv po 10 embedech
+notifications = NotificationDispatcher(bot.get_channel)
+
 # Track active gaming sessions {user_id: {"game": name, "start": datetime, "guild_id": id}}
 active_gaming_sessions = {}
 
 # Collection pro persistentní herní sessions
 game_sessions_collection = db["game_sessions"]
 
-def save_game_session(user_id: int, guild_id: int, game: str, user_name: str):
-    """Ulož herní session do databáze"""
-    game_sessions_collection.update_one(
-        {"user_id": user_id},
-        {"$set": {
-            "user_id": user_id,
-            "guild_id": guild_id,
-            "game": game,
-            "user_name": user_name,
-            "start": datetime.now(timezone.utc)
-        }},
-        upsert=True
+GAME_SESSION_SWEEP_INTERVAL = int(os.environ.get("GAME_SESSION_SWEEP_INTERVAL", "600"))  # sekundy
+game_session_sweep_task = None
+
+def is_still_playing(guild_id: int, user_id: int, game: str) -> bool:
+    """Hraje člen podle aktuální presence pořád danou hru?"""
+    guild = bot.get_guild(guild_id)
+    member = guild.get_member(user_id) if guild else None
+    if member is None:
+        return False
+    return any(
+        activity.type == discord.ActivityType.playing and activity.name == game
+        for activity in member.activities
     )
 
-def get_game_session(user_id: int) -> dict:
-    """Načti herní session z databáze"""
-    return game_sessions_collection.find_one({"user_id": user_id})
+async def sweep_game_sessions():
+    """Uzavři sessions hráčů, kteří už hru nehrají (konec hraní proběhl, když byl bot offline).
+    Přesný čas konce neznáme, XP se proto připíše do posledního heartbeatu (last_seen).
+    Hráče s čekající změnou presence přeskoč - jejich session uzavře commit_presence_changes.
+    Sessions, které pořád běží, dostanou nový last_seen - TTL index maže jen ty, které nikdo neobnovuje."""
+    now = datetime.now(timezone.utc)
+    stale = []  # (user_id, session)
+    playing = []
+    for user_id, session in list(active_gaming_sessions.items()):
+        if user_id in presence_pending:
+            continue
+        if is_still_playing(session["guild_id"], user_id, session["game"]):
+            session["last_seen"] = now
+            playing.append(user_id)
+        else:
+            # Odeber hned, ať ji během čekání na DB neuzavře i presence worker
+            del active_gaming_sessions[user_id]
+            stale.append((user_id, session))
+    
+    if playing:
+        await game_sessions_collection.update_many(
+            {"user_id": {"$in": playing}},
+            {"$set": {"last_seen": now}}
+        )
+    if not stale:
+        return
+    await game_sessions_collection.delete_many({"user_id": {"$in": [user_id for user_id, _ in stale]}})
+    print(f"[GAME] Uzavřeno {len(stale)} osiřelých herních sessions", flush=True)
+    
+    for user_id, session in stale:
+        if not session.get("start") or not session.get("last_seen"):
+            continue
+        try:
+            await finish_game_session(user_id, session, session["last_seen"])
+        except Exception as e:
+            print(f"❌ Chyba při připisování herního XP: {e}", flush=True)
 
-def delete_game_session(user_id: int):
-    """Smaž herní session z databáze"""
-    game_sessions_collection.delete_one({"user_id": user_id})
+async def game_session_sweep_loop():
+    """Periodicky uklízej osiřelé herní sessions"""
+    while True:
+        await asyncio.sleep(GAME_SESSION_SWEEP_INTERVAL)
+        try:
+            await sweep_game_sessions()
+        except Exception as e:
+            print(f"[GAME] Chyba při úklidu sessions: {e}", flush=True)
 
 # Collection pro nastavení serveru
 guild_settings_collection = db["guild_bot_settings"]
 
-def get_guild_settings(guild_id: int) -> dict:
-    """Získej nastavení pro server z databáze"""
-    settings = guild_settings_collection.find_one({"guild_id": str(guild_id)})
+# Výchozí nastavení
+DEFAULT_GUILD_SETTINGS = {
+    "cmdHudba": True,
+    "cmdFilm": True,
+    "cmdPravda": True,
+    "cmdGamelevel": False,
+    "cmdTop": False,
+    "cmdDaily": False,
+    "cmdHry": False,
+    "cmdUkoly": False,
+    "cmdHerniinfo": True
+}
+
+# Nastavení všech serverů drží bot v paměti - načte se při startu a dashboard
+# při každé změně zvýší "version", kterou refresh smyčka porovnává
+GUILD_SETTINGS_REFRESH_INTERVAL = int(os.environ.get("GUILD_SETTINGS_REFRESH_INTERVAL", "15"))  # sekundy
+guild_settings_cache = {}  # guild_id (str) -> settings
+guild_settings_loaded = False
+guild_settings_refresh_task = None
+
+async def load_guild_settings():
+    """Načti nastavení všech serverů do paměti"""
+    global guild_settings_loaded
+    settings_list = await guild_settings_collection.find({}).to_list(None)
+    guild_settings_cache.clear()
+    for settings in settings_list:
+        guild_settings_cache[settings["guild_id"]] = settings
+    guild_settings_loaded = True
+    print(f"⚙️ Načteno nastavení pro {len(settings_list)} serverů", flush=True)
+
+async def refresh_guild_settings():
+    """Dotáhni nastavení serverů, jejichž verze se změnila na dashboardu"""
+    versions = await guild_settings_collection.find(
+        {}, {"_id": 0, "guild_id": 1, "version": 1}
+    ).to_list(None)
+    
+    changed = [
+        doc["guild_id"] for doc in versions
+        if doc["guild_id"] not in guild_settings_cache
+        or guild_settings_cache[doc["guild_id"]].get("version") != doc.get("version")
+    ]
+    if changed:
+        async for settings in guild_settings_collection.find({"guild_id": {"$in": changed}}):
+            guild_settings_cache[settings["guild_id"]] = settings
+        print(f"⚙️ Aktualizováno nastavení serverů: {', '.join(changed)}", flush=True)
+    
+    # Smazaná nastavení -> zpět na výchozí
+    existing = {doc["guild_id"] for doc in versions}
+    for guild_id in list(guild_settings_cache):
+        if guild_id not in existing:
+            del guild_settings_cache[guild_id]
+
+async def guild_settings_refresh_loop():
+    """Periodicky kontroluj změny nastavení z dashboardu"""
+    while True:
+        await asyncio.sleep(GUILD_SETTINGS_REFRESH_INTERVAL)
+        try:
+            await refresh_guild_settings()
+        except Exception as e:
+            print(f"❌ Chyba při obnově nastavení serverů: {e}", flush=True)
+
+async def get_guild_settings(guild_id: int) -> dict:
+    """Získej nastavení pro server (z paměti, před načtením z databáze)"""
+    if guild_settings_loaded:
+        return guild_settings_cache.get(str(guild_id), DEFAULT_GUILD_SETTINGS)
+    settings = await guild_settings_collection.find_one({"guild_id": str(guild_id)})
     if not settings:
-        # Výchozí nastavení
-        return {
-            "cmdHudba": True,
-            "cmdFilm": True,
-            "cmdPravda": True,
-            "cmdGamelevel": False,
-            "cmdTop": False,
-            "cmdDaily": False,
-            "cmdHry": False,
-            "cmdUkoly": False,
-            "cmdHerniinfo": True
-        }
+        return DEFAULT_GUILD_SETTINGS
     return settings
 
-def is_command_admin_only(guild_id: int, command_name: str) -> bool:
+async def is_command_admin_only(guild_id: int, command_name: str) -> bool:
     """Zkontroluj zda příkaz vyžaduje admin oprávnění"""
-    settings = get_guild_settings(guild_id)
+    settings = await get_guild_settings(guild_id)
     key = f"cmd{command_name.capitalize()}"
     return settings.get(key, False)
 
 async def check_command_permission(interaction: discord.Interaction, command_name: str) -> bool:
     """Zkontroluj oprávnění pro příkaz. Vrátí True pokud může pokračovat."""
-    if is_command_admin_only(interaction.guild_id, command_name):
+    if await is_command_admin_only(interaction.guild_id, command_name):
         if not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message(
                 "❌ Tento příkaz může použít pouze administrátor!",
@@ -291,27 +419,151 @@ def xp_for_level(level: int) -> int:
         return 0
     return ((level - 1) ** 2) * 100
 
-def get_user_data(guild_id: int, user_id: int) -> dict:
-    """Get or create user data"""
-    user = users_collection.find_one({"guild_id": guild_id, "user_id": user_id})
+def default_user_data(guild_id: int, user_id: int) -> dict:
+    """Default document for a new user"""
+    return {
+        "guild_id": guild_id,
+        "user_id": user_id,
+        "xp": 0,
+        "total_correct": 0,
+        "total_games": 0,
+        "streak": 0,
+        "last_daily": None,
+        "daily_game_xp": 0,  # herní XP za den game_xp_day
+        "game_xp_day": None,  # "YYYY-MM-DD" (UTC)
+        "last_game_xp": 0,  # XP připsané posledním add_game_xp
+        "unlocked_games": [],
+        "completed_quests": {},  # {game_name: [completed_quest_indices]}
+        "game_times": {},  # {game_name: minutes}
+        "total_game_time": 0,  # v minutách
+        "created_at": datetime.now(timezone.utc)
+    }
+
+# Cache profilů hráčů - jedna akce (např. konec hraní) čte profil z DB nejvýš jednou.
+# Každý zápis přes update_user() uloží do cache nový stav dokumentu (write-through),
+# TTL omezuje zastaralost při zápisech mimo bota (dashboard).
+USER_CACHE_MAX_SIZE = int(os.environ.get("USER_CACHE_MAX_SIZE", "2000"))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "300"))  # sekundy
+user_cache = OrderedDict()  # (guild_id, user_id) -> (expires_at, user)
+user_cache_metrics = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+def cache_user(user: dict):
+    """Ulož profil do cache (LRU - nejstarší záznamy vypadnou)"""
+    key = (user["guild_id"], user["user_id"])
+    user_cache[key] = (time.monotonic() + USER_CACHE_TTL, user)
+    user_cache.move_to_end(key)
+    while len(user_cache) > USER_CACHE_MAX_SIZE:
+        user_cache.popitem(last=False)
+        user_cache_metrics["evictions"] += 1
+
+def get_cached_user(guild_id: int, user_id: int):
+    """Profil z cache (jen ke čtení), nebo None pokud chybí či vypršel"""
+    key = (guild_id, user_id)
+    entry = user_cache.get(key)
+    if entry is None:
+        user_cache_metrics["misses"] += 1
+        return None
+    expires_at, user = entry
+    if expires_at < time.monotonic():
+        del user_cache[key]
+        user_cache_metrics["expired"] += 1
+        user_cache_metrics["misses"] += 1
+        return None
+    user_cache.move_to_end(key)
+    user_cache_metrics["hits"] += 1
+    return user
+
+def invalidate_user(guild_id: int, user_id: int):
+    """Zahoď profil z cache (další čtení půjde do DB)"""
+    user_cache.pop((guild_id, user_id), None)
+
+# Žebříčky serverů v paměti - /top a pořadí v /hry bez dotazu do DB
+leaderboards = {}  # guild_id -> GuildLeaderboard
+leaderboards_loaded = False
+leaderboard_updates_during_load = None  # profily zapsané během načítání (přehrají se po něm)
+
+def update_leaderboard(user: dict):
+    """Promítni aktuální XP hráče do žebříčku jeho serveru"""
+    if not leaderboards_loaded:
+        if leaderboard_updates_during_load is not None:
+            leaderboard_updates_during_load[(user["guild_id"], user["user_id"])] = user
+        return
+    leaderboard = leaderboards.setdefault(user["guild_id"], GuildLeaderboard())
+    leaderboard.update(user["user_id"], user.get("xp", 0), user.get("name"))
+
+async def load_leaderboards():
+    """Sestav žebříčky všech serverů z databáze (jednou při startu)"""
+    global leaderboards, leaderboards_loaded, leaderboard_updates_during_load
+    # Staví se do nového slovníku - /top do té doby čte z DB, ne z polovičního žebříčku
+    loaded = {}
+    leaderboard_updates_during_load = {}
+    try:
+        async for user in users_collection.find({}, {"_id": 0, "guild_id": 1, "user_id": 1, "xp": 1, "name": 1}):
+            leaderboard = loaded.setdefault(user["guild_id"], GuildLeaderboard())
+            leaderboard.update(user["user_id"], user.get("xp", 0), user.get("name"))
+        leaderboards = loaded
+        leaderboards_loaded = True
+        # Zápisy během průchodu kolekcí jsou novější než to, co z ní kurzor přečetl
+        for user in leaderboard_updates_during_load.values():
+            update_leaderboard(user)
+    finally:
+        leaderboard_updates_during_load = None
+    print(f"🏆 Načteny žebříčky pro {len(leaderboards)} serverů", flush=True)
+
+async def get_top_users(guild_id: int, limit: int = 10) -> list:
+    """TOP hráči serveru jako [{"user_id", "xp", "name"}]"""
+    if leaderboards_loaded:
+        leaderboard = leaderboards.get(guild_id)
+        return leaderboard.top(limit) if leaderboard else []
+    top_users = await users_collection.find({"guild_id": guild_id}).sort("xp", -1).limit(limit).to_list(limit)
+    return [
+        {"user_id": user["user_id"], "xp": user["xp"], "name": user.get("name", f"Hráč {user['user_id']}")}
+        for user in top_users
+    ]
+
+def get_user_rank(guild_id: int, user_id: int):
+    """(pořadí, počet hráčů) na serveru, nebo None dokud žebříček není načtený"""
+    leaderboard = leaderboards.get(guild_id)
+    if not leaderboards_loaded or leaderboard is None:
+        return None
+    rank = leaderboard.rank(user_id)
+    if rank is None:
+        return None
+    return rank, len(leaderboard)
+
+async def get_user_data(guild_id: int, user_id: int) -> dict:
+    """Get or create user data.
+    Vrací dokument sdílený s cache - jen ke čtení, změny jdou přes update_user()."""
+    user = get_cached_user(guild_id, user_id)
+    if user is not None:
+        return user
+    user = await users_collection.find_one({"guild_id": guild_id, "user_id": user_id})
     if not user:
-        user = {
-            "guild_id": guild_id,
-            "user_id": user_id,
-            "xp": 0,
-            "total_correct": 0,
-            "total_games": 0,
-            "streak": 0,
-            "last_daily": None,
-            "daily_game_xp": 0,
-            "last_game_xp_reset": None,
-            "unlocked_games": [],
-            "completed_quests": {},  # {game_name: [completed_quest_indices]}
-            "game_times": {},  # {game_name: minutes}
-            "total_game_time": 0,  # v minutách
-            "created_at": datetime.now(timezone.utc)
-        }
-        users_collection.insert_one(user)
+        user = default_user_data(guild_id, user_id)
+        try:
+            await users_collection.insert_one(user)
+        except DuplicateKeyError:
+            # Souběžně ho založil jiný handler (např. award_xp upsert)
+            user = await users_collection.find_one({"guild_id": guild_id, "user_id": user_id})
+        update_leaderboard(user)
+    cache_user(user)
+    return user
+
+async def update_user(guild_id: int, user_id: int, update: dict, extra_filter: dict = None, upsert: bool = False):
+    """Update user document and write the new state through to the cache.
+    Returns the updated document, or None when extra_filter did not match."""
+    filter_doc = {"guild_id": guild_id, "user_id": user_id}
+    if extra_filter:
+        filter_doc.update(extra_filter)
+    user = await users_collection.find_one_and_update(
+        filter_doc, update, upsert=upsert, return_document=ReturnDocument.AFTER
+    )
+    if user is not None:
+        cache_user(user)
+        update_leaderboard(user)
+    elif extra_filter:
+        # Podmínka neplatí - profil v cache (ze kterého volající vycházel) je zastaralý
+        invalidate_user(guild_id, user_id)
     return user
 
 def get_game_quests(game_name: str) -> list:
@@ -320,14 +572,14 @@ def get_game_quests(game_name: str) -> list:
         return GAME_QUESTS[game_name]
     return GAME_QUESTS["default"]
 
-def get_game_time(guild_id: int, user_id: int, game_name: str) -> int:
+async def get_game_time(guild_id: int, user_id: int, game_name: str) -> int:
     """Get total time played for a specific game"""
-    user = get_user_data(guild_id, user_id)
+    user = await get_user_data(guild_id, user_id)
     return user.get("game_times", {}).get(game_name, 0)
 
 async def check_and_complete_quests(guild_id: int, user_id: int, user_name: str, game_name: str, total_minutes: int, channel=None):
     """Check if any quests are completed and give rewards"""
-    user = get_user_data(guild_id, user_id)
+    user = await get_user_data(guild_id, user_id)
     completed = user.get("completed_quests", {}).get(game_name, [])
     quests = get_game_quests(game_name)
     
@@ -335,66 +587,49 @@ async def check_and_complete_quests(guild_id: int, user_id: int, user_name: str,
     total_xp = 0
     
     for i, quest in enumerate(quests):
-        if i not in completed and total_minutes >= quest["minutes"]:
-            newly_completed.append(i)
-            total_xp += quest["xp"]
-    
-    if newly_completed:
-        # Update completed quests
-        users_collection.update_one(
-            {"guild_id": guild_id, "user_id": user_id},
-            {"$set": {f"completed_quests.{game_name}": completed + newly_completed}}
+        if i in completed or total_minutes < quest["minutes"]:
+            continue
+        # Podmíněný update - ze dvou souběžných presence updatů úkol připíše jen jeden
+        user = await update_user(
+            guild_id, user_id,
+            {"$addToSet": {f"completed_quests.{game_name}": i}, "$inc": {"xp": quest["xp"]}, "$set": {"name": user_name}},
+            extra_filter={f"completed_quests.{game_name}": {"$ne": i}}
         )
+        if user is None:
+            continue
+        record_xp(guild_id, user_id, "quest", quest["xp"])
+        await announce_level_up(user_name, user["xp"] - quest["xp"], user["xp"])
+        newly_completed.append(i)
+        total_xp += quest["xp"]
+    
+    # Send notification to game channel
+    for i in newly_completed:
+        quest = quests[i]
         
-        # Add XP
-        await add_xp(guild_id, user_id, user_name, total_xp, None)
-        
-        # Send notification to game channel
-        notify_channel = channel
-        if not notify_channel:
-            notify_channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
-        
-        if notify_channel:
-            for i in newly_completed:
-                quest = quests[i]
-                game_emoji = BONUS_GAMES.get(game_name, {}).get("emoji", "🎮")
-                
-                embed = discord.Embed(
-                    title=f"🎯 ÚKOL SPLNĚN!",
-                    description=f"**{user_name}** splnil/a úkol v **{game_name}**!",
-                    color=discord.Color.gold()
-                )
-                embed.add_field(name=f"{quest['emoji']} Úkol", value=quest["name"], inline=True)
-                embed.add_field(name="✨ Odměna", value=f"+{quest['xp']} XP", inline=True)
-                embed.add_field(name="⏱️ Čas", value=f"{total_minutes // 60}h {total_minutes % 60}m", inline=True)
-                embed.set_footer(text="⚔️ Valhalla Bot • Plň další úkoly a získávej XP!")
-                await notify_channel.send(f"<@&{GAME_PING_ROLE}>", embed=embed)
+        embed = discord.Embed(
+            title=f"🎯 ÚKOL SPLNĚN!",
+            description=f"**{user_name}** splnil/a úkol v **{game_name}**!",
+            color=discord.Color.gold()
+        )
+        embed.add_field(name=f"{quest['emoji']} Úkol", value=quest["name"], inline=True)
+        embed.add_field(name="✨ Odměna", value=f"+{quest['xp']} XP", inline=True)
+        embed.add_field(name="⏱️ Čas", value=f"{total_minutes // 60}h {total_minutes % 60}m", inline=True)
+        embed.set_footer(text="⚔️ Valhalla Bot • Plň další úkoly a získávej XP!")
+        notifications.notify(channel or GAME_NOTIFICATION_CHANNEL, embed, PRIORITY_HIGH, ping=f"<@&{GAME_PING_ROLE}>")
     
     return total_xp
 
-def get_daily_game_xp(guild_id: int, user_id: int) -> int:
-    """Get how much game XP user earned today"""
-    user = get_user_data(guild_id, user_id)
-    last_reset = user.get("last_game_xp_reset")
-    
-    if last_reset:
-        if isinstance(last_reset, str):
-            last_reset = datetime.fromisoformat(last_reset.replace('Z', '+00:00'))
-        
-        # Ensure timezone aware
-        if last_reset.tzinfo is None:
-            last_reset = last_reset.replace(tzinfo=timezone.utc)
-        
-        # Reset if new day
-        if (datetime.now(timezone.utc) - last_reset).days >= 1:
-            users_collection.update_one(
-                {"guild_id": guild_id, "user_id": user_id},
-                {"$set": {"daily_game_xp": 0, "last_game_xp_reset": datetime.now(timezone.utc).isoformat()}}
-            )
-            return 0
-    
+def daily_game_xp_of(user: dict) -> int:
+    """Game XP earned today - counter belongs to the day stored in game_xp_day"""
+    if user.get("game_xp_day") != datetime.now(timezone.utc).strftime("%Y-%m-%d"):
+        return 0
     return user.get("daily_game_xp", 0)
 
+async def get_daily_game_xp(guild_id: int, user_id: int) -> int:
+    """Get how much game XP user earned today"""
+    user = await get_user_data(guild_id, user_id)
+    return daily_game_xp_of(user)
+
 async def add_game_xp(guild_id: int, user_id: int, user_name: str, minutes: int, game_name: str = None, channel=None):
     """Add XP for gaming time"""
     # Calculate XP (5 XP per 10 minutes)
@@ -403,61 +638,65 @@ async def add_game_xp(guild_id: int, user_id: int, user_name: str, minutes: int,
     if xp_earned <= 0:
         return 0
     
-    # Check daily limit
-    daily_xp = get_daily_game_xp(guild_id, user_id)
-    remaining = GAME_XP_DAILY_LIMIT - daily_xp
-    
-    if remaining <= 0:
-        return 0
-    
-    # Cap XP at remaining limit
-    xp_earned = min(xp_earned, remaining)
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
     
-    # Update daily game XP and game-specific time
-    update_query = {
-        "$inc": {"daily_game_xp": xp_earned, "total_game_time": minutes},
-        "$set": {"last_game_xp_reset": datetime.now(timezone.utc).isoformat()}
+    # Jeden atomický update (pipeline): nový den vynuluje čítač, XP se ořízne
+    # na zbytek denního limitu a připíše spolu s herním časem
+    apply_fields = {
+        "daily_game_xp": {"$add": ["$daily_game_xp", "$last_game_xp"]},
+        "xp": {"$add": ["$xp", "$last_game_xp"]},
+        "total_game_time": {"$add": ["$total_game_time", minutes]},
+        "name": {"$literal": user_name}
     }
-    
     if game_name:
-        update_query["$inc"][f"game_times.{game_name}"] = minutes
+        apply_fields[f"game_times.{game_name}"] = {"$add": [{"$ifNull": [f"$game_times.{game_name}", 0]}, minutes]}
     
-    users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        update_query
-    )
+    user = await update_user(guild_id, user_id, [
+        # Nový uživatel dostane výchozí pole
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": [default_user_data(guild_id, user_id), "$$ROOT"]}}},
+        {"$set": {
+            "daily_game_xp": {"$cond": [{"$eq": ["$game_xp_day", today]}, "$daily_game_xp", 0]},
+            "game_xp_day": today
+        }},
+        {"$set": {
+            "last_game_xp": {"$max": [0, {"$min": [xp_earned, {"$subtract": [GAME_XP_DAILY_LIMIT, "$daily_game_xp"]}]}]}
+        }},
+        {"$set": apply_fields},
+        {"$unset": "last_game_xp_reset"}  # staré ISO razítko
+    ], upsert=True)
     
-    # Add to total XP
-    await add_xp(guild_id, user_id, user_name, xp_earned, channel)
+    xp_earned = user["last_game_xp"]
+    if xp_earned > 0:
+        record_xp(guild_id, user_id, "game_time", xp_earned)
+        await announce_level_up(user_name, user["xp"] - xp_earned, user["xp"])
     
-    # Check for quest completion
+    # Check for quest completion - dokument už obsahuje právě přičtené minuty
     if game_name:
-        user = get_user_data(guild_id, user_id)
-        total_game_time = user.get("game_times", {}).get(game_name, 0) + minutes
+        total_game_time = user.get("game_times", {}).get(game_name, 0)
         await check_and_complete_quests(guild_id, user_id, user_name, game_name, total_game_time, channel)
     
     return xp_earned
 
 async def unlock_game(guild_id: int, user_id: int, user_name: str, game_name: str, channel=None) -> bool:
     """Unlock a bonus game and give bonus XP. Returns True if newly unlocked."""
-    user = get_user_data(guild_id, user_id)
-    unlocked = user.get("unlocked_games", [])
-    
-    if game_name in unlocked:
+    user = await get_user_data(guild_id, user_id)
+    if game_name in user.get("unlocked_games", []):
         return False
     
-    # Unlock the game
-    users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        {"$push": {"unlocked_games": game_name}}
+    # Unlock the game - podmínka v filtru zaručí, že bonus dostane jen první zápis
+    user = await update_user(
+        guild_id, user_id,
+        {"$addToSet": {"unlocked_games": game_name}},
+        extra_filter={"unlocked_games": {"$ne": game_name}}
     )
+    if user is None:
+        return False
     
     # Give bonus XP
-    await add_xp(guild_id, user_id, user_name, GAME_UNLOCK_BONUS, None)
+    await add_xp(guild_id, user_id, user_name, GAME_UNLOCK_BONUS, None, source="unlock")
     
     # Send notification with role ping - VŽDY do správného kanálu
-    notify_channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
-    if notify_channel and game_name in BONUS_GAMES:
+    if game_name in BONUS_GAMES:
         game_info = BONUS_GAMES[game_name]
         embed = discord.Embed(
             title="🎮 HRA ODEMČENA!",
@@ -467,46 +706,156 @@ async def unlock_game(guild_id: int, user_id: int, user_name: str, game_name: st
         embed.add_field(name="🏷️ Kategorie", value=game_info["category"], inline=True)
         embed.add_field(name="✨ Bonus", value=f"+{GAME_UNLOCK_BONUS} XP", inline=True)
         embed.set_footer(text="⚔️ Valhalla Bot • Hraj a získávej XP!")
-        await notify_channel.send(f"<@&{GAME_PING_ROLE}>", embed=embed)
+        notifications.notify(GAME_NOTIFICATION_CHANNEL, embed, PRIORITY_HIGH, ping=f"<@&{GAME_PING_ROLE}>")
     
     return True
 
-async def add_xp(guild_id: int, user_id: int, user_name: str, xp_amount: int, channel=None) -> bool:
-    """Add XP to user and check for level up. Returns True if leveled up."""
-    user = get_user_data(guild_id, user_id)
-    old_level = calculate_level(user["xp"])
-    new_xp = user["xp"] + xp_amount
-    new_level = calculate_level(new_xp)
+# XP ledger - každé připsání XP se zapíše jako záznam (zdroj, množství, server, čas).
+# Záznamy se sbírají v paměti a zapisují dávkově s bufferem statistik,
+# starší než XP_LEDGER_RETENTION_DAYS se kompaktují do denních souhrnů.
+XP_LEDGER_RETENTION_DAYS = int(os.environ.get("XP_LEDGER_RETENTION_DAYS", "30"))
+XP_LEDGER_COMPACTION_INTERVAL = int(os.environ.get("XP_LEDGER_COMPACTION_INTERVAL", "21600"))  # sekundy
+xp_ledger_buffer = []
+xp_ledger_compaction_task = None
+
+def record_xp(guild_id: int, user_id: int, source: str, amount: int):
+    """Přidej záznam do XP ledgeru (zapíše se při dalším flushi)"""
+    xp_ledger_buffer.append({
+        "guild_id": guild_id,
+        "user_id": user_id,
+        "source": source,
+        "amount": amount,
+        "ts": datetime.now(timezone.utc)
+    })
+
+async def flush_xp_ledger():
+    """Zapiš nasbírané záznamy ledgeru jedním insert_many"""
+    if not xp_ledger_buffer:
+        return
+    entries = xp_ledger_buffer[:]
+    xp_ledger_buffer.clear()
+    try:
+        await xp_ledger_collection.insert_many(entries, ordered=False)
+    except BulkWriteError as e:
+        # Část dávky se zapsala - vrať jen záznamy s jinou chybou než duplicitní _id
+        # (duplicitní = zapsaný už dřívějším pokusem)
+        failed = {error["index"] for error in e.details.get("writeErrors", []) if error["code"] != 11000}
+        if failed:
+            print(f"[XP] Chyba při zápisu {len(failed)} záznamů ledgeru: {e}", flush=True)
+            xp_ledger_buffer.extend(entries[index] for index in sorted(failed))
+    except Exception as e:
+        # insert_many doplní _id všem záznamům ještě před odesláním - opakovaný pokus
+        # se stejnými _id je idempotentní, už zapsané záznamy skončí jako duplicitní
+        print(f"[XP] Chyba při zápisu ledgeru: {e}", flush=True)
+        xp_ledger_buffer.extend(entries)
+
+async def compact_xp_ledger():
+    """Slouč celé dny starší než retence do xp_daily_summary a smaž jejich záznamy.
+    Souhrn dne se počítá celý znovu ($set), takže přerušený běh lze bezpečně zopakovat."""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    cutoff = today - timedelta(days=XP_LEDGER_RETENTION_DAYS)
+    
+    groups = await xp_ledger_collection.aggregate([
+        {"$match": {"ts": {"$lt": cutoff}}},
+        {"$group": {
+            "_id": {
+                "guild_id": "$guild_id",
+                "user_id": "$user_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$ts"}},
+                "source": "$source"
+            },
+            "amount": {"$sum": "$amount"},
+            "entries": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    if not groups:
+        return
     
-    users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        {"$set": {"xp": new_xp, "name": user_name}}
+    summaries = {}
+    for group in groups:
+        key = (group["_id"]["guild_id"], group["_id"]["user_id"], group["_id"]["day"])
+        summary = summaries.setdefault(key, {"total": 0, "entries": 0, "by_source": {}})
+        summary["total"] += group["amount"]
+        summary["entries"] += group["entries"]
+        summary["by_source"][group["_id"]["source"]] = group["amount"]
+    
+    await xp_summary_collection.bulk_write([
+        UpdateOne(
+            {"guild_id": guild_id, "user_id": user_id, "day": day},
+            {"$set": summary},
+            upsert=True
+        )
+        for (guild_id, user_id, day), summary in summaries.items()
+    ], ordered=False)
+    result = await xp_ledger_collection.delete_many({"ts": {"$lt": cutoff}})
+    print(f"[XP] Ledger zkompaktován: {result.deleted_count} záznamů -> {len(summaries)} denních souhrnů", flush=True)
+
+async def xp_ledger_compaction_loop():
+    """Periodicky kompaktuj XP ledger"""
+    while True:
+        try:
+            await compact_xp_ledger()
+        except Exception as e:
+            print(f"[XP] Chyba při kompaktování ledgeru: {e}", flush=True)
+        await asyncio.sleep(XP_LEDGER_COMPACTION_INTERVAL)
+
+async def award_xp(guild_id: int, user_id: int, user_name: str, xp_amount: int, extra_set: dict = None, extra_inc: dict = None, source: str = "other", extra_filter: dict = None):
+    """Atomically add XP in one round trip (upsert). Returns (old_xp, new_xp),
+    or None when extra_filter did not match (podmíněný zápis se neupsertuje)."""
+    set_fields = {"name": user_name}
+    if extra_set:
+        set_fields.update(extra_set)
+    inc_fields = {"xp": xp_amount}
+    if extra_inc:
+        inc_fields.update(extra_inc)
+    
+    # Výchozí hodnoty pro nového uživatele - bez polí, která mění $inc/$set
+    on_insert = {
+        key: value for key, value in default_user_data(guild_id, user_id).items()
+        if key not in inc_fields and key not in set_fields and key not in ("guild_id", "user_id")
+    }
+    
+    user = await update_user(
+        guild_id, user_id,
+        {"$inc": inc_fields, "$set": set_fields, "$setOnInsert": on_insert},
+        extra_filter=extra_filter,
+        upsert=extra_filter is None
     )
+    if user is None:
+        return None
+    record_xp(guild_id, user_id, source, xp_amount)
+    new_xp = user["xp"]
+    return new_xp - xp_amount, new_xp
+
+async def add_xp(guild_id: int, user_id: int, user_name: str, xp_amount: int, channel=None, extra_inc: dict = None, source: str = "other") -> bool:
+    """Add XP to user and check for level up. Returns True if leveled up."""
+    old_xp, new_xp = await award_xp(guild_id, user_id, user_name, xp_amount, extra_inc=extra_inc, source=source)
+    return await announce_level_up(user_name, old_xp, new_xp)
+
+async def announce_level_up(user_name: str, old_xp: int, new_xp: int) -> bool:
+    """Send level up notification if XP change crossed a level. Returns True if leveled up."""
+    old_level = calculate_level(old_xp)
+    new_level = calculate_level(new_xp)
     
     # Level up notification - vždy do správného kanálu
     if new_level > old_level:
-        notify_channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
-        if notify_channel:
-            embed = discord.Embed(
-                title="🎉 LEVEL UP!",
-                description=f"**{user_name}** dosáhl/a **Level {new_level}**!",
-                color=discord.Color.gold()
-            )
-            embed.add_field(name="✨ XP", value=f"{new_xp} XP", inline=True)
-            embed.add_field(name="📈 Další level", value=f"{xp_for_level(new_level + 1)} XP", inline=True)
-            await notify_channel.send(embed=embed)
+        embed = discord.Embed(
+            title="🎉 LEVEL UP!",
+            description=f"**{user_name}** dosáhl/a **Level {new_level}**!",
+            color=discord.Color.gold()
+        )
+        embed.add_field(name="✨ XP", value=f"{new_xp} XP", inline=True)
+        embed.add_field(name="📈 Další level", value=f"{xp_for_level(new_level + 1)} XP", inline=True)
+        notifications.notify(GAME_NOTIFICATION_CHANNEL, embed, PRIORITY_NORMAL)
         return True
     return False
 
-def increment_stats(guild_id: int, user_id: int, correct: bool = False):
+async def increment_stats(guild_id: int, user_id: int, correct: bool = False):
     """Increment user game statistics"""
     update = {"$inc": {"total_games": 1}}
     if correct:
         update["$inc"]["total_correct"] = 1
-    users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        update
-    )
+    await update_user(guild_id, user_id, update)
 
 # XP rewards
 XP_REWARDS = {
@@ -563,16 +912,92 @@ def format_time(seconds: int) -> str:
     
     return " ".join(parts)
 
+# Časovače (konce giveawayí a anket, odpočty, mazání zpráv) - jedna halda a jedna smyčka
+timers = TimerService(timers_collection)
+
+def partial_message(channel_id: int, message_id: int):
+    """Zpráva podle ID bez stahování z API (pro editaci/smazání), nebo None"""
+    channel = bot.get_channel(channel_id)
+    return channel.get_partial_message(message_id) if channel else None
+
 # Auto-delete helper
-async def delete_after(message, seconds: int = 60):
-    """Delete message after specified seconds (default 1 min)"""
-    await asyncio.sleep(seconds)
+def delete_after(message, seconds: int = 60):
+    """Delete message after specified seconds (default 1 min).
+    Krátkodobý časovač jen v paměti - zápis a smazání v DB by stály víc než zpráva navíc po restartu."""
+    timers.schedule(
+        "delete_message",
+        datetime.now(timezone.utc) + timedelta(seconds=seconds),
+        {"channel_id": message.channel.id, "message_id": message.id},
+        persist=False
+    )
+
+# Splatné zprávy se sbírají po kanálech a mažou dávkově (channel.delete_messages, max. 100
+# na volání). Bulk delete Discord nepřijme pro zprávy starší 14 dní - ty se mažou po jedné.
+BULK_DELETE_WINDOW = 2  # sekundy - jak dlouho se sbírá dávka kanálu
+BULK_DELETE_LIMIT = 100
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+pending_deletions = {}  # {channel_id: [(message_id, future)]}
+deletion_metrics = {"messages": 0, "bulk_calls": 0, "single_calls": 0}
+
+@timers.handler("delete_message")
+async def delete_message_timer(payload: dict):
+    """Zařaď zprávu do dávky kanálu a počkej na smazání (časovač se z DB odstraní až potom)"""
+    channel_id = payload["channel_id"]
+    batch = pending_deletions.get(channel_id)
+    if batch is None:
+        batch = pending_deletions[channel_id] = []
+        asyncio.create_task(flush_deletions(channel_id))
+    done = asyncio.get_running_loop().create_future()
+    batch.append((payload["message_id"], done))
+    await done
+
+async def flush_deletions(channel_id: int):
+    """Po BULK_DELETE_WINDOW smaž všechno, co se v kanálu nasbíralo"""
+    await asyncio.sleep(BULK_DELETE_WINDOW)
+    batch = pending_deletions.pop(channel_id, [])
     try:
-        await message.delete()
-    except:
-        pass
+        await delete_messages_bulk(channel_id, [message_id for message_id, _ in batch])
+    except Exception as e:
+        print(f"❌ Chyba při mazání zpráv v {channel_id}: {e}", flush=True)
+    finally:
+        for _, done in batch:
+            if not done.done():
+                done.set_result(None)
+
+async def delete_messages_bulk(channel_id: int, message_ids: list):
+    """Smaž zprávy kanálu co nejmenším počtem API volání"""
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        return
+    deletion_metrics["messages"] += len(message_ids)
+    
+    cutoff = datetime.now(timezone.utc) - BULK_DELETE_MAX_AGE
+    recent = [message_id for message_id in message_ids if discord.utils.snowflake_time(message_id) > cutoff]
+    single = [message_id for message_id in message_ids if discord.utils.snowflake_time(message_id) <= cutoff]
+    
+    # Bulk delete potřebuje aspoň 2 zprávy, textový kanál a oprávnění Spravovat zprávy
+    if len(recent) >= 2 and hasattr(channel, "delete_messages"):
+        for i in range(0, len(recent), BULK_DELETE_LIMIT):
+            chunk = recent[i:i + BULK_DELETE_LIMIT]
+            try:
+                await channel.delete_messages([discord.Object(id=message_id) for message_id in chunk])
+                deletion_metrics["bulk_calls"] += 1
+            except discord.HTTPException:
+                single.extend(chunk)  # vlastní zprávy smí bot smazat i bez oprávnění
+    else:
+        single.extend(recent)
+    
+    for message_id in single:
+        try:
+            await channel.get_partial_message(message_id).delete()
+        except discord.HTTPException:
+            pass
+        deletion_metrics["single_calls"] += 1
+
+# Živé zprávy (odpočty, ankety, giveawaye) se editují přes společný plánovač
+message_edits = MessageEditScheduler()
 
-# Store active countdowns
+# Store active countdowns {countdown_id: {countdown_id, channel_id, message_id, author_id, reason, end_time}}
 active_countdowns = {}
 
 class CountdownView(discord.ui.View):
@@ -581,15 +1006,16 @@ class CountdownView(discord.ui.View):
         self.countdown_id = countdown_id
         self.user_id = user_id
     
-    @discord.ui.button(label="Zrušit", style=discord.ButtonStyle.danger, emoji="❌")
+    @discord.ui.button(label="Zrušit", style=discord.ButtonStyle.danger, emoji="❌", custom_id="countdown_cancel")
     async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user.id != self.user_id and not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message("❌ Pouze autor nebo admin může zrušit odpočet!", ephemeral=True)
             return
         
-        if self.countdown_id in active_countdowns:
-            active_countdowns[self.countdown_id]["cancelled"] = True
-            del active_countdowns[self.countdown_id]
+        active_countdowns.pop(self.countdown_id, None)
+        timers.cancel(self.countdown_id)
+        timers.cancel(f"{self.countdown_id}:tick")
+        message_edits.forget(interaction.message.id)
         
         button.disabled = True
         button.label = "Zrušeno"
@@ -603,109 +1029,327 @@ class CountdownView(discord.ui.View):
         await interaction.response.edit_message(embed=embed, view=self)
         self.stop()
 
-async def run_countdown(channel, message, end_time: int, countdown_id: str, author: discord.Member, reason: str):
-    """Run the countdown and update message"""
+def start_countdown(countdown_id: str, message, end_time: int, author: discord.Member, reason: str):
+    """Zaregistruj odpočet - konec jako trvalý časovač, průběžné editace jako tiky"""
+    countdown = {
+        "countdown_id": countdown_id,
+        "channel_id": message.channel.id,
+        "message_id": message.id,
+        "author_id": author.id,
+        "reason": reason,
+        "end_time": end_time
+    }
+    active_countdowns[countdown_id] = countdown
+    timers.schedule("countdown_end", datetime.fromtimestamp(end_time, timezone.utc), countdown, timer_id=countdown_id)
+    schedule_countdown_tick(countdown_id, 0)
+
+def schedule_countdown_tick(countdown_id: str, delay: int):
+    timers.schedule(
+        "countdown_tick",
+        datetime.now(timezone.utc) + timedelta(seconds=delay),
+        {"countdown_id": countdown_id},
+        timer_id=f"{countdown_id}:tick",
+        persist=False
+    )
+
+@timers.handler("countdown_tick")
+async def countdown_tick(payload: dict):
+    """Aktualizuj zprávu odpočtu a naplánuj další tik"""
+    countdown = active_countdowns.get(payload["countdown_id"])
+    if countdown is None:
+        return
     
-    while True:
-        if countdown_id not in active_countdowns:
-            return
-        
-        if active_countdowns[countdown_id].get("cancelled"):
-            return
-        
-        remaining = end_time - int(datetime.now(timezone.utc).timestamp())
-        
-        if remaining <= 0:
-            break
-        
-        embed = discord.Embed(
-            title="⏰ ODPOČET",
-            description=f"**{reason}**" if reason else "Odpočet běží...",
-            color=discord.Color.blue()
-        )
-        embed.add_field(name="⏳ Zbývá", value=f"**{format_time(remaining)}**", inline=True)
-        embed.add_field(name="👤 Spustil", value=author.mention, inline=True)
-        embed.set_footer(text=f"Končí: {datetime.fromtimestamp(end_time).strftime('%H:%M:%S')}")
-        
-        try:
-            await message.edit(embed=embed)
-        except:
-            pass
-        
-        if remaining > 3600:
-            await asyncio.sleep(60)
-        elif remaining > 60:
-            await asyncio.sleep(10)
-        else:
-            await asyncio.sleep(1)
+    end_time = countdown["end_time"]
+    remaining = end_time - int(datetime.now(timezone.utc).timestamp())
+    if remaining <= 0:
+        return  # konec obslouží časovač countdown_end
     
-    # Countdown finished!
-    if countdown_id in active_countdowns:
-        del active_countdowns[countdown_id]
+    message = partial_message(countdown["channel_id"], countdown["message_id"])
+    if message is None:
+        return
     
+    reason = countdown["reason"]
+    embed = discord.Embed(
+        title="⏰ ODPOČET",
+        description=f"**{reason}**" if reason else "Odpočet běží...",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="⏳ Zbývá", value=f"**{format_time(remaining)}**", inline=True)
+    embed.add_field(name="👤 Spustil", value=f"<@{countdown['author_id']}>", inline=True)
+    embed.set_footer(text=f"Končí: {datetime.fromtimestamp(end_time).strftime('%H:%M:%S')}")
+    
+    message_edits.schedule(message, embed=embed)
+    
+    if remaining > 3600:
+        interval = 60
+    elif remaining > 60:
+        interval = 10
+    else:
+        interval = 1
+    schedule_countdown_tick(countdown["countdown_id"], min(interval, remaining))
+
+@timers.handler("countdown_end")
+async def countdown_end(countdown: dict):
+    """Countdown finished!"""
+    active_countdowns.pop(countdown["countdown_id"], None)
+    
+    message = partial_message(countdown["channel_id"], countdown["message_id"])
+    if message is None:
+        return
+    
+    reason = countdown["reason"]
+    author_mention = f"<@{countdown['author_id']}>"
     embed = discord.Embed(
         title="🎉 ODPOČET SKONČIL!",
         description=f"**{reason}**" if reason else "Čas vypršel!",
         color=discord.Color.green()
     )
-    embed.add_field(name="👤 Spustil", value=author.mention, inline=True)
+    embed.add_field(name="👤 Spustil", value=author_mention, inline=True)
     
     view = discord.ui.View()
     disabled_btn = discord.ui.Button(label="Dokončeno", style=discord.ButtonStyle.success, disabled=True, emoji="✅")
     view.add_item(disabled_btn)
     
     try:
-        await message.edit(embed=embed, view=view)
+        await message_edits.edit_now(message, embed=embed, view=view)
     except:
         pass
     
     # Ping notification
-    await channel.send(f"🔔 **ODPOČET SKONČIL!** {author.mention}\n{'📢 ' + reason if reason else ''}")
+    await message.channel.send(f"🔔 **ODPOČET SKONČIL!** {author_mention}\n{'📢 ' + reason if reason else ''}")
+
+async def restore_timers():
+    """Načti trvalé časovače a obnov k nim stav v paměti a tlačítka (bot.add_view)"""
+    loaded = await timers.load()
+    giveaways = await restore_giveaways()
+    polls = await restore_polls()
+    for countdown in timers.pending("countdown_end"):
+        countdown = countdown["payload"]
+        if countdown["countdown_id"] in active_countdowns:
+            continue
+        active_countdowns[countdown["countdown_id"]] = countdown
+        bot.add_view(CountdownView(countdown["countdown_id"], countdown["author_id"]), message_id=countdown["message_id"])
+        schedule_countdown_tick(countdown["countdown_id"], 0)
+    print(
+        f'⏱️ Načteno {loaded} časovačů ({giveaways} giveawayí, {polls} anket, {len(active_countdowns)} odpočtů)',
+        flush=True
+    )
 
 # ============== EVENTS ==============
 
-@bot.event
-async def on_ready():
-    print(f'🤖 Bot {bot.user} je online!', flush=True)
-    print(f'📊 Připojen k {len(bot.guilds)} serverům', flush=True)
+async def flush_pending_writes():
+    """Zapiš všechny write-behind buffery (volá se při vypnutí bota)"""
+    await flush_stats_buffer()
+    await flush_xp_ledger()
+    await checkpoint_voice_sessions()
+    await notifications.flush()
+    await timers.sync()
+    print(
+        f"[STATS] Buffer: {stats_buffer_metrics['buffered_ops']} zpráv přijato, "
+        f"{stats_buffer_metrics['flushed_ops']} zapsáno v {stats_buffer_metrics['flushes']} bulk zápisech",
+        flush=True
+    )
+    print(
+        f"[CACHE] Profily: {user_cache_metrics['hits']} zásahů, {user_cache_metrics['misses']} výpadků, "
+        f"{user_cache_metrics['evictions']} vyřazeno, {len(user_cache)} v cache",
+        flush=True
+    )
+    print(
+        f"[GAME] Presence: {presence_metrics['events']} událostí, {presence_metrics['duplicates']} duplicit, "
+        f"{presence_metrics['debounced']} potlačeno, {presence_metrics['transitions']} přechodů, "
+        f"{presence_metrics['session_writes']} zápisů sessions",
+        flush=True
+    )
+    print(
+        f"[EDIT] {message_edits.metrics['scheduled']} požadavků, {message_edits.metrics['edits']} editací, "
+        f"{message_edits.metrics['coalesced']} sloučeno, {message_edits.metrics['skipped']} beze změny",
+        flush=True
+    )
+    print(
+        f"[DELETE] {deletion_metrics['messages']} zpráv smazáno v {deletion_metrics['bulk_calls']} hromadných "
+        f"a {deletion_metrics['single_calls']} jednotlivých voláních",
+        flush=True
+    )
+    print(
+        f"[NOTIFY] {notifications.metrics['enqueued']} notifikací v {notifications.metrics['sent_messages']} zprávách, "
+        f"{notifications.metrics['rate_limited']}x 429, {notifications.metrics['dropped']} zahozeno, "
+        f"max. fronta {notifications.metrics['max_depth']}",
+        flush=True
+    )
+
+def start_background_tasks():
+    """Spusť periodické úlohy - jen jednou, on_ready se volá i po reconnectu"""
+    global stats_flush_task, guild_settings_refresh_task, game_session_sweep_task, xp_ledger_compaction_task, presence_worker_task
+    global voice_checkpoint_task
+    if stats_flush_task is not None:
+        return
     
-    # Načti aktivní herní sessions z databáze
-    stored_sessions = list(game_sessions_collection.find({}))
-    for session in stored_sessions:
-        user_id = session.get("user_id")
-        if user_id:
-            active_gaming_sessions[user_id] = {
-                "game": session.get("game"),
-                "start": session.get("start"),
-                "guild_id": session.get("guild_id"),
-                "user_name": session.get("user_name")
-            }
-    print(f'🎮 Načteno {len(stored_sessions)} aktivních herních sessions', flush=True)
+    stats_flush_task = asyncio.create_task(stats_flush_loop())
+    guild_settings_refresh_task = asyncio.create_task(guild_settings_refresh_loop())
+    game_session_sweep_task = asyncio.create_task(game_session_sweep_loop())
+    xp_ledger_compaction_task = asyncio.create_task(xp_ledger_compaction_loop())
+    presence_worker_task = asyncio.create_task(presence_worker())
+    voice_checkpoint_task = asyncio.create_task(voice_checkpoint_loop())
     
-    # Uložit statistiky bota do databáze
-    users_collection.database.bot_stats.update_one(
+    if STATS_FLUSH_ON_SIGTERM:
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+        except NotImplementedError:
+            pass  # Windows
+
+# Poslední zapsaný stav bot_guilds / bot_stats - on_ready po reconnectu zapisuje jen rozdíly
+synced_guilds = None  # {guild_id (str): dokument bez updated_at}
+synced_bot_stats = None
+
+def guild_document(guild) -> dict:
+    """Dokument serveru pro kolekci bot_guilds"""
+    return {
+        "id": str(guild.id),
+        "name": guild.name,
+        "icon": str(guild.icon.url) if guild.icon else None,
+        "memberCount": guild.member_count
+    }
+
+async def save_bot_stats():
+    """Ulož počet serverů do bot_stats, pokud se změnil"""
+    global synced_bot_stats
+    stats = {"guild_count": len(bot.guilds), "bot_name": str(bot.user)}
+    if stats == synced_bot_stats:
+        return
+    await bot_stats_collection.update_one(
         {"type": "global"},
-        {"$set": {
-            "guild_count": len(bot.guilds),
-            "bot_name": str(bot.user),
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }},
+        {"$set": {**stats, "updated_at": datetime.now(timezone.utc).isoformat()}},
         upsert=True
     )
+    synced_bot_stats = stats
+
+async def sync_guilds():
+    """Srovnej bot_guilds s bot.guilds jedním bulk_write (jen změněné servery)"""
+    global synced_guilds
+    if synced_guilds is None:
+        synced_guilds = {
+            doc["id"]: doc
+            async for doc in bot_guilds_collection.find({}, {"_id": 0, "id": 1, "name": 1, "icon": 1, "memberCount": 1})
+        }
     
-    # Uložit seznam serverů
-    for guild in bot.guilds:
-        users_collection.database.bot_guilds.update_one(
-            {"id": str(guild.id)},
-            {"$set": {
-                "id": str(guild.id),
-                "name": guild.name,
-                "icon": str(guild.icon.url) if guild.icon else None,
-                "memberCount": guild.member_count,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }},
-            upsert=True
-        )
+    now = datetime.now(timezone.utc).isoformat()
+    current = {str(guild.id): guild_document(guild) for guild in bot.guilds}
+    operations = [
+        UpdateOne({"id": guild_id}, {"$set": {**doc, "updated_at": now}}, upsert=True)
+        for guild_id, doc in current.items()
+        if synced_guilds.get(guild_id) != doc
+    ]
+    removed = [guild_id for guild_id in synced_guilds if guild_id not in current]
+    if removed:
+        operations.append(DeleteMany({"id": {"$in": removed}}))
+    
+    if operations:
+        await bot_guilds_collection.bulk_write(operations, ordered=False)
+        print(f'🗂️ Servery synchronizovány ({len(operations)} změn)', flush=True)
+    synced_guilds = current
+    
+    await save_bot_stats()
+
+async def save_guild(guild):
+    """Ulož jeden server do bot_guilds, pokud se změnil"""
+    doc = guild_document(guild)
+    if synced_guilds is not None and synced_guilds.get(doc["id"]) == doc:
+        return
+    await bot_guilds_collection.update_one(
+        {"id": doc["id"]},
+        {"$set": {**doc, "updated_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True
+    )
+    if synced_guilds is not None:
+        synced_guilds[doc["id"]] = doc
+
+@bot.event
+async def on_guild_join(guild):
+    print(f'➕ Bot přidán na server {guild.name}', flush=True)
+    await save_guild(guild)
+    await save_bot_stats()
+
+@bot.event
+async def on_guild_remove(guild):
+    print(f'➖ Bot odebrán ze serveru {guild.name}', flush=True)
+    await bot_guilds_collection.delete_one({"id": str(guild.id)})
+    if synced_guilds is not None:
+        synced_guilds.pop(str(guild.id), None)
+    await save_bot_stats()
+
+@bot.event
+async def on_guild_update(before, after):
+    await save_guild(after)
+
+startup_done = False  # jednorázová příprava proběhla (on_ready se volá po každém reconnectu)
+
+async def load_game_sessions():
+    """Načti aktivní herní sessions z databáze - presence worker čeká na game_sessions_loaded"""
+    try:
+        stored_sessions = await game_sessions_collection.find({}).to_list(None)
+        for session in stored_sessions:
+            user_id = session.get("user_id")
+            # Živá session z presence workeru je novější než snapshot v DB
+            if user_id and user_id not in active_gaming_sessions:
+                active_gaming_sessions[user_id] = {
+                    "game": session.get("game"),
+                    "start": session.get("start"),
+                    "guild_id": session.get("guild_id"),
+                    "user_name": session.get("user_name"),
+                    "last_seen": session.get("last_seen")
+                }
+        print(f'🎮 Načteno {len(stored_sessions)} aktivních herních sessions', flush=True)
+    except Exception as e:
+        print(f'❌ Chyba při načítání herních sessions: {e}', flush=True)
+    finally:
+        game_sessions_loaded.set()
+
+async def run_startup():
+    """Jednorázová příprava po prvním připojení - načtení stavu z DB a obnova po restartu"""
+    # Indexy a migrace statistik
+    try:
+        await ensure_indexes(db)
+        await migrate_daily_user_stats()
+        await backfill_server_daily_stats()
+    except Exception as e:
+        print(f'❌ Chyba při přípravě databáze: {e}', flush=True)
+    
+    # Nastavení příkazů pro všechny servery
+    try:
+        await load_guild_settings()
+    except Exception as e:
+        print(f'❌ Chyba při načítání nastavení serverů: {e}', flush=True)
+    
+    # Žebříčky hráčů
+    try:
+        await load_leaderboards()
+    except Exception as e:
+        print(f'❌ Chyba při načítání žebříčků: {e}', flush=True)
+    
+    # Reaction roles do indexu v paměti
+    try:
+        await load_reaction_roles()
+    except Exception as e:
+        print(f'❌ Chyba při načítání reaction roles: {e}', flush=True)
+    
+    await load_game_sessions()
+    try:
+        await sweep_game_sessions()
+    except Exception as e:
+        print(f'❌ Chyba při úklidu herních sessions: {e}', flush=True)
+    
+    # Časovače a živé zprávy (giveawaye, ankety, odpočty) z doby před restartem
+    try:
+        await restore_timers()
+    except Exception as e:
+        print(f'❌ Chyba při obnově časovačů: {e}', flush=True)
+    timers.start()
+    
+    # Voice sessions - kdo je ve voice teď a co zbylo z doby před restartem
+    try:
+        await restore_voice_sessions()
+    except Exception as e:
+        print(f'❌ Chyba při obnově voice sessions: {e}', flush=True)
     
     try:
         synced = await bot.tree.sync()
@@ -713,14 +1357,142 @@ async def on_ready():
     except Exception as e:
         print(f'❌ Chyba při synchronizaci: {e}', flush=True)
 
+@bot.event
+async def on_ready():
+    global startup_done
+    print(f'🤖 Bot {bot.user} je online!', flush=True)
+    print(f'📊 Připojen k {len(bot.guilds)} serverům', flush=True)
+    
+    start_background_tasks()
+    
+    # Po reconnectu je stav v paměti aktuálnější než DB - znovu nic nenačítej
+    if not startup_done:
+        startup_done = True
+        await run_startup()
+    
+    # Uložit seznam serverů a statistiky bota (jen změny)
+    try:
+        await sync_guilds()
+    except Exception as e:
+        print(f'❌ Chyba při ukládání serverů: {e}', flush=True)
+
 # ============== SERVER STATS SYSTEM ==============
 
 # Voice tracking - kdo kdy vstoupil do voice
-voice_sessions = {}  # {user_id: {"join_time": datetime, "channel_id": int, "guild_id": int}}
+voice_sessions = {}  # {user_id: {"join_time": datetime, "channel_id": int, "guild_id": int, "user_name": str}}
+
+# Sessions se nezapisují při každé události - jednou za VOICE_CHECKPOINT_INTERVAL
+# (a při vypnutí) se stav uloží jedním bulk_write, po restartu ho obnoví restore_voice_sessions
+VOICE_CHECKPOINT_INTERVAL = int(os.environ.get("VOICE_CHECKPOINT_INTERVAL", "300"))  # sekundy
+voice_sessions_ended = set()  # user_id ukončených sessions, jejichž checkpoint je třeba smazat
+voice_sessions_saved = set()  # user_id, které mají (nebo mohou mít) v DB checkpoint
+voice_checkpoint_lock = asyncio.Lock()  # checkpoint a úpravy při odchodu/přechodu se nepředbíhají
+voice_checkpoint_task = None
+
+async def checkpoint_voice_sessions():
+    """Ulož probíhající voice sessions a smaž ukončené - jedním bulk_write"""
+    async with voice_checkpoint_lock:
+        now = datetime.now(timezone.utc)
+        writes = [
+            UpdateOne({"user_id": user_id}, {"$set": {"user_id": user_id, **session, "checkpoint_at": now}}, upsert=True)
+            for user_id, session in voice_sessions.items()
+        ]
+        ended = {user_id for user_id in voice_sessions_ended if user_id not in voice_sessions}
+        writes += [DeleteOne({"user_id": user_id}) for user_id in ended]
+        voice_sessions_ended.clear()
+        if not writes:
+            return
+        # I při chybě mohla část zápisů projít - checkpoint v DB radši předpokládej
+        voice_sessions_saved.update(voice_sessions)
+        try:
+            await voice_sessions_collection.bulk_write(writes, ordered=False)
+        except Exception:
+            voice_sessions_ended.update(ended)  # smazání zkusí další checkpoint
+            raise
+        voice_sessions_saved.difference_update(ended)
+
+async def end_voice_session(user_id: int, session: dict, ended_at: datetime, next_session: dict = None) -> int:
+    """Připiš čas ukončené voice session a hned podle toho uprav její checkpoint
+    (smaž ho, nebo ulož novou session po přechodu do jiného kanálu). Vrací minuty.
+    
+    Checkpoint se mění před připsáním - pád mezi nimi minuty spíš ztratí, než aby
+    je obnova po restartu připsala podruhé nebo s původním časem vstupu."""
+    async with voice_checkpoint_lock:
+        # Bez uloženého checkpointu není co opravovat - obnova o session neví
+        if user_id in voice_sessions_saved:
+            try:
+                if next_session is None:
+                    await voice_sessions_collection.delete_one({"user_id": user_id})
+                    voice_sessions_saved.discard(user_id)
+                else:
+                    await voice_sessions_collection.update_one(
+                        {"user_id": user_id},
+                        {"$set": {"user_id": user_id, **next_session, "checkpoint_at": ended_at}},
+                        upsert=True
+                    )
+            except Exception as e:
+                print(f"[VOICE] Chyba při úpravě checkpointu: {e}", flush=True)
+                if next_session is None:
+                    voice_sessions_ended.add(user_id)  # smazání zkusí další checkpoint
+    
+    minutes = int((ended_at - session["join_time"]).total_seconds() / 60)
+    if minutes > 0:
+        await add_voice_time(session["guild_id"], user_id, session.get("user_name") or str(user_id), minutes)
+    return minutes
+
+async def voice_checkpoint_loop():
+    """Periodicky ukládej probíhající voice sessions"""
+    while True:
+        await asyncio.sleep(VOICE_CHECKPOINT_INTERVAL)
+        try:
+            await checkpoint_voice_sessions()
+        except Exception as e:
+            print(f"[VOICE] Chyba při ukládání sessions: {e}", flush=True)
+
+async def restore_voice_sessions():
+    """Po startu sestav voice sessions podle toho, kdo je právě ve voice kanálech.
+    Uložená session na stejném serveru pokračuje od původního vstupu; session, která
+    skončila, když byl bot offline, dostane čas do posledního checkpointu."""
+    now = datetime.now(timezone.utc)
+    previous = {doc["user_id"]: doc for doc in await voice_sessions_collection.find({}).to_list(None)}
+    voice_sessions_saved.update(previous)
+    # Sessions v paměti (reconnect) jsou čerstvější než checkpoint v DB
+    for user_id, session in voice_sessions.items():
+        previous[user_id] = {**session, "user_id": user_id, "checkpoint_at": now}
+    voice_sessions.clear()
+    
+    resumed = 0
+    for guild in bot.guilds:
+        for channel in guild.voice_channels:
+            for member in channel.members:
+                if member.bot:
+                    continue
+                join_time = now
+                session = previous.get(member.id)
+                if session and session["guild_id"] == guild.id:
+                    join_time = session["join_time"]
+                    del previous[member.id]
+                    resumed += 1
+                voice_sessions[member.id] = {
+                    "join_time": join_time,
+                    "channel_id": channel.id,
+                    "guild_id": guild.id,
+                    "user_name": member.display_name
+                }
+    
+    # Kdo už ve voice není, dostane čas do posledního checkpointu (a checkpoint se hned smaže)
+    for user_id, session in previous.items():
+        await end_voice_session(user_id, session, session["checkpoint_at"])
+    
+    await checkpoint_voice_sessions()
+    print(
+        f"🎙️ Voice sessions: {len(voice_sessions)} aktivních ({resumed} obnoveno), {len(previous)} uzavřeno",
+        flush=True
+    )
 
-def get_server_stats(guild_id: int) -> dict:
+async def get_server_stats(guild_id: int) -> dict:
     """Získej nebo vytvoř statistiky serveru"""
-    stats = server_stats_collection.find_one({"guild_id": guild_id})
+    stats = await server_stats_collection.find_one({"guild_id": guild_id})
     if not stats:
         stats = {
             "guild_id": guild_id,
@@ -728,43 +1500,157 @@ def get_server_stats(guild_id: int) -> dict:
             "total_voice_minutes": 0,
             "user_messages": {},  # {user_id: count}
             "user_voice": {},     # {user_id: minutes}
-            "daily_messages": 0,
-            "daily_voice": 0,
             "last_reset": datetime.now(timezone.utc).isoformat()
         }
-        server_stats_collection.insert_one(stats)
+        await server_stats_collection.insert_one(stats)
     return stats
 
+# Write-behind buffer pro statistiky - zprávy se nepíšou do DB jednotlivě,
+# ale sčítají se v paměti a periodicky se zapíšou jedním bulk_write
+STATS_FLUSH_INTERVAL = int(os.environ.get("STATS_FLUSH_INTERVAL", "5"))  # sekundy
+STATS_MAX_BUFFERED_KEYS = int(os.environ.get("STATS_MAX_BUFFERED_KEYS", "5000"))
+STATS_FLUSH_ON_SIGTERM = os.environ.get("STATS_FLUSH_ON_SIGTERM", "true").lower() in ("1", "true", "yes")
+
+# {(collection_name, filter_key): {"filter": dict, "inc": {field: n}, "set": {field: value}}}
+stats_buffer = {}
+stats_buffer_metrics = {
+    "buffered_ops": 0,    # kolik inkrementů přišlo do bufferu
+    "buffered_keys": 0,   # kolik různých polí ($inc/$set) aktuálně čeká
+    "flushed_ops": 0,     # kolik inkrementů bylo zapsáno do DB
+    "flushed_writes": 0,  # kolik UpdateOne operací odešlo v bulk_write
+    "flushes": 0,         # počet bulk_write volání
+    "errors": 0
+}
+stats_flush_lock = asyncio.Lock()
+stats_flush_task = None
+
+def buffer_stats_update(collection, filter_doc: dict, inc: dict, set_fields: dict = None):
+    """Přidej $inc/$set do write-behind bufferu (bez DB volání)"""
+    key = (collection.name, tuple(sorted(filter_doc.items())))
+    entry = stats_buffer.get(key)
+    if entry is None:
+        entry = stats_buffer[key] = {"collection": collection, "filter": filter_doc, "inc": {}, "set": {}, "ops": 0}
+    
+    for field, value in inc.items():
+        if field not in entry["inc"]:
+            entry["inc"][field] = 0
+            stats_buffer_metrics["buffered_keys"] += 1
+        entry["inc"][field] += value
+    
+    for field, value in (set_fields or {}).items():
+        if field not in entry["set"]:
+            stats_buffer_metrics["buffered_keys"] += 1
+        entry["set"][field] = value
+    
+    entry["ops"] += 1
+    stats_buffer_metrics["buffered_ops"] += 1
+    
+    # Příliš mnoho čekajících klíčů - vynuť flush hned
+    if stats_buffer_metrics["buffered_keys"] >= STATS_MAX_BUFFERED_KEYS and not stats_flush_lock.locked():
+        asyncio.create_task(flush_stats_buffer())
+
+def restore_stats_entry(entry: dict):
+    """Vrať nezapsanou položku do bufferu (po chybě flushe)
+
+    Mezitím mohla do bufferu přibýt novější data pro stejný filtr - inkrementy
+    se sečtou, ale $set hodnoty z bufferu mají přednost (jsou novější).
+    Počet zpráv se přičte původní, metrika přijatých zpráv se nemění.
+    """
+    key = (entry["collection"].name, tuple(sorted(entry["filter"].items())))
+    current = stats_buffer.get(key)
+    if current is None:
+        current = stats_buffer[key] = {"collection": entry["collection"], "filter": entry["filter"], "inc": {}, "set": {}, "ops": 0}
+    
+    for field, value in entry["inc"].items():
+        if field not in current["inc"]:
+            current["inc"][field] = 0
+            stats_buffer_metrics["buffered_keys"] += 1
+        current["inc"][field] += value
+    
+    for field, value in entry["set"].items():
+        if field not in current["set"]:
+            current["set"][field] = value
+            stats_buffer_metrics["buffered_keys"] += 1
+    
+    current["ops"] += entry["ops"]
+
+async def flush_stats_buffer():
+    """Zapiš obsah bufferu do DB - jeden bulk_write na kolekci"""
+    async with stats_flush_lock:
+        if not stats_buffer:
+            return
+        
+        pending = dict(stats_buffer)
+        stats_buffer.clear()
+        stats_buffer_metrics["buffered_keys"] = 0
+        
+        by_collection = {}
+        for entry in pending.values():
+            update = {}
+            if entry["inc"]:
+                update["$inc"] = entry["inc"]
+            if entry["set"]:
+                update["$set"] = entry["set"]
+            by_collection.setdefault(entry["collection"].name, (entry["collection"], []))[1].append(
+                (UpdateOne(entry["filter"], update, upsert=True), entry)
+            )
+        
+        for collection, operations in by_collection.values():
+            try:
+                await collection.bulk_write([op for op, _ in operations], ordered=False)
+                stats_buffer_metrics["flushes"] += 1
+                stats_buffer_metrics["flushed_writes"] += len(operations)
+                stats_buffer_metrics["flushed_ops"] += sum(entry["ops"] for _, entry in operations)
+            except Exception as e:
+                # Vrať data zpět do bufferu, zkusí se to při dalším flushi
+                stats_buffer_metrics["errors"] += 1
+                print(f"[STATS] Chyba při zápisu statistik: {e}", flush=True)
+                for _, entry in operations:
+                    restore_stats_entry(entry)
+
+async def stats_flush_loop():
+    """Periodicky zapisuj buffer statistik do DB"""
+    while True:
+        await asyncio.sleep(STATS_FLUSH_INTERVAL)
+        try:
+            await flush_stats_buffer()
+            await flush_xp_ledger()
+        except Exception as e:
+            print(f"[STATS] Flush loop error: {e}", flush=True)
+
 def increment_message_count(guild_id: int, user_id: int, user_name: str):
-    """Přidej zprávu do statistik"""
+    """Přidej zprávu do statistik (přes write-behind buffer)"""
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    server_stats_collection.update_one(
+    buffer_stats_update(
+        server_stats_collection,
         {"guild_id": guild_id},
         {
-            "$inc": {
-                "total_messages": 1,
-                "daily_messages": 1,
-                f"user_messages.{user_id}": 1,
-                f"daily_user_messages.{today}.{user_id}": 1
-            },
-            "$set": {
-                f"user_names.{user_id}": user_name
-            }
+            "total_messages": 1,
+            f"user_messages.{user_id}": 1
         },
-        upsert=True
+        {f"user_names.{user_id}": user_name}
+    )
+    buffer_stats_update(
+        daily_stats_collection,
+        {"guild_id": guild_id, "day": today, "user_id": user_id},
+        {"messages": 1},
+        {"user_name": user_name}
+    )
+    buffer_stats_update(
+        server_daily_collection,
+        {"guild_id": guild_id, "day": today},
+        {"messages": 1}
     )
 
-def add_voice_time(guild_id: int, user_id: int, user_name: str, minutes: int):
+async def add_voice_time(guild_id: int, user_id: int, user_name: str, minutes: int):
     """Přidej voice čas do statistik"""
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    server_stats_collection.update_one(
+    await server_stats_collection.update_one(
         {"guild_id": guild_id},
         {
             "$inc": {
                 "total_voice_minutes": minutes,
-                "daily_voice": minutes,
-                f"user_voice.{user_id}": minutes,
-                f"daily_user_voice.{today}.{user_id}": minutes
+                f"user_voice.{user_id}": minutes
             },
             "$set": {
                 f"user_names.{user_id}": user_name
@@ -772,6 +1658,155 @@ def add_voice_time(guild_id: int, user_id: int, user_name: str, minutes: int):
         },
         upsert=True
     )
+    await daily_stats_collection.update_one(
+        {"guild_id": guild_id, "day": today, "user_id": user_id},
+        {"$inc": {"voice_minutes": minutes}, "$set": {"user_name": user_name}},
+        upsert=True
+    )
+    await server_daily_collection.update_one(
+        {"guild_id": guild_id, "day": today},
+        {"$inc": {"voice_minutes": minutes}},
+        upsert=True
+    )
+
+def period_start_day(period: int) -> str:
+    """První den okna posledních `period` dní (včetně dneška, UTC)"""
+    return (datetime.now(timezone.utc) - timedelta(days=period - 1)).strftime("%Y-%m-%d")
+
+async def get_period_stats(guild_id: int, period: int, top_n: int = 5) -> dict:
+    """Součty a TOP uživatelé za posledních `period` dní - čte jen denní buckety v okně"""
+    start_day = period_start_day(period)
+    
+    # Součty serveru: max. `period` dokumentů
+    messages = 0
+    voice_minutes = 0
+    async for bucket in server_daily_collection.find({"guild_id": guild_id, "day": {"$gte": start_day}}):
+        messages += bucket.get("messages", 0)
+        voice_minutes += bucket.get("voice_minutes", 0)
+    
+    # TOP uživatelé: součet jejich denních bucketů v okně
+    result = await daily_stats_collection.aggregate([
+        {"$match": {"guild_id": guild_id, "day": {"$gte": start_day}}},
+        {"$sort": {"day": 1}},  # $last = jméno z nejnovějšího dne
+        {"$group": {
+            "_id": "$user_id",
+            "messages": {"$sum": "$messages"},
+            "voice_minutes": {"$sum": "$voice_minutes"},
+            "user_name": {"$last": "$user_name"}
+        }},
+        {"$facet": {
+            "top_messages": [{"$match": {"messages": {"$gt": 0}}}, {"$sort": {"messages": -1}}, {"$limit": top_n}],
+            "top_voice": [{"$match": {"voice_minutes": {"$gt": 0}}}, {"$sort": {"voice_minutes": -1}}, {"$limit": top_n}]
+        }}
+    ]).to_list(1)
+    top = result[0] if result else {"top_messages": [], "top_voice": []}
+    
+    return {
+        "messages": messages,
+        "voice_minutes": voice_minutes,
+        "top_messages": top["top_messages"],
+        "top_voice": top["top_voice"]
+    }
+
+async def migration_done(name: str) -> bool:
+    """Proběhla už jednorázová migrace `name`?"""
+    return await migrations_collection.find_one({"_id": name}, {"_id": 1}) is not None
+
+async def mark_migration_done(name: str):
+    await migrations_collection.update_one(
+        {"_id": name},
+        {"$setOnInsert": {"done_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+async def backfill_server_daily_stats():
+    """Jednorázově dopočítej server_daily_stats z daily_user_stats (starší data).
+    Uzavřené dny se zapíšou přes $set, takže opakované spuštění nic nezdvojí.
+    Do dnešního bucketu mezitím přičítá buffer statistik - ten se jen zvedne přes $max.
+    Značka v bot_migrations se zapíše až po úspěšném dokončení, přerušený běh se zopakuje."""
+    if await migration_done("server_daily_stats"):
+        return
+    
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    
+    totals = await daily_stats_collection.aggregate([
+        {"$group": {
+            "_id": {"guild_id": "$guild_id", "day": "$day"},
+            "messages": {"$sum": "$messages"},
+            "voice_minutes": {"$sum": "$voice_minutes"}
+        }}
+    ]).to_list(None)
+    
+    operations = [
+        UpdateOne(
+            {"guild_id": total["_id"]["guild_id"], "day": total["_id"]["day"]},
+            {"$max" if total["_id"]["day"] >= today else "$set": {
+                "messages": total["messages"], "voice_minutes": total["voice_minutes"]
+            }},
+            upsert=True
+        )
+        for total in totals
+    ]
+    if operations:
+        await server_daily_collection.bulk_write(operations, ordered=False)
+        print(f"[STATS] Dopočítáno {len(operations)} denních součtů serverů", flush=True)
+    await mark_migration_done("server_daily_stats")
+
+async def migrate_daily_user_stats():
+    """Jednorázová migrace daily_user_messages/daily_user_voice ze server_stats do daily_user_stats.
+    
+    Každý cílový dokument dostane staré čítače jediným upsertem podmíněným
+    značkou legacy_migrated. Pád mezi zápisem a odstraněním starých map proto
+    při dalším běhu nic nezdvojí - upsert už migrovaného dokumentu skončí
+    chybou duplicitního klíče, která se přeskočí.
+    """
+    if await migration_done("daily_user_stats"):
+        return
+    
+    cursor = server_stats_collection.find(
+        {"$or": [{"daily_user_messages": {"$exists": True}}, {"daily_user_voice": {"$exists": True}}]},
+        {"guild_id": 1, "daily_user_messages": 1, "daily_user_voice": 1, "user_names": 1}
+    )
+    migrated = 0
+    async for stats in cursor:
+        guild_id = stats["guild_id"]
+        user_names = stats.get("user_names", {})
+        
+        counters = {}  # (day, uid) -> {"messages": n, "voice_minutes": n}
+        for field, counter in (("daily_user_messages", "messages"), ("daily_user_voice", "voice_minutes")):
+            for day, users in stats.get(field, {}).items():
+                for uid, value in users.items():
+                    counters.setdefault((day, uid), {})[counter] = value
+        
+        operations = []
+        for (day, uid), inc in counters.items():
+            update = {"$inc": inc, "$set": {"legacy_migrated": True}}
+            if uid in user_names:
+                # Jméno z dokumentu, který už zapsal nový kód, je novější
+                update["$setOnInsert"] = {"user_name": user_names[uid]}
+            operations.append(UpdateOne(
+                {"guild_id": guild_id, "day": day, "user_id": int(uid), "legacy_migrated": {"$ne": True}},
+                update,
+                upsert=True
+            ))
+        
+        if operations:
+            try:
+                await daily_stats_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+        
+        # Odstraň staré vnořené mapy (a nikdy neresetované denní čítače)
+        await server_stats_collection.update_one(
+            {"_id": stats["_id"]},
+            {"$unset": {"daily_user_messages": "", "daily_user_voice": "", "daily_messages": "", "daily_voice": ""}}
+        )
+        migrated += len(operations)
+    
+    await mark_migration_done("daily_user_stats")
+    if migrated:
+        print(f"[STATS] Migrováno {migrated} denních záznamů do daily_user_stats", flush=True)
 
 @bot.event
 async def on_voice_state_update(member, before, after):
@@ -787,38 +1822,33 @@ async def on_voice_state_update(member, before, after):
         voice_sessions[user_id] = {
             "join_time": datetime.now(timezone.utc),
             "channel_id": after.channel.id,
-            "guild_id": guild_id
+            "guild_id": guild_id,
+            "user_name": member.display_name
         }
         print(f"[VOICE] {member.display_name} vstoupil do {after.channel.name}", flush=True)
     
     # Uživatel opustil voice kanál
     elif before.channel is not None and after.channel is None:
-        if user_id in voice_sessions:
-            session = voice_sessions[user_id]
-            duration = datetime.now(timezone.utc) - session["join_time"]
-            minutes = int(duration.total_seconds() / 60)
-            
+        session = voice_sessions.pop(user_id, None)
+        if session is not None:
+            session["user_name"] = member.display_name
+            minutes = await end_voice_session(user_id, session, datetime.now(timezone.utc))
             if minutes > 0:
-                add_voice_time(guild_id, user_id, member.display_name, minutes)
                 print(f"[VOICE] {member.display_name} byl ve voice {minutes} minut", flush=True)
-            
-            del voice_sessions[user_id]
     
     # Uživatel přešel do jiného kanálu
     elif before.channel != after.channel:
-        if user_id in voice_sessions:
-            session = voice_sessions[user_id]
-            duration = datetime.now(timezone.utc) - session["join_time"]
-            minutes = int(duration.total_seconds() / 60)
-            
-            if minutes > 0:
-                add_voice_time(guild_id, user_id, member.display_name, minutes)
-            
+        session = voice_sessions.get(user_id)
+        if session is not None:
+            now = datetime.now(timezone.utc)
+            session["user_name"] = member.display_name
             voice_sessions[user_id] = {
-                "join_time": datetime.now(timezone.utc),
+                "join_time": now,
                 "channel_id": after.channel.id,
-                "guild_id": guild_id
+                "guild_id": guild_id,
+                "user_name": member.display_name
             }
+            await end_voice_session(user_id, session, now, next_session=voice_sessions[user_id])
 
 class ServerStatsView(discord.ui.View):
     def __init__(self, guild_id: int, period: int = 1):
@@ -860,33 +1890,30 @@ class ServerStatsView(discord.ui.View):
 
 async def create_stats_embed(guild, period: int = 1) -> discord.Embed:
     """Vytvoří embed se statistikami"""
-    stats = get_server_stats(guild.id)
+    stats = await get_server_stats(guild.id)
+    period_stats = await get_period_stats(guild.id, period)
     
     # Základní statistiky
     total_members = guild.member_count
     online_members = sum(1 for m in guild.members if m.status != discord.Status.offline)
     total_messages = stats.get("total_messages", 0)
     total_voice = stats.get("total_voice_minutes", 0)
-    daily_messages = stats.get("daily_messages", 0)
-    daily_voice = stats.get("daily_voice", 0)
+    period_messages = period_stats["messages"]
+    period_voice = period_stats["voice_minutes"]
     
     # Období text
     period_text = f"Posledních {period} {'den' if period == 1 else 'dní'}"
+    period_label = "dnes" if period == 1 else f"za {period} dní"
     
     # Formátování voice času
     voice_hours = total_voice // 60
     voice_mins = total_voice % 60
-    daily_voice_hours = daily_voice // 60
-    daily_voice_mins = daily_voice % 60
+    period_voice_hours = period_voice // 60
+    period_voice_mins = period_voice % 60
     
-    # Top 5 pisatelů
-    user_messages = stats.get("user_messages", {})
-    user_names = stats.get("user_names", {})
-    sorted_messages = sorted(user_messages.items(), key=lambda x: x[1], reverse=True)[:5]
-    
-    # Top 5 voice aktivita
-    user_voice = stats.get("user_voice", {})
-    sorted_voice = sorted(user_voice.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Top 5 pisatelů a voice aktivita za období
+    sorted_messages = [(user["_id"], user["messages"], user.get("user_name")) for user in period_stats["top_messages"]]
+    sorted_voice = [(user["_id"], user["voice_minutes"], user.get("user_name")) for user in period_stats["top_voice"]]
     
     # Vytvoř embed
     embed = discord.Embed(
@@ -906,12 +1933,12 @@ async def create_stats_embed(guild, period: int = 1) -> discord.Embed:
     )
     embed.add_field(
         name="💬 Zprávy",
-        value=f"```\n{total_messages:,} celkem\n{daily_messages:,} dnes\n```",
+        value=f"```\n{total_messages:,} celkem\n{period_messages:,} {period_label}\n```",
         inline=True
     )
     embed.add_field(
         name="🎤 Voice",
-        value=f"```\n{voice_hours}h {voice_mins}m celkem\n{daily_voice_hours}h {daily_voice_mins}m dnes\n```",
+        value=f"```\n{voice_hours}h {voice_mins}m celkem\n{period_voice_hours}h {period_voice_mins}m {period_label}\n```",
         inline=True
     )
     
@@ -919,8 +1946,8 @@ async def create_stats_embed(guild, period: int = 1) -> discord.Embed:
     if sorted_messages:
         top_writers = []
         medals = ["🥇", "🥈", "🥉", "4.", "5."]
-        for i, (uid, count) in enumerate(sorted_messages):
-            name = user_names.get(uid, f"User {uid}")[:15]
+        for i, (uid, count, user_name) in enumerate(sorted_messages):
+            name = (user_name or f"User {uid}")[:15]
             top_writers.append(f"{medals[i]} **{name}**: {count:,}")
         embed.add_field(
             name="✍️ TOP Pisatelé",
@@ -932,8 +1959,8 @@ async def create_stats_embed(guild, period: int = 1) -> discord.Embed:
     if sorted_voice:
         top_voice = []
         medals = ["🥇", "🥈", "🥉", "4.", "5."]
-        for i, (uid, mins) in enumerate(sorted_voice):
-            name = user_names.get(uid, f"User {uid}")[:15]
+        for i, (uid, mins, user_name) in enumerate(sorted_voice):
+            name = (user_name or f"User {uid}")[:15]
             h = mins // 60
             m = mins % 60
             time_str = f"{h}h {m}m" if h > 0 else f"{m}m"
@@ -1790,6 +2817,32 @@ async def playtrack_command(interaction: discord.Interaction, query: str):
 
 reaction_roles_collection = db["reaction_roles"]
 
+# Index v paměti {message_id: {emoji: role_id}} - reakce na ostatní zprávy se odmítnou
+# bez dotazu do DB. Načte se při startu a udržují ho příkazy níže (jiný zapisovatel není).
+reaction_role_index = {}
+
+def index_reaction_role(rr_data: dict, index: dict = None):
+    """Zapiš reaction role zprávu do indexu (při duplicitním emoji platí první role jako dřív)"""
+    roles = {}
+    if rr_data.get("type") == "multi":
+        for r in rr_data.get("roles", []):
+            roles.setdefault(r["emoji"], r["role_id"])
+    elif rr_data.get("emoji"):
+        roles[rr_data["emoji"]] = rr_data.get("role_id")
+    (reaction_role_index if index is None else index)[rr_data["message_id"]] = roles
+
+async def load_reaction_roles():
+    """Načti všechny reaction role zprávy do indexu (jednou při startu)"""
+    # Staví se stranou - reakce během načítání nenarazí na poloprázdný index
+    loaded = {}
+    async for rr_data in reaction_roles_collection.find({}, {"message_id": 1, "type": 1, "roles": 1, "emoji": 1, "role_id": 1}):
+        index_reaction_role(rr_data, loaded)
+    # Zprávy vytvořené příkazem během načítání už v indexu jsou a jsou novější
+    loaded.update(reaction_role_index)
+    reaction_role_index.clear()
+    reaction_role_index.update(loaded)
+    print(f'🎭 Načteno {len(reaction_role_index)} reaction role zpráv', flush=True)
+
 class ReactionRoleView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -1840,7 +2893,7 @@ async def reactionrole_command(
         return
     
     # Ulož do databáze
-    reaction_roles_collection.update_one(
+    await reaction_roles_collection.update_one(
         {"message_id": message.id},
         {"$set": {
             "message_id": message.id,
@@ -1853,6 +2906,7 @@ async def reactionrole_command(
         }},
         upsert=True
     )
+    reaction_role_index[message.id] = {emoji: role.id}
     
     await interaction.followup.send(f"✅ Reaction role vytvořena! Uživatelé mohou kliknout na {emoji} pro získání role **{role.name}**", ephemeral=True)
 
@@ -1881,7 +2935,7 @@ async def multireactionrole_command(
     message = await interaction.channel.send(embed=embed)
     
     # Ulož základní zprávu
-    reaction_roles_collection.insert_one({
+    await reaction_roles_collection.insert_one({
         "message_id": message.id,
         "channel_id": interaction.channel_id,
         "guild_id": interaction.guild_id,
@@ -1890,6 +2944,7 @@ async def multireactionrole_command(
         "created_by": interaction.user.id,
         "created_at": datetime.now(timezone.utc).isoformat()
     })
+    reaction_role_index[message.id] = {}
     
     await interaction.followup.send(f"✅ Multi-role zpráva vytvořena! ID zprávy: `{message.id}`\nPoužij `/addrole {message.id} @role 🎮` pro přidání rolí.", ephemeral=True)
 
@@ -1915,7 +2970,7 @@ async def addrole_command(
         return
     
     # Najdi zprávu v databázi
-    rr_data = reaction_roles_collection.find_one({"message_id": msg_id, "guild_id": interaction.guild_id})
+    rr_data = await reaction_roles_collection.find_one({"message_id": msg_id, "guild_id": interaction.guild_id})
     
     if not rr_data:
         await interaction.response.send_message("❌ Tato zpráva není reaction role zpráva!", ephemeral=True)
@@ -1939,14 +2994,14 @@ async def addrole_command(
     # Aktualizuj databázi
     if rr_data.get("type") == "multi":
         # Multi-role zpráva
-        reaction_roles_collection.update_one(
+        await reaction_roles_collection.update_one(
             {"message_id": msg_id},
             {"$push": {"roles": {"role_id": role.id, "emoji": emoji}}}
         )
     else:
         # Převeď na multi pokud přidáváme další roli
         existing_role = {"role_id": rr_data.get("role_id"), "emoji": rr_data.get("emoji")}
-        reaction_roles_collection.update_one(
+        await reaction_roles_collection.update_one(
             {"message_id": msg_id},
             {"$set": {
                 "type": "multi",
@@ -1960,7 +3015,8 @@ async def addrole_command(
     
     # Přidej roli do popisu
     roles_text = ""
-    updated_data = reaction_roles_collection.find_one({"message_id": msg_id})
+    updated_data = await reaction_roles_collection.find_one({"message_id": msg_id})
+    index_reaction_role(updated_data)
     if updated_data.get("type") == "multi":
         for r in updated_data.get("roles", []):
             role_obj = interaction.guild.get_role(r["role_id"])
@@ -1979,7 +3035,7 @@ async def addrole_command(
 async def listreactionroles_command(interaction: discord.Interaction):
     """Zobrazí seznam všech reaction role zpráv na serveru"""
     
-    rr_list = list(reaction_roles_collection.find({"guild_id": interaction.guild_id}))
+    rr_list = await reaction_roles_collection.find({"guild_id": interaction.guild_id}).to_list(None)
     
     if not rr_list:
         await interaction.response.send_message("📋 Na tomto serveru nejsou žádné reaction role zprávy.", ephemeral=True)
@@ -2026,11 +3082,12 @@ async def deletereactionrole_command(interaction: discord.Interaction, message_i
         return
     
     # Najdi a smaž z databáze
-    result = reaction_roles_collection.delete_one({"message_id": msg_id, "guild_id": interaction.guild_id})
+    result = await reaction_roles_collection.delete_one({"message_id": msg_id, "guild_id": interaction.guild_id})
     
     if result.deleted_count == 0:
         await interaction.response.send_message("❌ Reaction role zpráva nenalezena!", ephemeral=True)
         return
+    reaction_role_index.pop(msg_id, None)
     
     await interaction.response.send_message(f"✅ Reaction role smazána! (Zprávu na Discordu můžeš smazat ručně)", ephemeral=True)
 
@@ -2041,10 +3098,14 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     if payload.user_id == bot.user.id:
         return
     
-    # Najdi reaction role
-    rr_data = reaction_roles_collection.find_one({"message_id": payload.message_id})
+    # Najdi reaction role - ostatní zprávy skončí na chybějícím klíči
+    roles = reaction_role_index.get(payload.message_id)
+    if not roles:
+        return
     
-    if not rr_data:
+    # Najdi správnou roli
+    role_id = roles.get(str(payload.emoji))
+    if not role_id:
         return
     
     guild = bot.get_guild(payload.guild_id)
@@ -2055,28 +3116,13 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     if not member:
         return
     
-    emoji_str = str(payload.emoji)
-    
-    # Najdi správnou roli
-    role_id = None
-    
-    if rr_data.get("type") == "multi":
-        for r in rr_data.get("roles", []):
-            if r["emoji"] == emoji_str:
-                role_id = r["role_id"]
-                break
-    else:
-        if rr_data.get("emoji") == emoji_str:
-            role_id = rr_data.get("role_id")
-    
-    if role_id:
-        role = guild.get_role(role_id)
-        if role and role not in member.roles:
-            try:
-                await member.add_roles(role, reason="Reaction Role")
-                print(f"[REACTION ROLE] {member.display_name} získal roli {role.name}", flush=True)
-            except discord.Forbidden:
-                print(f"[REACTION ROLE] Nelze přidat roli {role.name} - chybí oprávnění", flush=True)
+    role = guild.get_role(role_id)
+    if role and role not in member.roles:
+        try:
+            await member.add_roles(role, reason="Reaction Role")
+            print(f"[REACTION ROLE] {member.display_name} získal roli {role.name}", flush=True)
+        except discord.Forbidden:
+            print(f"[REACTION ROLE] Nelze přidat roli {role.name} - chybí oprávnění", flush=True)
 
 @bot.event
 async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
@@ -2084,10 +3130,14 @@ async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
     if payload.user_id == bot.user.id:
         return
     
-    # Najdi reaction role
-    rr_data = reaction_roles_collection.find_one({"message_id": payload.message_id})
+    # Najdi reaction role - ostatní zprávy skončí na chybějícím klíči
+    roles = reaction_role_index.get(payload.message_id)
+    if not roles:
+        return
     
-    if not rr_data:
+    # Najdi správnou roli
+    role_id = roles.get(str(payload.emoji))
+    if not role_id:
         return
     
     guild = bot.get_guild(payload.guild_id)
@@ -2098,28 +3148,13 @@ async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
     if not member:
         return
     
-    emoji_str = str(payload.emoji)
-    
-    # Najdi správnou roli
-    role_id = None
-    
-    if rr_data.get("type") == "multi":
-        for r in rr_data.get("roles", []):
-            if r["emoji"] == emoji_str:
-                role_id = r["role_id"]
-                break
-    else:
-        if rr_data.get("emoji") == emoji_str:
-            role_id = rr_data.get("role_id")
-    
-    if role_id:
-        role = guild.get_role(role_id)
-        if role and role in member.roles:
-            try:
-                await member.remove_roles(role, reason="Reaction Role removed")
-                print(f"[REACTION ROLE] {member.display_name} ztratil roli {role.name}", flush=True)
-            except discord.Forbidden:
-                print(f"[REACTION ROLE] Nelze odebrat roli {role.name} - chybí oprávnění", flush=True)
+    role = guild.get_role(role_id)
+    if role and role in member.roles:
+        try:
+            await member.remove_roles(role, reason="Reaction Role removed")
+            print(f"[REACTION ROLE] {member.display_name} ztratil roli {role.name}", flush=True)
+        except discord.Forbidden:
+            print(f"[REACTION ROLE] Nelze odebrat roli {role.name} - chybí oprávnění", flush=True)
 
 # ============== GIVEAWAY SYSTEM ==============
 
@@ -2132,26 +3167,44 @@ class GiveawayView(discord.ui.View):
         self.prize = prize
         self.end_time = end_time
         self.host_id = host_id
-        self.participants = set()
     
     @discord.ui.button(label="🎉 Zúčastnit se", style=discord.ButtonStyle.green, custom_id="giveaway_join")
     async def join_giveaway(self, interaction: discord.Interaction, button: discord.ui.Button):
         user_id = interaction.user.id
         
-        if user_id in self.participants:
-            self.participants.discard(user_id)
-            await interaction.response.send_message("❌ Odhlásil ses ze soutěže!", ephemeral=True)
-        else:
-            self.participants.add(user_id)
+        if self.giveaway_id not in active_giveaways:
+            await interaction.response.send_message("❌ Tato soutěž již skončila!", ephemeral=True)
+            return
+        
+        # Přihláška je dokument s unikátním (giveaway_id, user_id) - druhé kliknutí odhlásí
+        try:
+            await giveaway_entries_collection.insert_one({
+                "giveaway_id": self.giveaway_id,
+                "user_id": user_id,
+                "joined_at": datetime.now(timezone.utc)
+            })
+            change = 1
             await interaction.response.send_message("✅ Jsi přihlášen do soutěže! Hodně štěstí! 🍀", ephemeral=True)
+        except DuplicateKeyError:
+            result = await giveaway_entries_collection.delete_one({"giveaway_id": self.giveaway_id, "user_id": user_id})
+            change = -result.deleted_count
+            await interaction.response.send_message("❌ Odhlásil ses ze soutěže!", ephemeral=True)
+        
+        giveaway = await giveaways_collection.find_one_and_update(
+            {"giveaway_id": self.giveaway_id},
+            {"$inc": {"participants_count": change}},
+            projection={"participants_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
         
         # Update embed with participant count
-        await self.update_embed(interaction.message)
+        if giveaway:
+            await self.update_embed(interaction.message, giveaway["participants_count"])
     
-    async def update_embed(self, message):
+    async def update_embed(self, message, participants_count: int):
         embed = message.embeds[0]
-        embed.set_field_at(1, name="👥 Účastníků", value=str(len(self.participants)), inline=True)
-        await message.edit(embed=embed)
+        embed.set_field_at(1, name="👥 Účastníků", value=str(participants_count), inline=True)
+        message_edits.schedule(message, embed=embed)
 
 @bot.tree.command(name="giveaway", description="Vytvoř novou soutěž (jen admin)")
 @app_commands.describe(
@@ -2195,88 +3248,163 @@ async def giveaway_command(interaction: discord.Interaction, cas: str, vyhry: in
     message = await interaction.original_response()
     
     # Store giveaway
-    active_giveaways[giveaway_id] = {
+    giveaway = {
+        "giveaway_id": giveaway_id,
         "message_id": message.id,
         "channel_id": interaction.channel_id,
         "guild_id": interaction.guild_id,
         "prize": cena,
         "winners_count": vyhry,
         "end_time": end_time,
-        "host_id": interaction.user.id,
-        "view": view
+        "host_id": interaction.user.id
     }
+    await giveaways_collection.insert_one({**giveaway, "participants_count": 0, "ended": False})
+    active_giveaways[giveaway_id] = {**giveaway, "view": view}
     
     # Schedule end
-    bot.loop.create_task(end_giveaway_after(giveaway_id, seconds))
-
-async def end_giveaway_after(giveaway_id: str, seconds: int):
-    """End giveaway after specified time"""
-    await asyncio.sleep(seconds)
-    await end_giveaway(giveaway_id)
+    schedule_giveaway_end(giveaway_id, end_time)
+
+def schedule_giveaway_end(giveaway_id: str, end_time: datetime):
+    timers.schedule("giveaway_end", end_time, {"giveaway_id": giveaway_id}, timer_id=f"giveaway:{giveaway_id}")
+
+async def restore_giveaways():
+    """Po restartu obnov běžící giveawaye - tlačítko a časovač konce (přihlášky jsou v DB)"""
+    scheduled = {timer["payload"]["giveaway_id"] for timer in timers.pending("giveaway_end")}
+    async for doc in giveaways_collection.find({"ended": False}):
+        giveaway_id = doc["giveaway_id"]
+        if giveaway_id in active_giveaways:
+            continue
+        view = GiveawayView(giveaway_id, doc["prize"], doc["end_time"], doc["host_id"])
+        view.winners_count = doc["winners_count"]
+        bot.add_view(view, message_id=doc["message_id"])
+        
+        doc.pop("_id", None)
+        active_giveaways[giveaway_id] = {**doc, "view": view}
+        if giveaway_id not in scheduled:
+            schedule_giveaway_end(giveaway_id, doc["end_time"])
+    return len(active_giveaways)
+
+@timers.handler("giveaway_end")
+async def giveaway_end_timer(payload: dict):
+    await end_giveaway(payload["giveaway_id"])
+
+async def draw_giveaway_winners(giveaway_id: str, count: int, exclude: list = ()) -> list:
+    """Vylosuj výherce v DB ($sample) - přihlášky se nenačítají do paměti"""
+    winners = []
+    # $sample nad velkou kolekcí může vrátit dokument víckrát - dolosuj chybějící
+    for _ in range(3):
+        match = {"giveaway_id": giveaway_id}
+        if exclude or winners:
+            match["user_id"] = {"$nin": list(exclude) + winners}
+        sampled = await giveaway_entries_collection.aggregate([
+            {"$match": match},
+            {"$sample": {"size": count - len(winners)}},
+            {"$project": {"_id": 0, "user_id": 1}}
+        ]).to_list(None)
+        if not sampled:
+            break
+        for entry in sampled:
+            if entry["user_id"] not in winners:
+                winners.append(entry["user_id"])
+        if len(winners) >= count:
+            break
+    return winners[:count]
 
 async def end_giveaway(giveaway_id: str):
-    """End a giveaway and pick winners"""
-    if giveaway_id not in active_giveaways:
+    """End a giveaway and pick winners - výsledek se uloží dřív, než se oznámí"""
+    giveaway = active_giveaways.pop(giveaway_id, None)
+    if giveaway is None:
         return
+    giveaway["view"].stop()
     
-    giveaway = active_giveaways[giveaway_id]
-    view = giveaway["view"]
+    stored = await giveaways_collection.find_one({"giveaway_id": giveaway_id, "ended": False}, {"participants_count": 1})
+    if not stored:
+        return
+    participants_count = stored.get("participants_count", 0)
+    winners = await draw_giveaway_winners(giveaway_id, giveaway["winners_count"]) if participants_count else []
     
+    # Podmínka na ended: False - výherce uloží (a oznámí) jen jeden volající
+    result = await giveaways_collection.update_one(
+        {"giveaway_id": giveaway_id, "ended": False},
+        {"$set": {"ended": True, "winners": winners}}
+    )
+    if not result.matched_count:
+        return
+    
+    # Oznámení je best-effort, výsledek už je v DB
     channel = bot.get_channel(giveaway["channel_id"])
     if not channel:
         return
     
     try:
         message = await channel.fetch_message(giveaway["message_id"])
-    except:
-        return
-    
-    participants = list(view.participants)
-    winners_count = min(giveaway["winners_count"], len(participants))
-    
-    if winners_count == 0:
-        # No participants
-        embed = discord.Embed(
-            title="🎁 GIVEAWAY UKONČEN",
-            description=f"**{giveaway['prize']}**\n\n😢 Nikdo se nezúčastnil!",
-            color=discord.Color.red()
-        )
-        await message.edit(embed=embed, view=None)
-    else:
-        # Pick winners
-        import random
-        winners = random.sample(participants, winners_count)
-        winners_mentions = ", ".join([f"<@{w}>" for w in winners])
-        
-        embed = discord.Embed(
-            title="🎉 GIVEAWAY UKONČEN!",
-            description=f"**{giveaway['prize']}**",
-            color=discord.Color.green()
-        )
-        embed.add_field(name="🏆 Výherci", value=winners_mentions, inline=False)
-        embed.add_field(name="👥 Celkem účastníků", value=str(len(participants)), inline=True)
-        
-        await message.edit(embed=embed, view=None)
-        
-        # Announce winners
-        await channel.send(f"🎉 Gratulujeme {winners_mentions}! Vyhráli jste **{giveaway['prize']}**!")
+    except discord.HTTPException:
+        message = None
     
-    # Remove from active
-    del active_giveaways[giveaway_id]
+    try:
+        if not winners:
+            # No participants
+            embed = discord.Embed(
+                title="🎁 GIVEAWAY UKONČEN",
+                description=f"**{giveaway['prize']}**\n\n😢 Nikdo se nezúčastnil!",
+                color=discord.Color.red()
+            )
+            if message:
+                await message_edits.edit_now(message, embed=embed, view=None)
+        else:
+            winners_mentions = ", ".join([f"<@{w}>" for w in winners])
+            
+            embed = discord.Embed(
+                title="🎉 GIVEAWAY UKONČEN!",
+                description=f"**{giveaway['prize']}**",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="🏆 Výherci", value=winners_mentions, inline=False)
+            embed.add_field(name="👥 Celkem účastníků", value=str(participants_count), inline=True)
+            
+            if message:
+                await message_edits.edit_now(message, embed=embed, view=None)
+            
+            # Announce winners
+            await channel.send(f"🎉 Gratulujeme {winners_mentions}! Vyhráli jste **{giveaway['prize']}**!")
+    except discord.HTTPException as e:
+        print(f"❌ Nepodařilo se oznámit výsledek giveaway {giveaway_id}: {e}", flush=True)
 
 @bot.tree.command(name="greroll", description="Znovu vylosuj výherce (jen admin)")
 @app_commands.describe(message_id="ID zprávy s giveaway")
 @app_commands.checks.has_permissions(administrator=True)
 async def giveaway_reroll(interaction: discord.Interaction, message_id: str):
-    """Reroll giveaway winners"""
+    """Reroll giveaway winners - losuje z uložených přihlášek, předchozí výherci jsou vyřazeni"""
     try:
-        message = await interaction.channel.fetch_message(int(message_id))
-    except:
-        await interaction.response.send_message("❌ Zpráva nenalezena!", ephemeral=True)
+        msg_id = int(message_id)
+    except ValueError:
+        await interaction.response.send_message("❌ Neplatné ID zprávy!", ephemeral=True)
+        return
+    
+    giveaway = await giveaways_collection.find_one({"message_id": msg_id, "guild_id": interaction.guild_id})
+    if not giveaway:
+        await interaction.response.send_message("❌ Giveaway nenalezena!", ephemeral=True)
+        return
+    
+    if not giveaway.get("ended"):
+        await interaction.response.send_message("❌ Tato soutěž ještě běží!", ephemeral=True)
+        return
+    
+    previous = giveaway.get("winners", []) + giveaway.get("previous_winners", [])
+    winners = await draw_giveaway_winners(giveaway["giveaway_id"], giveaway["winners_count"], exclude=previous)
+    if not winners:
+        await interaction.response.send_message("😢 Není z koho losovat - všichni účastníci už vyhráli!", ephemeral=True)
         return
     
-    # Find giveaway in history or just pick random from reactions
-    await interaction.response.send_message("🎲 Funkce reroll bude brzy dostupná!", ephemeral=True)
+    await giveaways_collection.update_one(
+        {"giveaway_id": giveaway["giveaway_id"]},
+        {"$set": {"winners": winners}, "$push": {"previous_winners": {"$each": giveaway.get("winners", [])}}}
+    )
+    
+    winners_mentions = ", ".join([f"<@{w}>" for w in winners])
+    await interaction.response.send_message(
+        f"🎲 Nové losování! Gratulujeme {winners_mentions}! Vyhráli jste **{giveaway['prize']}**!"
+    )
 
 @giveaway_command.error
 async def giveaway_error(interaction: discord.Interaction, error):
@@ -2327,16 +3455,7 @@ async def slash_odpocet(interaction: discord.Interaction, cas: str, duvod: str =
     await interaction.response.send_message(embed=embed, view=view)
     message = await interaction.original_response()
     
-    active_countdowns[countdown_id] = {"cancelled": False}
-    
-    asyncio.create_task(run_countdown(
-        interaction.channel,
-        message,
-        end_time,
-        countdown_id,
-        interaction.user,
-        duvod
-    ))
+    start_countdown(countdown_id, message, end_time, interaction.user, duvod)
 
 @bot.command(name="odpocet", aliases=["countdown", "timer"])
 async def prefix_odpocet(ctx, cas: str, *, duvod: str = None):
@@ -2371,16 +3490,7 @@ async def prefix_odpocet(ctx, cas: str, *, duvod: str = None):
     
     message = await ctx.send(embed=embed, view=view)
     
-    active_countdowns[countdown_id] = {"cancelled": False}
-    
-    asyncio.create_task(run_countdown(
-        ctx.channel,
-        message,
-        end_time,
-        countdown_id,
-        ctx.author,
-        duvod
-    ))
+    start_countdown(countdown_id, message, end_time, ctx.author, duvod)
 
 @bot.tree.command(name="help", description="Zobraz nápovědu")
 async def slash_help(interaction: discord.Interaction):
@@ -2483,7 +3593,7 @@ async def prefix_help(ctx):
         inline=False
     )
     msg = await ctx.send(embed=embed)
-    asyncio.create_task(delete_after(msg, 60))  # Smaže po 5 min
+    delete_after(msg, 60)  # Smaže po 5 min
 
 @bot.command(name="prikazy")
 @commands.has_permissions(administrator=True)
@@ -2599,7 +3709,8 @@ async def send_game_info(ctx):
     # Získání cílového kanálu
     target_channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
     if not target_channel:
-        await ctx.send("❌ Nepodařilo se najít cílový kanál!", delete_after=10)
+        msg = await ctx.send("❌ Nepodařilo se najít cílový kanál!")
+        delete_after(msg, 10)
         return
     
     # === HLAVNÍ EMBED - HERNÍ PŘÍKAZY ===
@@ -2763,15 +3874,18 @@ async def send_game_info(ctx):
     await target_channel.send(embed=level_embed)
     
     # Potvrzení v původním kanálu
-    await ctx.send(f"✅ Herní info bylo odesláno do kanálu <#{GAME_NOTIFICATION_CHANNEL}>!", delete_after=10)
+    msg = await ctx.send(f"✅ Herní info bylo odesláno do kanálu <#{GAME_NOTIFICATION_CHANNEL}>!")
+    delete_after(msg, 10)
 
 @send_game_info.error
 async def send_game_info_error(ctx, error):
     if isinstance(error, commands.MissingPermissions):
-        await ctx.send("❌ Tento příkaz může použít pouze administrátor!", delete_after=10)
+        msg = await ctx.send("❌ Tento příkaz může použít pouze administrátor!")
+        delete_after(msg, 10)
     else:
         print(f"[ERROR] herniinfo: {error}", flush=True)
-        await ctx.send(f"❌ Nastala chyba: {error}", delete_after=10)
+        msg = await ctx.send(f"❌ Nastala chyba: {error}")
+        delete_after(msg, 10)
 
 # ============== GAME LEVEL SYSTEM ==============
 
@@ -2804,7 +3918,7 @@ async def slash_hry(interaction: discord.Interaction, hrac: discord.Member = Non
         return
     
     target = hrac or interaction.user
-    user_data = get_user_data(interaction.guild_id, target.id)
+    user_data = await get_user_data(interaction.guild_id, target.id)
     
     level = calculate_level(user_data["xp"])
     current_level_xp = xp_for_level(level)
@@ -2836,6 +3950,11 @@ async def slash_hry(interaction: discord.Interaction, hrac: discord.Member = Non
     )
     embed.set_thumbnail(url=target.display_avatar.url)
     
+    # Pořadí v žebříčku serveru
+    rank = get_user_rank(target.guild.id, target.id)
+    if rank:
+        embed.description = f"🏅 **#{rank[0]}** z {rank[1]} hráčů"
+    
     # Základní statistiky
     embed.add_field(
         name="📊 Level",
@@ -2890,7 +4009,7 @@ async def slash_hry(interaction: discord.Interaction, hrac: discord.Member = Non
     )
     embed.add_field(
         name="📅 Denní XP",
-        value=f"**{user_data.get('daily_game_xp', 0)}/{GAME_XP_DAILY_LIMIT}**",
+        value=f"**{daily_game_xp_of(user_data)}/{GAME_XP_DAILY_LIMIT}**",
         inline=True
     )
     
@@ -2915,13 +4034,13 @@ async def slash_hry(interaction: discord.Interaction, hrac: discord.Member = Non
     
     await interaction.response.send_message(embed=embed)
     msg = await interaction.original_response()
-    asyncio.create_task(delete_after(msg, 3600))
+    delete_after(msg, 3600)
 
 @bot.command(name="hry", aliases=["lvl", "level", "gamelevel", "rank", "xp"])
 async def prefix_hry(ctx, hrac: discord.Member = None):
     """!hry - Zobraz svůj herní profil"""
     target = hrac or ctx.author
-    user_data = get_user_data(ctx.guild.id, target.id)
+    user_data = await get_user_data(ctx.guild.id, target.id)
     
     level = calculate_level(user_data["xp"])
     current_level_xp = xp_for_level(level)
@@ -2953,6 +4072,11 @@ async def prefix_hry(ctx, hrac: discord.Member = None):
     )
     embed.set_thumbnail(url=target.display_avatar.url)
     
+    # Pořadí v žebříčku serveru
+    rank = get_user_rank(target.guild.id, target.id)
+    if rank:
+        embed.description = f"🏅 **#{rank[0]}** z {rank[1]} hráčů"
+    
     # Základní statistiky
     embed.add_field(name="📊 Level", value=f"**Level {level}**", inline=True)
     embed.add_field(name="✨ XP", value=f"**{user_data['xp']:,}** XP", inline=True)
@@ -2968,7 +4092,7 @@ async def prefix_hry(ctx, hrac: discord.Member = None):
     # Herní statistiky
     embed.add_field(name="🕹️ Odemčené hry", value=f"**{len(unlocked_games)}** her", inline=True)
     embed.add_field(name="⏱️ Čas hraní", value=f"**{time_str}**", inline=True)
-    embed.add_field(name="📅 Denní XP", value=f"**{user_data.get('daily_game_xp', 0)}/{DAILY_XP_LIMIT}**", inline=True)
+    embed.add_field(name="📅 Denní XP", value=f"**{daily_game_xp_of(user_data)}/{GAME_XP_DAILY_LIMIT}**", inline=True)
     
     # Top 3 nejhranější hry
     if game_times:
@@ -2986,7 +4110,7 @@ async def prefix_hry(ctx, hrac: discord.Member = None):
     embed.set_footer(text="⚔️ Valhalla Bot • /ukoly pro herní úkoly")
     
     msg = await ctx.send(embed=embed)
-    asyncio.create_task(delete_after(msg, 3600))
+    delete_after(msg, 3600)
 
 @bot.tree.command(name="top", description="Zobraz žebříček hráčů")
 async def slash_top(interaction: discord.Interaction):
@@ -2995,9 +4119,7 @@ async def slash_top(interaction: discord.Interaction):
         return
     
     # Get top 10 users for this guild
-    top_users = list(users_collection.find(
-        {"guild_id": interaction.guild_id}
-    ).sort("xp", -1).limit(10))
+    top_users = await get_top_users(interaction.guild_id, 10)
     
     if not top_users:
         await interaction.response.send_message("📊 Zatím nikdo nehrál! Začni s `/hudba` nebo `/film`", ephemeral=True)
@@ -3015,7 +4137,7 @@ async def slash_top(interaction: discord.Interaction):
         level = calculate_level(user["xp"])
         badge = get_badge(level)
         medal = medals[i] if i < 3 else f"`{i+1}.`"
-        name = user.get("name", f"Hráč {user['user_id']}")
+        name = user["name"]
         leaderboard.append(f"{medal} {badge} **{name}** • Level {level} • {user['xp']} XP")
     
     embed.description = "\n".join(leaderboard)
@@ -3023,18 +4145,16 @@ async def slash_top(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed)
     msg = await interaction.original_response()
-    asyncio.create_task(delete_after(msg, 60))
+    delete_after(msg, 60)
 
 @bot.command(name="top", aliases=["leaderboard", "lb", "zebricek"])
 async def prefix_top(ctx):
     """!top - Zobraz žebříček"""
-    top_users = list(users_collection.find(
-        {"guild_id": ctx.guild.id}
-    ).sort("xp", -1).limit(10))
+    top_users = await get_top_users(ctx.guild.id, 10)
     
     if not top_users:
         msg = await ctx.send("📊 Zatím nikdo nehrál! Začni s `!hudba` nebo `!film`")
-        asyncio.create_task(delete_after(msg, 60))
+        delete_after(msg, 60)
         return
     
     embed = discord.Embed(title="🏆 TOP HRÁČI", color=discord.Color.gold())
@@ -3046,12 +4166,74 @@ async def prefix_top(ctx):
         level = calculate_level(user["xp"])
         badge = get_badge(level)
         medal = medals[i] if i < 3 else f"`{i+1}.`"
-        name = user.get("name", f"Hráč {user['user_id']}")
+        name = user["name"]
         leaderboard.append(f"{medal} {badge} **{name}** • Level {level} • {user['xp']} XP")
     
     embed.description = "\n".join(leaderboard)
     msg = await ctx.send(embed=embed)
-    asyncio.create_task(delete_after(msg, 60))
+    delete_after(msg, 60)
+
+DAILY_COOLDOWN_SECONDS = 86400     # 24 hours
+DAILY_STREAK_SECONDS = 172800      # 48 hours - streak continues
+
+async def claim_daily(guild_id: int, user_id: int, user_name: str):
+    """Vyzvedni denní bonus. Vrací (reward, remaining_seconds) - reward je None, když ještě nelze.
+    Zápis je podmíněný předchozí hodnotou last_daily, ze souběžných /daily a !daily projde jen jeden."""
+    for _ in range(2):
+        user_data = await get_user_data(guild_id, user_id)
+        now = datetime.now(timezone.utc)
+        previous = user_data.get("last_daily")
+        last_daily = previous
+        
+        if last_daily:
+            if isinstance(last_daily, str):
+                last_daily = datetime.fromisoformat(last_daily.replace('Z', '+00:00'))
+            
+            time_diff = (now - last_daily).total_seconds()
+            if time_diff < DAILY_COOLDOWN_SECONDS:
+                return None, DAILY_COOLDOWN_SECONDS - time_diff
+            
+            # Check streak
+            if time_diff < DAILY_STREAK_SECONDS:
+                new_streak = user_data.get("streak", 0) + 1
+            else:
+                new_streak = 1  # Streak reset
+        else:
+            new_streak = 1
+        
+        # Calculate bonus
+        base_xp = XP_REWARDS["daily"]
+        streak_bonus = min(new_streak - 1, 10) * XP_REWARDS["streak_bonus"]  # Max 10 days bonus
+        total_xp = base_xp + streak_bonus
+        
+        awarded = await award_xp(
+            guild_id, user_id, user_name, total_xp,
+            extra_set={"last_daily": now, "streak": new_streak},
+            source="daily",
+            extra_filter={"last_daily": previous}
+        )
+        if awarded is not None:
+            old_xp, new_xp = awarded
+            return {
+                "total_xp": total_xp, "streak": new_streak, "streak_bonus": streak_bonus,
+                "old_xp": old_xp, "new_xp": new_xp
+            }, 0
+        # Někdo bonus mezitím vyzvedl - cache je zneplatněná, zkus to s čerstvými daty
+    return None, DAILY_COOLDOWN_SECONDS
+
+def format_daily_remaining(remaining: float) -> str:
+    hours = int(remaining // 3600)
+    minutes = int((remaining % 3600) // 60)
+    return f"{hours}h {minutes}m"
+
+def build_daily_embed(reward: dict) -> discord.Embed:
+    embed = discord.Embed(title="🎁 DENNÍ BONUS!", color=discord.Color.green())
+    embed.add_field(name="✨ Získáno", value=f"+**{reward['total_xp']}** XP", inline=True)
+    embed.add_field(name="🔥 Streak", value=f"**{reward['streak']}** dnů", inline=True)
+    if reward["streak_bonus"] > 0:
+        embed.add_field(name="💫 Streak bonus", value=f"+{reward['streak_bonus']} XP", inline=True)
+    embed.set_footer(text="Vrať se zítra pro další bonus!")
+    return embed
 
 @bot.tree.command(name="daily", description="Získej denní bonus XP!")
 async def slash_daily(interaction: discord.Interaction):
@@ -3059,72 +4241,21 @@ async def slash_daily(interaction: discord.Interaction):
     if not await check_command_permission(interaction, "daily"):
         return
     
-    guild_id = interaction.guild_id
-    user_id = interaction.user.id
-    user_data = get_user_data(guild_id, user_id)
-    
-    now = datetime.now(timezone.utc)
-    last_daily = user_data.get("last_daily")
-    
-    if last_daily:
-        if isinstance(last_daily, str):
-            last_daily = datetime.fromisoformat(last_daily.replace('Z', '+00:00'))
-        
-        time_diff = now - last_daily
-        if time_diff.total_seconds() < 86400:  # 24 hours
-            remaining = 86400 - time_diff.total_seconds()
-            hours = int(remaining // 3600)
-            minutes = int((remaining % 3600) // 60)
-            await interaction.response.send_message(
-                f"⏰ Denní bonus už jsi dnes vybral/a!\nDalší za **{hours}h {minutes}m**",
-                ephemeral=True
-            )
-            return
-        
-        # Check streak
-        if time_diff.total_seconds() < 172800:  # 48 hours - streak continues
-            new_streak = user_data.get("streak", 0) + 1
-        else:
-            new_streak = 1  # Streak reset
-    else:
-        new_streak = 1
-    
-    # Calculate bonus
-    base_xp = XP_REWARDS["daily"]
-    streak_bonus = min(new_streak - 1, 10) * XP_REWARDS["streak_bonus"]  # Max 10 days bonus
-    total_xp = base_xp + streak_bonus
-    
-    # Update user
-    users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        {
-            "$set": {"last_daily": now, "streak": new_streak},
-            "$inc": {"xp": total_xp}
-        }
-    )
-    
-    new_xp = user_data["xp"] + total_xp
-    new_level = calculate_level(new_xp)
-    old_level = calculate_level(user_data["xp"])
-    
-    embed = discord.Embed(
-        title="🎁 DENNÍ BONUS!",
-        color=discord.Color.green()
-    )
-    embed.add_field(name="✨ Získáno", value=f"+**{total_xp}** XP", inline=True)
-    embed.add_field(name="🔥 Streak", value=f"**{new_streak}** dnů", inline=True)
-    
-    if streak_bonus > 0:
-        embed.add_field(name="💫 Streak bonus", value=f"+{streak_bonus} XP", inline=True)
-    
-    embed.set_footer(text="Vrať se zítra pro další bonus!")
+    reward, remaining = await claim_daily(interaction.guild_id, interaction.user.id, interaction.user.display_name)
+    if reward is None:
+        await interaction.response.send_message(
+            f"⏰ Denní bonus už jsi dnes vybral/a!\nDalší za **{format_daily_remaining(remaining)}**",
+            ephemeral=True
+        )
+        return
     
-    await interaction.response.send_message(embed=embed)
+    await interaction.response.send_message(embed=build_daily_embed(reward))
     msg = await interaction.original_response()
-    asyncio.create_task(delete_after(msg, 60))
+    delete_after(msg, 60)
     
     # Level up check
-    if new_level > old_level:
+    new_level = calculate_level(reward["new_xp"])
+    if new_level > calculate_level(reward["old_xp"]):
         badge = get_badge(new_level)
         level_embed = discord.Embed(
             title="🎉 LEVEL UP!",
@@ -3136,180 +4267,201 @@ async def slash_daily(interaction: discord.Interaction):
 @bot.command(name="daily", aliases=["denni", "bonus"])
 async def prefix_daily(ctx):
     """!daily - Získej denní bonus"""
-    guild_id = ctx.guild.id
-    user_id = ctx.author.id
-    user_data = get_user_data(guild_id, user_id)
+    reward, remaining = await claim_daily(ctx.guild.id, ctx.author.id, ctx.author.display_name)
+    if reward is None:
+        await ctx.send(f"⏰ Denní bonus už jsi dnes vybral/a! Další za **{format_daily_remaining(remaining)}**")
+        return
     
-    now = datetime.now(timezone.utc)
-    last_daily = user_data.get("last_daily")
+    msg = await ctx.send(embed=build_daily_embed(reward))
+    delete_after(msg, 60)
+
+# ============== GAME TRACKING ==============
+
+# Presence události nejdou rovnou do DB, ale do fronty, kterou zpracovává jeden
+# worker. Discord posílá on_presence_update za každý společný server, worker
+# proto drží stav hráče - potvrzenou session (active_gaming_sessions) a čekající
+# změnu (presence_pending). Změna se provede až když vydrží
+# PRESENCE_DEBOUNCE_SECONDS, takže duplikáty z dalších serverů i krátké
+# výpadky aktivity se zahodí. Zápisy sessions z jednoho průchodu jdou jedním bulk_write.
+PRESENCE_DEBOUNCE_SECONDS = int(os.environ.get("PRESENCE_DEBOUNCE_SECONDS", "15"))
+presence_queue = asyncio.Queue()  # (user_id, guild_id, user_name, hra nebo None, čas)
+presence_pending = {}  # {user_id: {"game", "since", "ended_at", "guild_id", "user_name"}}
+presence_metrics = {
+    "events": 0,          # události přijaté z on_presence_update
+    "duplicates": 0,      # stejná změna z dalšího serveru
+    "debounced": 0,       # změny zahozené, protože nevydržely
+    "transitions": 0,     # provedené přechody stavu
+    "session_writes": 0,  # zápisy do game_sessions
+}
+presence_worker_task = None
+game_sessions_loaded = asyncio.Event()  # worker čeká, než on_ready načte sessions z DB
+
+def playing_game(member) -> str:
+    """Název hry, kterou člen právě hraje (nebo None)"""
+    for activity in member.activities:
+        if activity.type == discord.ActivityType.playing:
+            return activity.name
+    return None
+
+def queue_presence_change(user_id: int, guild_id: int, user_name: str, game: str, seen_at: datetime):
+    """Zapracuj událost do stavu hráče (bez DB)"""
+    presence_metrics["events"] += 1
+    pending = presence_pending.get(user_id)
+    if pending is not None and pending["game"] == game:
+        presence_metrics["duplicates"] += 1
+        return
     
-    if last_daily:
-        if isinstance(last_daily, str):
-            last_daily = datetime.fromisoformat(last_daily.replace('Z', '+00:00'))
-        
-        time_diff = now - last_daily
-        if time_diff.total_seconds() < 86400:
-            remaining = 86400 - time_diff.total_seconds()
-            hours = int(remaining // 3600)
-            minutes = int((remaining % 3600) // 60)
-            await ctx.send(f"⏰ Denní bonus už jsi dnes vybral/a! Další za **{hours}h {minutes}m**")
-            return
-        
-        if time_diff.total_seconds() < 172800:
-            new_streak = user_data.get("streak", 0) + 1
+    session = active_gaming_sessions.get(user_id)
+    if (session["game"] if session else None) == game:
+        # Aktivita se vrátila k potvrzenému stavu dřív, než změna vydržela
+        if presence_pending.pop(user_id, None) is not None:
+            presence_metrics["debounced"] += 1
         else:
-            new_streak = 1
-    else:
-        new_streak = 1
+            presence_metrics["duplicates"] += 1
+        return
+    
+    if pending is not None:
+        presence_metrics["debounced"] += 1
+    presence_pending[user_id] = {
+        "game": game,
+        "since": seen_at,
+        # Potvrzená session skončila první změnou, ne až tou poslední
+        "ended_at": pending["ended_at"] if pending else seen_at,
+        "guild_id": guild_id,
+        "user_name": user_name
+    }
+
+async def finish_game_session(user_id: int, session: dict, ended_at: datetime):
+    """Připiš XP za ukončenou herní session"""
+    start_time = session["start"]
+    if isinstance(start_time, str):
+        start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+    minutes_played = int((ended_at - start_time).total_seconds() / 60)
     
-    base_xp = XP_REWARDS["daily"]
-    streak_bonus = min(new_streak - 1, 10) * XP_REWARDS["streak_bonus"]
-    total_xp = base_xp + streak_bonus
+    print(f"[GAME] ⏹️ {session['user_name']} skončil hrát: {session['game']} ({minutes_played} min)", flush=True)
     
-    users_collection.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        {
-            "$set": {"last_daily": now, "streak": new_streak},
-            "$inc": {"xp": total_xp}
-        }
+    if minutes_played < 10:
+        return
+    
+    # Get notification channel - VŽDY do správného kanálu
+    channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
+    
+    xp_earned = await add_game_xp(
+        session["guild_id"],
+        user_id,
+        session["user_name"],
+        minutes_played,
+        session["game"],
+        channel
     )
     
-    embed = discord.Embed(title="🎁 DENNÍ BONUS!", color=discord.Color.green())
-    embed.add_field(name="✨ Získáno", value=f"+**{total_xp}** XP", inline=True)
-    embed.add_field(name="🔥 Streak", value=f"**{new_streak}** dnů", inline=True)
-    if streak_bonus > 0:
-        embed.add_field(name="💫 Streak bonus", value=f"+{streak_bonus} XP", inline=True)
-    embed.set_footer(text="Vrať se zítra pro další bonus!")
+    if xp_earned > 0 and channel:
+        embed = discord.Embed(
+            title="🎮 XP za hraní!",
+            description=f"**{session['user_name']}** hrál/a **{session['game']}**",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="⏱️ Čas", value=f"{minutes_played} min", inline=True)
+        embed.add_field(name="✨ XP", value=f"+{xp_earned} XP", inline=True)
+        
+        daily_xp = await get_daily_game_xp(session["guild_id"], user_id)
+        embed.add_field(name="📊 Denní limit", value=f"{daily_xp}/{GAME_XP_DAILY_LIMIT}", inline=True)
+        embed.set_footer(text="Hraj hry a získávej XP!")
+        notifications.notify(channel, embed, PRIORITY_LOW)
+
+async def commit_presence_changes(now: datetime):
+    """Proveď čekající změny, které vydržely PRESENCE_DEBOUNCE_SECONDS"""
+    due = [
+        user_id for user_id, change in presence_pending.items()
+        if (now - change["since"]).total_seconds() >= PRESENCE_DEBOUNCE_SECONDS
+    ]
+    if not due:
+        return
     
-    msg = await ctx.send(embed=embed)
-    asyncio.create_task(delete_after(msg, 60))
+    writes = []
+    finished = []  # (user_id, session, ended_at)
+    started = []   # (user_id, session)
+    for user_id in due:
+        change = presence_pending.pop(user_id)
+        previous = active_gaming_sessions.pop(user_id, None)
+        if previous:
+            finished.append((user_id, previous, change["ended_at"]))
+        
+        if change["game"]:
+            print(f"[GAME] ▶️ {change['user_name']} začal hrát: {change['game']}", flush=True)
+            session = {
+                "game": change["game"],
+                "start": change["since"],
+                "guild_id": change["guild_id"],
+                "user_name": change["user_name"],
+                "last_seen": now
+            }
+            active_gaming_sessions[user_id] = session
+            started.append((user_id, session))
+            writes.append(UpdateOne(
+                {"user_id": user_id},
+                {"$set": {"user_id": user_id, **session}},
+                upsert=True
+            ))
+        else:
+            writes.append(DeleteOne({"user_id": user_id}))
+    presence_metrics["transitions"] += len(due)
+    
+    # Paměť je zdroj pravdy, DB slouží pro obnovu po restartu
+    try:
+        await game_sessions_collection.bulk_write(writes, ordered=False)
+        presence_metrics["session_writes"] += len(writes)
+    except Exception as e:
+        print(f"❌ Chyba při zápisu herních sessions: {e}", flush=True)
+    
+    for user_id, session, ended_at in finished:
+        try:
+            await finish_game_session(user_id, session, ended_at)
+        except Exception as e:
+            print(f"❌ Chyba při připisování herního XP: {e}", flush=True)
+    
+    for user_id, session in started:
+        if session["game"] not in BONUS_GAMES:
+            continue
+        try:
+            await unlock_game(session["guild_id"], user_id, session["user_name"], session["game"])
+        except Exception as e:
+            print(f"❌ Chyba při odemykání hry: {e}", flush=True)
 
-# ============== GAME TRACKING ==============
+async def presence_worker():
+    """Zpracovávej frontu presence událostí a prováděj ustálené změny"""
+    await game_sessions_loaded.wait()
+    while True:
+        timeout = None
+        if presence_pending:
+            oldest = min(change["since"] for change in presence_pending.values())
+            elapsed = (datetime.now(timezone.utc) - oldest).total_seconds()
+            timeout = max(0, PRESENCE_DEBOUNCE_SECONDS - elapsed)
+        
+        try:
+            event = await asyncio.wait_for(presence_queue.get(), timeout)
+            queue_presence_change(*event)
+            while not presence_queue.empty():
+                queue_presence_change(*presence_queue.get_nowait())
+        except asyncio.TimeoutError:
+            pass
+        
+        try:
+            await commit_presence_changes(datetime.now(timezone.utc))
+        except Exception as e:
+            print(f"❌ Chyba při zpracování presence: {e}", flush=True)
 
 @bot.event
 async def on_presence_update(before: discord.Member, after: discord.Member):
-    """Track when users start/stop playing games"""
-    
-    # Get the game activity
-    before_game = None
-    after_game = None
-    
-    for activity in before.activities:
-        if activity.type == discord.ActivityType.playing:
-            before_game = activity.name
-            break
-    
-    for activity in after.activities:
-        if activity.type == discord.ActivityType.playing:
-            after_game = activity.name
-            break
+    """Track when users start/stop playing games - změnu jen zařadí do fronty workeru"""
+    before_game = playing_game(before)
+    after_game = playing_game(after)
     
     # Skip if no change
     if before_game == after_game:
         return
     
-    print(f"[GAME] {after.display_name}: '{before_game}' -> '{after_game}'", flush=True)
-    
-    user_id = after.id
-    guild_id = after.guild.id
-    
-    # Started playing a game
-    if after_game and not before_game:
-        print(f"[GAME] ▶️ {after.display_name} začal hrát: {after_game}", flush=True)
-        
-        # Ulož do paměti i databáze
-        active_gaming_sessions[user_id] = {
-            "game": after_game,
-            "start": datetime.now(timezone.utc),
-            "guild_id": guild_id,
-            "user_name": after.display_name
-        }
-        save_game_session(user_id, guild_id, after_game, after.display_name)
-        
-        # Get notification channel - VŽDY do správného kanálu
-        channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
-        
-        # Check if it's a bonus game to unlock
-        if after_game in BONUS_GAMES:
-            await unlock_game(guild_id, user_id, after.display_name, after_game, channel)
-    
-    # Stopped playing a game
-    elif before_game and not after_game:
-        # Zkus načíst session z paměti nebo databáze
-        session = active_gaming_sessions.get(user_id) or get_game_session(user_id)
-        
-        if session:
-            start_time = session["start"]
-            if isinstance(start_time, str):
-                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            minutes_played = int((datetime.now(timezone.utc) - start_time).total_seconds() / 60)
-            
-            print(f"[GAME] ⏹️ {session['user_name']} skončil hrát: {session['game']} ({minutes_played} min)", flush=True)
-            
-            if minutes_played >= 10:
-                # Get notification channel - VŽDY do správného kanálu
-                channel = bot.get_channel(GAME_NOTIFICATION_CHANNEL)
-                
-                xp_earned = await add_game_xp(
-                    session["guild_id"],
-                    user_id,
-                    session["user_name"],
-                    minutes_played,
-                    session["game"],
-                    channel
-                )
-                
-                if xp_earned > 0 and channel:
-                    embed = discord.Embed(
-                        title="🎮 XP za hraní!",
-                        description=f"**{session['user_name']}** hrál/a **{session['game']}**",
-                        color=discord.Color.blue()
-                    )
-                    embed.add_field(name="⏱️ Čas", value=f"{minutes_played} min", inline=True)
-                    embed.add_field(name="✨ XP", value=f"+{xp_earned} XP", inline=True)
-                    
-                    daily_xp = get_daily_game_xp(guild_id, user_id)
-                    embed.add_field(name="📊 Denní limit", value=f"{daily_xp}/{GAME_XP_DAILY_LIMIT}", inline=True)
-                    embed.set_footer(text="Hraj hry a získávej XP!")
-                    await channel.send(embed=embed)
-            
-            # Smaž z paměti i databáze
-            if user_id in active_gaming_sessions:
-                del active_gaming_sessions[user_id]
-            delete_game_session(user_id)
-    
-    # Changed game
-    elif before_game and after_game and before_game != after_game:
-        # End previous session - zkus z paměti nebo databáze
-        session = active_gaming_sessions.get(user_id) or get_game_session(user_id)
-        
-        if session:
-            start_time = session["start"]
-            if isinstance(start_time, str):
-                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            minutes_played = int((datetime.now(timezone.utc) - start_time).total_seconds() / 60)
-            
-            if minutes_played >= 10:
-                await add_game_xp(guild_id, user_id, after.display_name, minutes_played, session["game"], None)
-        
-        # Start new session - ulož do paměti i databáze
-        active_gaming_sessions[user_id] = {
-            "game": after_game,
-            "start": datetime.now(timezone.utc),
-            "guild_id": guild_id,
-            "user_name": after.display_name
-        }
-        save_game_session(user_id, guild_id, after_game, after.display_name)
-        
-        # Check if new game is bonus game
-        if after_game in BONUS_GAMES:
-            channel = after.guild.system_channel
-            if not channel:
-                for ch in after.guild.text_channels:
-                    if ch.permissions_for(after.guild.me).send_messages:
-                        channel = ch
-                        break
-            await unlock_game(guild_id, user_id, after.display_name, after_game, channel)
+    presence_queue.put_nowait((after.id, after.guild.id, after.display_name, after_game, datetime.now(timezone.utc)))
 
 @bot.tree.command(name="ukoly", description="Zobraz úkoly pro konkrétní hru")
 @app_commands.describe(hra="Vyber hru pro zobrazení úkolů")
@@ -3327,7 +4479,7 @@ async def slash_ukoly(interaction: discord.Interaction, hra: str):
     if not await check_command_permission(interaction, "ukoly"):
         return
     
-    user_data = get_user_data(interaction.guild_id, interaction.user.id)
+    user_data = await get_user_data(interaction.guild_id, interaction.user.id)
     game_time = user_data.get("game_times", {}).get(hra, 0)
     completed = user_data.get("completed_quests", {}).get(hra, [])
     quests = get_game_quests(hra)
@@ -3370,7 +4522,7 @@ async def slash_ukoly(interaction: discord.Interaction, hra: str):
     
     await interaction.response.send_message(embed=embed)
     msg = await interaction.original_response()
-    asyncio.create_task(delete_after(msg, 60))
+    delete_after(msg, 60)
 
 @bot.command(name="ukoly", aliases=["quests", "mise", "tasks"])
 async def prefix_ukoly(ctx, *, hra: str = None):
@@ -3393,7 +4545,7 @@ async def prefix_ukoly(ctx, *, hra: str = None):
         embed.add_field(name="Dostupné hry", value="\n".join(game_list), inline=False)
         embed.set_footer(text="Nebo hraj jakoukoli hru - budeš mít základní úkoly!")
         msg = await ctx.send(embed=embed)
-        asyncio.create_task(delete_after(msg, 60))
+        delete_after(msg, 60)
         return
     
     # Find matching game
@@ -3407,7 +4559,7 @@ async def prefix_ukoly(ctx, *, hra: str = None):
         # Use the input as game name with default quests
         game_name = hra
     
-    user_data = get_user_data(ctx.guild.id, ctx.author.id)
+    user_data = await get_user_data(ctx.guild.id, ctx.author.id)
     game_time = user_data.get("game_times", {}).get(game_name, 0)
     completed = user_data.get("completed_quests", {}).get(game_name, [])
     quests = get_game_quests(game_name)
@@ -3442,14 +4594,55 @@ async def prefix_ukoly(ctx, *, hra: str = None):
     embed.add_field(name="✅ Splněno", value=f"{len(completed)}/{len(quests)}", inline=True)
     
     msg = await ctx.send(embed=embed)
-    asyncio.create_task(delete_after(msg, 60))
+    delete_after(msg, 60)
 
 # ============== POLL SYSTEM ==============
 
 NUMBER_EMOJIS = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
 
-# Store active polls: {poll_id: {votes: {user_id: option_index}, names: {user_id: name}, ...}}
+# Store active polls: {poll_id: {votes: {user_id: option_index}, counts: [n], voters: [{user_id: name}], dirty, ...}}
+# Součty a hlasující po možnostech se udržují při každém hlasu, vykreslení je tak
+# nezávislé na počtu hlasů a zpráva se edituje jen když přibyl hlas (dirty).
 active_polls = {}
+POLL_REFRESH_DELAY = 3  # sekundy - hlasy během této doby se promítnou jednou editací
+
+def new_poll_state(options: list) -> dict:
+    return {
+        "votes": {},
+        "counts": [0] * len(options),
+        "voters": [{} for _ in options],
+        "options": options,
+        "dirty": False
+    }
+
+def record_poll_vote(poll_data: dict, user_id: int, user_name: str, option_index: int):
+    """Započítej hlas (nebo změnu hlasu) do součtů ankety"""
+    previous = poll_data["votes"].get(user_id)
+    if previous is not None:
+        poll_data["counts"][previous] -= 1
+        poll_data["voters"][previous].pop(user_id, None)
+    poll_data["votes"][user_id] = option_index
+    poll_data["counts"][option_index] += 1
+    poll_data["voters"][option_index][user_id] = user_name
+
+def voter_preview(poll_data: dict, option_index: int, limit: int) -> tuple:
+    """Prvních `limit` jmen hlasujících pro možnost a počet zbývajících"""
+    voters = poll_data["voters"][option_index]
+    return list(islice(voters.values(), limit)), max(0, len(voters) - limit)
+
+def mark_poll_dirty(poll_id: str):
+    """Naplánuj překreslení ankety - první hlas po vykreslení, další se přidají do téže editace"""
+    poll_data = active_polls[poll_id]
+    if poll_data["dirty"]:
+        return
+    poll_data["dirty"] = True
+    timers.schedule(
+        "poll_refresh",
+        datetime.now(timezone.utc) + timedelta(seconds=POLL_REFRESH_DELAY),
+        {"poll_id": poll_id},
+        timer_id=f"{poll_id}:refresh",
+        persist=False
+    )
 
 class PollView(discord.ui.View):
     def __init__(self, poll_id: str, options: list, author_id: int, end_time: int):
@@ -3481,61 +4674,58 @@ class PollView(discord.ui.View):
             user_name = interaction.user.display_name  # Get display name directly
             
             # Check if user already voted
-            if user_id in poll_data["votes"]:
-                previous_vote = poll_data["votes"][user_id]
-                if previous_vote == option_index:
-                    await interaction.response.send_message(
-                        f"❌ Již jsi hlasoval pro **{self.options[option_index]}**!",
-                        ephemeral=True
-                    )
-                    return
-                else:
-                    # Change vote
-                    poll_data["votes"][user_id] = option_index
-                    poll_data["names"][user_id] = user_name  # Update name
-                    await interaction.response.send_message(
-                        f"🔄 Změnil jsi hlas na **{self.options[option_index]}**!",
-                        ephemeral=True
-                    )
+            previous_vote = poll_data["votes"].get(user_id)
+            if previous_vote == option_index:
+                await interaction.response.send_message(
+                    f"❌ Již jsi hlasoval pro **{self.options[option_index]}**!",
+                    ephemeral=True
+                )
+                return
+            
+            record_poll_vote(poll_data, user_id, user_name, option_index)
+            if previous_vote is not None:
+                # Change vote
+                await interaction.response.send_message(
+                    f"🔄 Změnil jsi hlas na **{self.options[option_index]}**!",
+                    ephemeral=True
+                )
             else:
                 # New vote
-                poll_data["votes"][user_id] = option_index
-                poll_data["names"][user_id] = user_name  # Store name
                 await interaction.response.send_message(
                     f"✅ Hlasoval jsi pro **{self.options[option_index]}**!",
                     ephemeral=True
                 )
+            mark_poll_dirty(self.poll_id)
+            
+            # Hlasy přežijí restart bota
+            await poll_votes_collection.update_one(
+                {"poll_id": self.poll_id, "user_id": user_id},
+                {"$set": {"option": option_index, "name": user_name},
+                 "$setOnInsert": {"voted_at": datetime.now(timezone.utc)}},
+                upsert=True
+            )
         
         return callback
 
 def get_poll_results(poll_id: str, options: list, guild) -> str:
     """Generate poll results text with voter names"""
-    poll_data = active_polls.get(poll_id, {"votes": {}, "names": {}})
-    votes = poll_data["votes"]
-    names = poll_data.get("names", {})
-    
-    total_votes = len(votes)
-    vote_counts = [0] * len(options)
-    voters_by_option = [[] for _ in options]
-    
-    for user_id, option_index in votes.items():
-        vote_counts[option_index] += 1
-        # Get stored name
-        user_name = names.get(user_id, f"User#{user_id}")
-        voters_by_option[option_index].append(user_name)
+    poll_data = active_polls.get(poll_id) or new_poll_state(options)
+    counts = poll_data["counts"]
+    total_votes = len(poll_data["votes"])
     
     results = []
     for i, option in enumerate(options):
-        count = vote_counts[i]
+        count = counts[i]
         percentage = (count / total_votes * 100) if total_votes > 0 else 0
         bar_length = int(percentage / 10)
         bar = "█" * bar_length + "░" * (10 - bar_length)
         
         # Format voter names
-        if voters_by_option[i]:
-            voter_names = ", ".join(voters_by_option[i][:10])  # Max 10 names
-            if len(voters_by_option[i]) > 10:
-                voter_names += f" +{len(voters_by_option[i]) - 10} dalších"
+        names, others = voter_preview(poll_data, i, 10)  # Max 10 names
+        if names:
+            voter_names = ", ".join(names)
+            if others:
+                voter_names += f" +{others} dalších"
             voters_text = f"\n👤 {voter_names}"
         else:
             voters_text = ""
@@ -3546,30 +4736,23 @@ def get_poll_results(poll_id: str, options: list, guild) -> str:
 
 def get_live_options_text(options: list, poll_id: str, guild) -> str:
     """Generate options text with live vote counts and voter names"""
-    poll_data = active_polls.get(poll_id, {"votes": {}, "names": {}})
-    votes = poll_data["votes"]
-    names = poll_data.get("names", {})
-    total_votes = len(votes)
-    vote_counts = [0] * len(options)
-    voters_by_option = [[] for _ in options]
-    
-    for user_id, option_index in votes.items():
-        vote_counts[option_index] += 1
-        user_name = names.get(user_id, f"User#{user_id}")
-        voters_by_option[option_index].append(user_name)
+    poll_data = active_polls.get(poll_id) or new_poll_state(options)
+    counts = poll_data["counts"]
+    total_votes = len(poll_data["votes"])
     
     lines = []
     for i, opt in enumerate(options):
-        count = vote_counts[i]
+        count = counts[i]
         percentage = (count / total_votes * 100) if total_votes > 0 else 0
         bar_length = int(percentage / 5)
         bar = "▓" * bar_length + "░" * (20 - bar_length)
         
         # Show voter names (max 5 in live view)
-        if voters_by_option[i]:
-            voter_names = ", ".join(voters_by_option[i][:5])
-            if len(voters_by_option[i]) > 5:
-                voter_names += f" +{len(voters_by_option[i]) - 5}"
+        names, others = voter_preview(poll_data, i, 5)
+        if names:
+            voter_names = ", ".join(names)
+            if others:
+                voter_names += f" +{others}"
             voters_text = f"\n   👤 {voter_names}"
         else:
             voters_text = ""
@@ -3578,53 +4761,92 @@ def get_live_options_text(options: list, poll_id: str, guild) -> str:
     
     return "\n".join(lines)
 
-async def run_poll(channel, message, poll_id: str, options: list, author: discord.Member, question: str, end_time: int, guild):
-    """Run the poll and end it when time expires"""
+async def start_poll(poll_id: str, message, options: list, author: discord.Member, question: str, end_time: int, guild):
+    """Zaregistruj anketu - uloží ji, naplánuje konec (trvalý časovač) a průběžné tiky"""
+    poll = {
+        "poll_id": poll_id,
+        "channel_id": message.channel.id,
+        "message_id": message.id,
+        "guild_id": guild.id if guild else None,
+        "author_id": author.id,
+        "question": question,
+        "options": options,
+        "end_time": end_time
+    }
+    active_polls[poll_id].update(poll)
+    timers.schedule("poll_end", datetime.fromtimestamp(end_time, timezone.utc), {"poll_id": poll_id}, timer_id=f"poll:{poll_id}")
+    await polls_collection.insert_one({**poll, "ended": False})
+
+async def restore_polls():
+    """Po restartu obnov běžící ankety - hlasy, tlačítka a časovač konce"""
+    scheduled = {timer["payload"]["poll_id"] for timer in timers.pending("poll_end")}
+    restored = []
+    async for doc in polls_collection.find({"ended": False}):
+        poll_id = doc["poll_id"]
+        if poll_id in active_polls:
+            continue
+        doc.pop("_id", None)
+        doc.pop("ended", None)
+        active_polls[poll_id] = {**new_poll_state(doc["options"]), **doc}
+        restored.append(poll_id)
+        bot.add_view(PollView(poll_id, doc["options"], doc["author_id"], doc["end_time"]), message_id=doc["message_id"])
+        if poll_id not in scheduled:
+            timers.schedule("poll_end", datetime.fromtimestamp(doc["end_time"], timezone.utc), {"poll_id": poll_id}, timer_id=f"poll:{poll_id}")
+    
+    if restored:
+        async for vote in poll_votes_collection.find({"poll_id": {"$in": restored}}).sort("voted_at", 1):
+            record_poll_vote(active_polls[vote["poll_id"]], vote["user_id"], vote["name"], vote["option"])
+        for poll_id in restored:
+            mark_poll_dirty(poll_id)
+    return len(active_polls)
+
+@timers.handler("poll_refresh")
+async def poll_refresh(payload: dict):
+    """Update embed with current votes - jen pokud od posledního vykreslení přibyl hlas"""
+    poll_id = payload["poll_id"]
+    poll_data = active_polls.get(poll_id)
+    if poll_data is None or not poll_data["dirty"]:
+        return
+    poll_data["dirty"] = False
     
-    while True:
-        if poll_id not in active_polls:
-            return
-        
-        remaining = end_time - int(datetime.now(timezone.utc).timestamp())
-        
-        if remaining <= 0:
-            break
-        
-        # Update embed with current votes and time
-        poll_data = active_polls.get(poll_id, {"votes": {}})
-        total_votes = len(poll_data["votes"])
-        
-        options_text = get_live_options_text(options, poll_id, guild)
-        
-        embed = discord.Embed(
-            title="📊 ANKETA",
-            description=f"**{question}**",
-            color=discord.Color.blue()
-        )
-        embed.add_field(name="Možnosti", value=options_text if options_text else "Žádné hlasy", inline=False)
-        embed.add_field(name="⏰ Zbývá", value=f"**{format_time(remaining)}**", inline=True)
-        embed.add_field(name="👥 Hlasů", value=f"**{total_votes}**", inline=True)
-        embed.add_field(name="👤 Autor", value=author.mention, inline=True)
-        embed.set_footer(text="Klikni na tlačítko pro hlasování • 1 hlas na osobu")
-        
-        try:
-            await message.edit(embed=embed)
-        except:
-            pass
-        
-        # Update interval based on remaining time
-        if remaining > 300:  # > 5 min
-            await asyncio.sleep(30)
-        elif remaining > 60:  # > 1 min
-            await asyncio.sleep(10)
-        else:
-            await asyncio.sleep(3)
+    message = partial_message(poll_data["channel_id"], poll_data["message_id"])
+    if message is None:
+        return
+    
+    total_votes = len(poll_data["votes"])
+    options_text = get_live_options_text(poll_data["options"], poll_id, None)
     
-    # Poll ended - show final results
+    embed = discord.Embed(
+        title="📊 ANKETA",
+        description=f"**{poll_data['question']}**",
+        color=discord.Color.blue()
+    )
+    embed.add_field(name="Možnosti", value=options_text if options_text else "Žádné hlasy", inline=False)
+    # Relativní čas odpočítává Discord sám - obsah se mění jen s hlasy
+    embed.add_field(name="⏰ Končí", value=f"<t:{poll_data['end_time']}:R>", inline=True)
+    embed.add_field(name="👥 Hlasů", value=f"**{total_votes}**", inline=True)
+    embed.add_field(name="👤 Autor", value=f"<@{poll_data['author_id']}>", inline=True)
+    embed.set_footer(text="Klikni na tlačítko pro hlasování • 1 hlas na osobu")
+    
+    message_edits.schedule(message, embed=embed)
+
+@timers.handler("poll_end")
+async def poll_end(payload: dict):
+    """Poll ended - show final results"""
+    poll_id = payload["poll_id"]
     if poll_id not in active_polls:
         return
     
     poll_data = active_polls[poll_id]
+    timers.cancel(f"{poll_id}:refresh")
+    options = poll_data["options"]
+    question = poll_data["question"]
+    author_mention = f"<@{poll_data['author_id']}>"
+    guild = bot.get_guild(poll_data["guild_id"]) if poll_data.get("guild_id") else None
+    message = partial_message(poll_data["channel_id"], poll_data["message_id"])
+    if message is None:
+        return
+    channel = message.channel
     total_votes = len(poll_data["votes"])
     
     results_text = get_poll_results(poll_id, options, guild)
@@ -3636,7 +4858,7 @@ async def run_poll(channel, message, poll_id: str, options: list, author: discor
     )
     embed.add_field(name="Výsledky", value=results_text if results_text else "Žádné hlasy", inline=False)
     embed.add_field(name="👥 Celkem hlasů", value=f"**{total_votes}**", inline=True)
-    embed.add_field(name="👤 Autor", value=author.mention, inline=True)
+    embed.add_field(name="👤 Autor", value=author_mention, inline=True)
     embed.set_footer(text="Anketa skončila")
     
     # Disable all buttons
@@ -3651,16 +4873,13 @@ async def run_poll(channel, message, poll_id: str, options: list, author: discor
         view.add_item(btn)
     
     try:
-        await message.edit(embed=embed, view=view)
+        await message_edits.edit_now(message, embed=embed, view=view)
     except:
         pass
     
     # Announce winner
     if total_votes > 0:
-        vote_counts = [0] * len(options)
-        for option_index in poll_data["votes"].values():
-            vote_counts[option_index] += 1
-        
+        vote_counts = poll_data["counts"]
         max_votes = max(vote_counts)
         winners = [options[i] for i, count in enumerate(vote_counts) if count == max_votes]
         
@@ -3669,10 +4888,11 @@ async def run_poll(channel, message, poll_id: str, options: list, author: discor
         else:
             winner_text = f"🏆 **Remíza:** {', '.join(winners)} s {max_votes} hlasy!"
         
-        await channel.send(f"📊 **Anketa skončila!** {author.mention}\n{winner_text}")
+        await channel.send(f"📊 **Anketa skončila!** {author_mention}\n{winner_text}")
     
     # Cleanup
     del active_polls[poll_id]
+    await polls_collection.update_one({"poll_id": poll_id}, {"$set": {"ended": True}})
 
 @bot.tree.command(name="poll", description="Vytvoř anketu s více možnostmi")
 @app_commands.describe(
@@ -3713,7 +4933,7 @@ async def slash_poll(interaction: discord.Interaction, otazka: str, moznosti: st
     end_time = int(datetime.now(timezone.utc).timestamp()) + seconds
     
     # Create poll data
-    active_polls[poll_id] = {"votes": {}, "names": {}, "options": options}
+    active_polls[poll_id] = new_poll_state(options)
     
     # Build options text
     options_text = "\n".join([f"{NUMBER_EMOJIS[i]} {opt}" for i, opt in enumerate(options)])
@@ -3733,17 +4953,8 @@ async def slash_poll(interaction: discord.Interaction, otazka: str, moznosti: st
     await interaction.response.send_message(embed=embed, view=view)
     message = await interaction.original_response()
     
-    # Start poll task
-    asyncio.create_task(run_poll(
-        interaction.channel,
-        message,
-        poll_id,
-        options,
-        interaction.user,
-        otazka,
-        end_time,
-        interaction.guild
-    ))
+    # Start poll
+    await start_poll(poll_id, message, options, interaction.user, otazka, end_time, interaction.guild)
 
 @bot.command(name="poll", aliases=["anketa", "hlasovani"])
 async def prefix_poll(ctx, cas: str, *, args: str):
@@ -3784,7 +4995,7 @@ async def prefix_poll(ctx, cas: str, *, args: str):
     poll_id = str(uuid.uuid4())
     end_time = int(datetime.now(timezone.utc).timestamp()) + seconds
     
-    active_polls[poll_id] = {"votes": {}, "names": {}, "options": options}
+    active_polls[poll_id] = new_poll_state(options)
     
     options_text = "\n".join([f"{NUMBER_EMOJIS[i]} {opt}" for i, opt in enumerate(options)])
     
@@ -3802,16 +5013,7 @@ async def prefix_poll(ctx, cas: str, *, args: str):
     
     message = await ctx.send(embed=embed, view=view)
     
-    asyncio.create_task(run_poll(
-        ctx.channel,
-        message,
-        poll_id,
-        options,
-        ctx.author,
-        otazka,
-        end_time,
-        ctx.guild
-    ))
+    await start_poll(poll_id, message, options, ctx.author, otazka, end_time, ctx.guild)
 
 # ============== MUSIC QUIZ ==============
 
@@ -4042,6 +5244,47 @@ CZECH_MUSIC = {
     ]
 }
 
+# Další uznávané odpovědi (přezdívky, příjmení) - položka může mít i vlastní "aliases"
+ARTIST_ALIASES = {
+    "Yzomandias": ["Yzo"],
+    "Viktor Sheen": ["Sheen"],
+    "Karel Gott": ["Gott"],
+    "Sergei Barracuda": ["Barracuda"],
+    "Jaromír Nohavica": ["Nohavica"],
+    "Waldemar Matuška": ["Matuška"],
+    "Marek Ztracený": ["Ztracený"],
+    "Karel Kryl": ["Kryl"],
+    "Ivan Mládek": ["Mládek"],
+    "Tomáš Klus": ["Klus"],
+    "Ewa Farna": ["Farna"],
+    "Nik Tendo": ["Tendo"],
+    "Lvcas Dope": ["Lucas Dope"],
+    "Mig 21": ["Mig21"],
+    "Rybičky 48": ["Rybičky"],
+    "Ben Cristovao": ["Cristovao"],
+    "Aneta Langerová": ["Langerová"],
+    "Helena Vondráčková": ["Vondráčková"],
+    "Hana Zagorová": ["Zagorová"],
+    "Marta Kubišová": ["Kubišová"],
+    "Thom Artway": ["Artway"],
+}
+
+# Kanály, ve kterých něco čeká na odpovědi v chatu (kvízy).
+# on_message sahá jen do tohoto registru - v ostatních kanálech nedělá žádnou práci navíc.
+answer_consumers = {}  # {channel_id: {name: async handler(message)}}
+
+def register_answer_consumer(channel_id: int, name: str, handler):
+    """Přihlaš handler odpovědí pro kanál"""
+    answer_consumers.setdefault(channel_id, {})[name] = handler
+
+def unregister_answer_consumer(channel_id: int, name: str):
+    """Odhlaš handler odpovědí kanálu"""
+    consumers = answer_consumers.get(channel_id)
+    if consumers is None:
+        return
+    consumers.pop(name, None)
+    if not consumers:
+        del answer_consumers[channel_id]
 
 # Active music quizzes
 active_music_quiz = {}
@@ -4050,17 +5293,22 @@ active_music_quiz = {}
 quiz_settings = {}  # {guild_id: {"time": 60}}
 DEFAULT_QUIZ_TIME = 60  # 1 minuta
 
-def normalize_answer(text: str) -> str:
-    """Normalize text for comparison - remove accents, lowercase"""
-    text = text.lower().strip()
-    replacements = {
-        'á': 'a', 'č': 'c', 'ď': 'd', 'é': 'e', 'ě': 'e', 'í': 'i',
-        'ň': 'n', 'ó': 'o', 'ř': 'r', 'š': 's', 'ť': 't', 'ú': 'u',
-        'ů': 'u', 'ý': 'y', 'ž': 'z'
-    }
-    for cz, en in replacements.items():
-        text = text.replace(cz, en)
-    return text
+def end_quiz_round(quiz_data: dict):
+    """Probuď kolo kvízu čekající ve wait_for_quiz_round (odpověď nebo stop)"""
+    event = quiz_data.get("round_event")
+    if event is not None:
+        event.set()
+
+async def wait_for_quiz_round(quiz_data: dict, quiz_time: int):
+    """Čekej na konec kola - bez pollingu, probudí ho end_quiz_round nebo timeout"""
+    try:
+        await asyncio.wait_for(quiz_data["round_event"].wait(), timeout=quiz_time)
+    except asyncio.TimeoutError:
+        pass
+
+def build_answer_matcher(answer: str, entry: dict, aliases: dict) -> AnswerMatcher:
+    """Matcher pro otázku - správná odpověď, aliasy z tabulky i z položky"""
+    return AnswerMatcher([answer, *aliases.get(answer, []), *entry.get("aliases", [])])
 
 def get_quiz_time(guild_id: int) -> int:
     """Get quiz time for guild"""
@@ -4145,6 +5393,7 @@ async def slash_hudba(interaction: discord.Interaction, zanr: str = "random"):
         "quiz_time": quiz_time,
         "guild_id": guild_id
     }
+    register_answer_consumer(channel_id, "music", handle_music_answer)
     
     # Send start message
     embed = discord.Embed(
@@ -4182,6 +5431,7 @@ async def run_music_quiz(channel, channel_id: int):
         quiz_data = active_music_quiz[channel_id]
         quiz_data["current_round"] = round_num
         quiz_data["answered"] = False
+        quiz_data["round_event"] = asyncio.Event()
         
         # Select genre for this round
         current_genre = genre if genre != "random" else random.choice(list(CZECH_MUSIC.keys()))
@@ -4194,6 +5444,7 @@ async def run_music_quiz(channel, channel_id: int):
             "song": song_data["song"],
             "hint": song_data["hint"]
         }
+        quiz_data["matcher"] = build_answer_matcher(song_data["artist"], song_data, ARTIST_ALIASES)
         
         # Send question
         embed = discord.Embed(
@@ -4208,22 +5459,11 @@ async def run_music_quiz(channel, channel_id: int):
         
         await channel.send(embed=embed)
         
-        # Wait for answer or timeout - check every 0.5 seconds
-        elapsed = 0
-        while elapsed < quiz_time:
-            await asyncio.sleep(0.5)
-            elapsed += 0.5
-            
-            # Check if quiz still exists and if answered
-            quiz_data = active_music_quiz.get(channel_id)
-            if not quiz_data:
-                return
-            if quiz_data.get("answered"):
-                break  # Someone answered, move to next question
+        # Wait for answer, stop or timeout
+        await wait_for_quiz_round(quiz_data, quiz_time)
         
-        # Check if answered
-        quiz_data = active_music_quiz.get(channel_id)
-        if not quiz_data:
+        # Quiz was stopped (or replaced by a new one)
+        if active_music_quiz.get(channel_id) is not quiz_data:
             return
         
         if not quiz_data["answered"]:
@@ -4276,6 +5516,7 @@ async def run_music_quiz(channel, channel_id: int):
         # Cleanup
         if channel_id in active_music_quiz:
             del active_music_quiz[channel_id]
+            unregister_answer_consumer(channel_id, "music")
 
 @bot.command(name="hudba", aliases=["music", "hz"])
 @commands.has_permissions(administrator=True)
@@ -4306,6 +5547,7 @@ async def prefix_hudba(ctx, zanr: str = "random"):
         "quiz_time": quiz_time,
         "guild_id": guild_id
     }
+    register_answer_consumer(channel_id, "music", handle_music_answer)
     
     embed = discord.Embed(
         title="🎵 HUDEBNÍ KVÍZ ZAČÍNÁ!",
@@ -4595,6 +5837,46 @@ FILM_DATABASE = {
     ]
 }
 
+# Originální názvy a zkratky filmů - položka může mít i vlastní "aliases"
+FILM_ALIASES = {
+    "Star Wars": ["Hvězdné války"],
+    "Pán prstenů": ["Lord of the Rings", "LOTR"],
+    "Kmotr": ["Godfather", "The Godfather"],
+    "Šestý smysl": ["The Sixth Sense", "Sixth Sense"],
+    "Temný rytíř": ["The Dark Knight", "Dark Knight"],
+    "Hledá se Nemo": ["Finding Nemo", "Nemo"],
+    "Lví král": ["The Lion King", "Lion King"],
+    "Ledové království": ["Frozen"],
+    "Strážci galaxie": ["Guardians of the Galaxy"],
+    "Taxikář": ["Taxi Driver"],
+    "Zjizvená tvář": ["Scarface"],
+    "Osvícení": ["The Shining", "Shining"],
+    "Čaroděj ze země Oz": ["The Wizard of Oz", "Wizard of Oz"],
+    "Pár správných chlapů": ["Goodfellas"],
+    "Tři oříšky pro Popelku": ["Tři oříšky"],
+    "To": ["It"],
+    "Sedm": ["Se7en", "Seven"],
+    "Kruh": ["The Ring"],
+    "Klub rváčů": ["Fight Club"],
+    "Počátek": ["Inception"],
+    "Jurský park": ["Jurassic Park"],
+    "Mlčení jehňátek": ["The Silence of the Lambs", "Silence of the Lambs"],
+    "Vykoupení z věznice Shawshank": ["The Shawshank Redemption", "Shawshank"],
+    "Zachraňte vojína Ryana": ["Saving Private Ryan"],
+    "Piráti z Karibiku": ["Pirates of the Caribbean"],
+    "Rychle a zběsile": ["Fast and Furious"],
+    "Smrtonosná past": ["Die Hard"],
+    "Vetřelec": ["Alien"],
+    "Vetřelci": ["Aliens"],
+    "Čelisti": ["Jaws"],
+    "Vzhůru do oblak": ["Up"],
+    "Blbý a blbější": ["Dumb and Dumber"],
+    "Pařba ve Vegas": ["The Hangover", "Hangover"],
+    "Vymítač ďábla": ["The Exorcist", "Exorcist"],
+    "Vřískot": ["Scream"],
+    "Tiché místo": ["A Quiet Place", "Quiet Place"],
+}
+
 # ============== PRAVDA/LEŽ KVÍZ ==============
 
 FACTS_DATABASE = [
@@ -4771,11 +6053,11 @@ async def run_truth_game(channel, message, view: TruthView, fact_data: dict, gui
         if data["answer"] == view.correct_answer:
             correct_users.append(data["name"])
             # Add XP for correct answer
-            await add_xp(guild_id, user_id, data["name"], XP_REWARDS["truth_correct"], channel)
-            increment_stats(guild_id, user_id, correct=True)
+            await add_xp(guild_id, user_id, data["name"], XP_REWARDS["truth_correct"], channel,
+                         extra_inc={"total_games": 1, "total_correct": 1}, source="truth")
         else:
             wrong_users.append(data["name"])
-            increment_stats(guild_id, user_id, correct=False)
+            await increment_stats(guild_id, user_id, correct=False)
     
     answer_text = "✅ PRAVDA" if view.correct_answer else "❌ LEŽ"
     
@@ -4964,6 +6246,7 @@ async def slash_film(interaction: discord.Interaction, zanr: str = "random"):
         "quiz_time": quiz_time,
         "guild_id": guild_id
     }
+    register_answer_consumer(channel_id, "film", handle_film_answer)
     
     genre_names = {"ceske": "🇨🇿 České", "hollywood": "🎬 Hollywood", "komedie": "😂 Komedie", "akcni": "💥 Akční", "horor": "👻 Horor", "scifi": "🚀 Sci-Fi"}
     
@@ -5001,6 +6284,7 @@ async def run_film_quiz(channel, channel_id: int):
         quiz_data = active_film_quiz[channel_id]
         quiz_data["current_round"] = round_num
         quiz_data["answered"] = False
+        quiz_data["round_event"] = asyncio.Event()
         
         current_genre = genre if genre != "random" else random.choice(list(FILM_DATABASE.keys()))
         film_data = random.choice(FILM_DATABASE[current_genre])
@@ -5010,6 +6294,7 @@ async def run_film_quiz(channel, channel_id: int):
             "year": film_data["year"],
             "hint": film_data["hint"]
         }
+        quiz_data["matcher"] = build_answer_matcher(film_data["film"], film_data, FILM_ALIASES)
         
         embed = discord.Embed(
             title=f"🎬 OTÁZKA {round_num}/{total_rounds}",
@@ -5024,19 +6309,9 @@ async def run_film_quiz(channel, channel_id: int):
         
         await channel.send(embed=embed)
         
-        elapsed = 0
-        while elapsed < quiz_time:
-            await asyncio.sleep(0.5)
-            elapsed += 0.5
-            
-            quiz_data = active_film_quiz.get(channel_id)
-            if not quiz_data:
-                return
-            if quiz_data.get("answered"):
-                break
+        await wait_for_quiz_round(quiz_data, quiz_time)
         
-        quiz_data = active_film_quiz.get(channel_id)
-        if not quiz_data:
+        if active_film_quiz.get(channel_id) is not quiz_data:
             return
         
         if not quiz_data["answered"]:
@@ -5086,6 +6361,7 @@ async def run_film_quiz(channel, channel_id: int):
         
         if channel_id in active_film_quiz:
             del active_film_quiz[channel_id]
+            unregister_answer_consumer(channel_id, "film")
 
 @bot.command(name="film", aliases=["movie", "kino"])
 @commands.has_permissions(administrator=True)
@@ -5115,6 +6391,7 @@ async def prefix_film(ctx, zanr: str = "random"):
         "quiz_time": quiz_time,
         "guild_id": guild_id
     }
+    register_answer_consumer(channel_id, "film", handle_film_answer)
     
     genre_names = {"ceske": "🇨🇿 České", "hollywood": "🎬 Hollywood", "komedie": "😂 Komedie", "akcni": "💥 Akční", "horor": "👻 Horor", "scifi": "🚀 Sci-Fi"}
     
@@ -5138,11 +6415,13 @@ async def slash_stop(interaction: discord.Interaction):
     stopped = []
     
     if channel_id in active_music_quiz:
-        del active_music_quiz[channel_id]
+        end_quiz_round(active_music_quiz.pop(channel_id))
+        unregister_answer_consumer(channel_id, "music")
         stopped.append("🎵 Hudební kvíz")
     
     if channel_id in active_film_quiz:
-        del active_film_quiz[channel_id]
+        end_quiz_round(active_film_quiz.pop(channel_id))
+        unregister_answer_consumer(channel_id, "film")
         stopped.append("🎬 Filmový kvíz")
     
     if stopped:
@@ -5157,11 +6436,13 @@ async def prefix_stop_quiz(ctx):
     stopped = []
     
     if channel_id in active_music_quiz:
-        del active_music_quiz[channel_id]
+        end_quiz_round(active_music_quiz.pop(channel_id))
+        unregister_answer_consumer(channel_id, "music")
         stopped.append("🎵 Hudební kvíz")
     
     if channel_id in active_film_quiz:
-        del active_film_quiz[channel_id]
+        end_quiz_round(active_film_quiz.pop(channel_id))
+        unregister_answer_consumer(channel_id, "film")
         stopped.append("🎬 Filmový kvíz")
     
     if stopped:
@@ -5169,6 +6450,58 @@ async def prefix_stop_quiz(ctx):
     else:
         await ctx.send("❌ Žádný kvíz neběží v tomto kanálu.")
 
+async def handle_quiz_answer(message, quizzes: dict, kind: str, answer_fields: tuple):
+    """Vyhodnoť odpověď v kanálu s běžícím kvízem (quizzes = active_*_quiz, kind = konzument a zdroj XP).
+    answer_fields: [(název pole v embedu, klíč v otázce)] - správná odpověď v oznámení."""
+    channel_id = message.channel.id
+    quiz_data = quizzes.get(channel_id)
+    if quiz_data is None:
+        unregister_answer_consumer(channel_id, kind)
+        return
+    
+    if not quiz_data.get("active") or not quiz_data.get("current_question") or quiz_data.get("answered"):
+        return
+    if not quiz_data["matcher"].matches(message.content):
+        return
+    quiz_data["answered"] = True
+    
+    # Kolo se probudí až po oznámení správné odpovědi
+    try:
+        # Add score
+        user_id = message.author.id
+        if user_id not in quiz_data["scores"]:
+            quiz_data["scores"][user_id] = {"name": message.author.display_name, "score": 0}
+        quiz_data["scores"][user_id]["score"] += 1
+        current_score = quiz_data["scores"][user_id]["score"]
+        
+        # Add XP
+        guild_id = quiz_data.get("guild_id", message.guild.id)
+        await add_xp(guild_id, user_id, message.author.display_name, XP_REWARDS["quiz_correct"], message.channel,
+                     extra_inc={"total_games": 1, "total_correct": 1}, source=f"quiz_{kind}")
+        
+        embed = discord.Embed(
+            title="🎉 SPRÁVNĚ!",
+            description=f"**{message.author.display_name}** uhodl/a!",
+            color=discord.Color.green()
+        )
+        for name, key in answer_fields:
+            embed.add_field(name=name, value=quiz_data["current_question"][key], inline=True)
+        embed.add_field(name="📊 Skóre", value=f"{current_score} bodů", inline=True)
+        embed.add_field(name="✨ XP", value=f"+{XP_REWARDS['quiz_correct']} XP", inline=True)
+        embed.set_thumbnail(url=message.author.display_avatar.url)
+        
+        await message.channel.send(f"🏆 {message.author.mention}", embed=embed)
+    finally:
+        end_quiz_round(quiz_data)
+
+async def handle_film_answer(message):
+    """Vyhodnoť odpověď v kanálu s běžícím filmovým kvízem"""
+    await handle_quiz_answer(message, active_film_quiz, "film", (("🎬 Film", "film"), ("📅 Rok", "year")))
+
+async def handle_music_answer(message):
+    """Vyhodnoť odpověď v kanálu s běžícím hudebním kvízem"""
+    await handle_quiz_answer(message, active_music_quiz, "music", (("🎤 Interpret", "artist"), ("🎵 Píseň", "song")))
+
 # Listen for quiz answers
 @bot.event
 async def on_message(message):
@@ -5179,90 +6512,16 @@ async def on_message(message):
     if message.guild:
         increment_message_count(message.guild.id, message.author.id, message.author.display_name)
     
-    # Skip if message is a command
-    if message.content.startswith('!'):
+    # Příkazy - jediný průchod process_commands
+    if message.content.startswith(bot.command_prefix):
         await bot.process_commands(message)
         return
     
-    channel_id = message.channel.id
-    
-    # Check for active FILM quiz
-    if channel_id in active_film_quiz:
-        quiz_data = active_film_quiz[channel_id]
-        
-        if quiz_data.get("active") and quiz_data.get("current_question") and not quiz_data.get("answered"):
-            user_answer = normalize_answer(message.content)
-            correct_film = normalize_answer(quiz_data["current_question"]["film"])
-            
-            # Check if answer matches
-            if len(user_answer) >= 3 and (correct_film in user_answer or user_answer in correct_film):
-                quiz_data["answered"] = True
-                
-                # Add score
-                user_id = message.author.id
-                if user_id not in quiz_data["scores"]:
-                    quiz_data["scores"][user_id] = {"name": message.author.display_name, "score": 0}
-                quiz_data["scores"][user_id]["score"] += 1
-                
-                current_score = quiz_data["scores"][user_id]["score"]
-                
-                # Add XP
-                guild_id = quiz_data.get("guild_id", message.guild.id)
-                await add_xp(guild_id, user_id, message.author.display_name, XP_REWARDS["quiz_correct"], message.channel)
-                increment_stats(guild_id, user_id, correct=True)
-                
-                embed = discord.Embed(
-                    title="🎉 SPRÁVNĚ!",
-                    description=f"**{message.author.display_name}** uhodl/a!",
-                    color=discord.Color.green()
-                )
-                embed.add_field(name="🎬 Film", value=quiz_data["current_question"]["film"], inline=True)
-                embed.add_field(name="📅 Rok", value=quiz_data["current_question"]["year"], inline=True)
-                embed.add_field(name="📊 Skóre", value=f"{current_score} bodů", inline=True)
-                embed.add_field(name="✨ XP", value=f"+{XP_REWARDS['quiz_correct']} XP", inline=True)
-                embed.set_thumbnail(url=message.author.display_avatar.url)
-                
-                await message.channel.send(f"🏆 {message.author.mention}", embed=embed)
-    
-    # Check for active MUSIC quiz
-    if channel_id in active_music_quiz:
-        quiz_data = active_music_quiz[channel_id]
-        
-        if quiz_data.get("active") and quiz_data.get("current_question") and not quiz_data.get("answered"):
-            user_answer = normalize_answer(message.content)
-            correct_artist = normalize_answer(quiz_data["current_question"]["artist"])
-            
-            # Check if answer matches
-            if len(user_answer) >= 3 and (correct_artist in user_answer or user_answer in correct_artist):
-                quiz_data["answered"] = True
-                
-                # Add score
-                user_id = message.author.id
-                if user_id not in quiz_data["scores"]:
-                    quiz_data["scores"][user_id] = {"name": message.author.display_name, "score": 0}
-                quiz_data["scores"][user_id]["score"] += 1
-                
-                current_score = quiz_data["scores"][user_id]["score"]
-                
-                # Add XP
-                guild_id = quiz_data.get("guild_id", message.guild.id)
-                await add_xp(guild_id, user_id, message.author.display_name, XP_REWARDS["quiz_correct"], message.channel)
-                increment_stats(guild_id, user_id, correct=True)
-                
-                embed = discord.Embed(
-                    title="🎉 SPRÁVNĚ!",
-                    description=f"**{message.author.display_name}** uhodl/a!",
-                    color=discord.Color.green()
-                )
-                embed.add_field(name="🎤 Interpret", value=quiz_data["current_question"]["artist"], inline=True)
-                embed.add_field(name="🎵 Píseň", value=quiz_data["current_question"]["song"], inline=True)
-                embed.add_field(name="📊 Skóre", value=f"{current_score} bodů", inline=True)
-                embed.add_field(name="✨ XP", value=f"+{XP_REWARDS['quiz_correct']} XP", inline=True)
-                embed.set_thumbnail(url=message.author.display_avatar.url)
-                
-                await message.channel.send(f"🏆 {message.author.mention}", embed=embed)
-    
-    await bot.process_commands(message)
+    # Odpovědi - jen v kanálech s registrovaným konzumentem
+    consumers = answer_consumers.get(message.channel.id)
+    if consumers:
+        for handler in list(consumers.values()):
+            await handler(message)
 
 # ============== RUN BOT ==============
 
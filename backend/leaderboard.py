@@ -0,0 +1,61 @@
+"""
+Žebříček hráčů držený v paměti bota (jeden na server).
+
+Hráči jsou seřazení podle XP v setříděném seznamu klíčů (-xp, user_id), takže
+TOP N je řez seznamu a pořadí hráče je binární vyhledání. Bot ho sestaví z
+MongoDB při startu a aktualizuje při každém zápisu profilu.
+
+Vložení a odebrání v seznamu je O(n) (posun prvků), ale jde o jeden memmove
+nad polem ukazatelů - i se 100 000 hráči na serveru trvá změna XP desítky
+mikrosekund. Proto stačí bisect nad seznamem místo skip listu nebo
+sortedcontainers, které nejsou mezi závislostmi.
+"""
+
+from bisect import bisect_left, insort
+
+
+class GuildLeaderboard:
+    """Setříděný žebříček jednoho serveru"""
+
+    def __init__(self):
+        self._keys = []    # [(-xp, user_id)] vzestupně = od nejvíce XP
+        self._xp = {}      # user_id -> xp
+        self._names = {}   # user_id -> jméno
+
+    def __len__(self):
+        return len(self._keys)
+
+    def update(self, user_id: int, xp: int, name: str = None):
+        """Vlož hráče nebo mu změň XP"""
+        if name:
+            self._names[user_id] = name
+        old_xp = self._xp.get(user_id)
+        if old_xp == xp:
+            return
+        if old_xp is not None:
+            index = bisect_left(self._keys, (-old_xp, user_id))
+            del self._keys[index]
+        self._xp[user_id] = xp
+        insort(self._keys, (-xp, user_id))
+
+    def remove(self, user_id: int):
+        """Odeber hráče ze žebříčku"""
+        old_xp = self._xp.pop(user_id, None)
+        self._names.pop(user_id, None)
+        if old_xp is not None:
+            index = bisect_left(self._keys, (-old_xp, user_id))
+            del self._keys[index]
+
+    def top(self, limit: int = 10) -> list:
+        """Prvních N hráčů jako [{"user_id", "xp", "name"}]"""
+        return [
+            {"user_id": user_id, "xp": -neg_xp, "name": self._names.get(user_id, f"Hráč {user_id}")}
+            for neg_xp, user_id in self._keys[:limit]
+        ]
+
+    def rank(self, user_id: int):
+        """Pořadí hráče (od 1), nebo None pokud v žebříčku není"""
+        xp = self._xp.get(user_id)
+        if xp is None:
+            return None
+        return bisect_left(self._keys, (-xp, user_id)) + 1
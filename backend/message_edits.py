@@ -0,0 +1,124 @@
+"""
+Plánovač editací živě aktualizovaných zpráv (odpočty, ankety, giveawaye).
+
+Smyčky a tlačítka zprávu needitují samy, ale předají plánovači její nový
+stav. Plánovač drží pro každou zprávu jen poslední čekající stav, editaci
+se stejným obsahem jako naposledy odeslaný přeskočí a editace posílá v tempu
+limitu Discordu na kanál - dvacet odpočtů v jednom kanálu tak neskončí na 429.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+import discord
+
+from notifications import RateWindow
+
+
+def _fingerprint(fields: dict):
+    """Porovnatelná podoba editace, nebo None pokud ji nelze porovnat (např. view)"""
+    parts = []
+    for name, value in sorted(fields.items()):
+        if isinstance(value, discord.Embed):
+            value = value.to_dict()
+        elif value is not None and not isinstance(value, (str, int)):
+            return None
+        parts.append((name, value))
+    return repr(parts)
+
+
+class MessageEditScheduler:
+    """Jeden worker pro všechny živé zprávy bota"""
+
+    def __init__(self, rate: int = 5, per: float = 5.0, max_tracked: int = 1000):
+        self.rate = rate
+        self.per = per
+        self.max_tracked = max_tracked
+        self._pending = OrderedDict()  # message_id -> (zpráva, pole editace, otisk)
+        self._sent = OrderedDict()     # message_id -> otisk naposledy odeslané editace (LRU)
+        self._windows = {}             # channel_id -> RateWindow
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.metrics = {
+            "scheduled": 0,  # požadavky na editaci
+            "coalesced": 0,  # nahrazené novějším stavem před odesláním
+            "skipped": 0,    # beze změny obsahu
+            "edits": 0,      # odeslané editace
+            "errors": 0,
+        }
+
+    def _window(self, channel_id: int) -> RateWindow:
+        window = self._windows.get(channel_id)
+        if window is None:
+            window = self._windows[channel_id] = RateWindow(self.rate, self.per)
+        return window
+
+    def schedule(self, message, **fields):
+        """Naplánuj editaci zprávy - čekající starší stav téže zprávy se zahodí"""
+        self.metrics["scheduled"] += 1
+        fingerprint = _fingerprint(fields)
+        if message.id in self._pending:
+            self.metrics["coalesced"] += 1
+        elif fingerprint is not None and self._sent.get(message.id) == fingerprint:
+            self.metrics["skipped"] += 1
+            return
+        # Přepsání klíče v OrderedDict zachová pořadí - zpráva nepřijde o své místo ve frontě
+        self._pending[message.id] = (message, fields, fingerprint)
+        self._wakeup.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def forget(self, message_id: int):
+        """Zahoď čekající editaci i stav zprávy (zpráva skončila nebo ji upravil někdo jiný)"""
+        self._pending.pop(message_id, None)
+        self._sent.pop(message_id, None)
+
+    async def edit_now(self, message, **fields):
+        """Finální editace - přednost před čekající, počká jen na volný slot kanálu"""
+        self.forget(message.id)
+        await self._window(message.channel.id).acquire()
+        await message.edit(**fields)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            wait = None
+            for message_id, (message, fields, fingerprint) in self._pending.items():
+                delay = self._window(message.channel.id).delay()
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                del self._pending[message_id]
+                await self._edit(message_id, message, fields, fingerprint)
+                break  # fronta se během editace mohla změnit - projdi ji znovu
+            else:
+                # Nic k odeslání (prázdná fronta nebo kanály bez volného slotu)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _edit(self, message_id: int, message, fields: dict, fingerprint):
+        if fingerprint is not None and self._sent.get(message_id) == fingerprint:
+            self.metrics["skipped"] += 1
+            return
+        self._window(message.channel.id).record()
+        try:
+            await message.edit(**fields)
+        except discord.NotFound:
+            self._sent.pop(message_id, None)
+            return
+        except discord.HTTPException as e:
+            self.metrics["errors"] += 1
+            print(f"❌ [EDIT] Editace zprávy {message_id} selhala: {e}", flush=True)
+            return
+        self._remember(message_id, fingerprint)
+        self.metrics["edits"] += 1
+
+    def _remember(self, message_id: int, fingerprint):
+        # Ne každá živá zpráva skončí přes forget/edit_now (smazaná zpráva, pád handleru) -
+        # otisky drží jen posledních max_tracked zpráv
+        self._sent[message_id] = fingerprint
+        self._sent.move_to_end(message_id)
+        while len(self._sent) > self.max_tracked:
+            self._sent.popitem(last=False)
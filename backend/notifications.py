@@ -0,0 +1,144 @@
+"""
+Odchozí fronta notifikací bota (level up, úkoly, odemčené hry, XP za hraní).
+
+Notifikace se neposílají hned, ale řadí se do fronty kanálu. Worker kanálu
+chvíli počká, aby se sešel celý burst (např. víc hráčů po raidu), seřadí
+položky podle priority a pošle je po MAX_EMBEDS_PER_MESSAGE embedech v jedné
+zprávě s jedním pingem. Tempo odesílání drží pod limitem Discordu pro posílání
+zpráv do kanálu (5 zpráv / 5 s na kanál), takže notifikace nevyčerpají limity
+potřebné pro odpovědi na příkazy.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+import discord
+
+MAX_EMBEDS_PER_MESSAGE = 10  # limit Discordu
+
+# Nižší číslo = odešle se dřív
+PRIORITY_HIGH = 0    # odemčené hry, splněné úkoly (s pingem role)
+PRIORITY_NORMAL = 1  # level up
+PRIORITY_LOW = 2     # souhrn XP za hraní
+
+
+class RateWindow:
+    """Klouzavé okno - nejvýš `rate` požadavků za `per` sekund"""
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self._times = deque()
+
+    def delay(self) -> float:
+        """Za kolik sekund bude volný slot (0 = hned)"""
+        now = time.monotonic()
+        while self._times and self._times[0] + self.per <= now:
+            self._times.popleft()
+        if len(self._times) < self.rate:
+            return 0.0
+        return self._times[0] + self.per - now
+
+    def record(self):
+        self._times.append(time.monotonic())
+
+    async def acquire(self):
+        """Počkej na volný slot a obsaď ho"""
+        delay = self.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.delay()
+        self.record()
+
+
+class _ChannelQueue:
+    """Fronta a limiter jednoho kanálu"""
+
+    def __init__(self, window: RateWindow, channel=None):
+        self.channel = channel
+        self.heap = []  # [(priorita, pořadí, embed, ping)]
+        self.window = window
+        self.task = None
+
+
+class NotificationDispatcher:
+    """Sdružuje notifikace do zpráv po kanálech a odesílá je v tempu limitu Discordu"""
+
+    def __init__(self, resolve_channel, coalesce_delay: float = 2.0, rate: int = 5, per: float = 5.0):
+        self._resolve_channel = resolve_channel  # channel_id -> kanál (bot.get_channel)
+        self.coalesce_delay = coalesce_delay
+        self.rate = rate
+        self.per = per
+        self._queues = {}  # channel_id -> _ChannelQueue
+        self._order = itertools.count()
+        self._flushing = False
+        self.metrics = {
+            "enqueued": 0,       # přijaté notifikace
+            "sent_messages": 0,  # odeslané zprávy
+            "sent_embeds": 0,    # embedy v odeslaných zprávách
+            "rate_limited": 0,   # odpovědi 429 (dávka se vrátí do fronty)
+            "dropped": 0,        # neznámý kanál nebo chyba odeslání
+            "max_depth": 0,      # nejdelší fronta kanálu
+        }
+
+    def notify(self, channel, embed: discord.Embed, priority: int = PRIORITY_NORMAL, ping: str = None):
+        """Zařaď embed do fronty kanálu (kanál nebo jeho ID), ping se přidá do obsahu zprávy"""
+        channel_id = channel if isinstance(channel, int) else channel.id
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = _ChannelQueue(RateWindow(self.rate, self.per))
+        if not isinstance(channel, int):
+            queue.channel = channel
+
+        heapq.heappush(queue.heap, (priority, next(self._order), embed, ping))
+        self.metrics["enqueued"] += 1
+        self.metrics["max_depth"] = max(self.metrics["max_depth"], len(queue.heap))
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._drain(channel_id, queue))
+
+    def queue_depths(self) -> dict:
+        """Počet čekajících notifikací po kanálech"""
+        return {channel_id: len(queue.heap) for channel_id, queue in self._queues.items() if queue.heap}
+
+    async def flush(self, timeout: float = 10.0):
+        """Odešli všechno čekající bez sdružovací pauzy (při vypnutí bota)"""
+        self._flushing = True
+        tasks = [queue.task for queue in self._queues.values() if queue.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    async def _drain(self, channel_id: int, queue: _ChannelQueue):
+        try:
+            while queue.heap:
+                if not self._flushing:
+                    await asyncio.sleep(self.coalesce_delay)  # nech burst doběhnout
+                await queue.window.acquire()
+
+                batch = [heapq.heappop(queue.heap) for _ in range(min(MAX_EMBEDS_PER_MESSAGE, len(queue.heap)))]
+                channel = queue.channel or self._resolve_channel(channel_id)
+                if channel is None:
+                    self.metrics["dropped"] += len(batch)
+                    continue
+
+                pings = dict.fromkeys(ping for _, _, _, ping in batch if ping)
+                try:
+                    await channel.send(content=" ".join(pings) or None, embeds=[embed for _, _, embed, _ in batch])
+                except (discord.RateLimited, discord.HTTPException) as e:
+                    if isinstance(e, discord.HTTPException) and e.status != 429:
+                        print(f"❌ [NOTIFY] Chyba odeslání do {channel_id}: {e}", flush=True)
+                        self.metrics["dropped"] += len(batch)
+                        continue
+                    # Limit vyčerpaný i tak (sdílený s jinými procesy) - dávku zkusíme znovu
+                    self.metrics["rate_limited"] += 1
+                    for item in batch:
+                        heapq.heappush(queue.heap, item)
+                    await asyncio.sleep(getattr(e, "retry_after", self.per))
+                    continue
+
+                self.metrics["sent_messages"] += 1
+                self.metrics["sent_embeds"] += len(batch)
+        finally:
+            queue.task = None
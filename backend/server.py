@@ -3,6 +3,8 @@ from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from bson.errors import InvalidId
 import os
 import logging
 from pathlib import Path
@@ -12,6 +14,8 @@ import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
 
+from db_indexes import ensure_indexes
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -65,24 +69,15 @@ async def get_current_user(request: Request) -> Optional[DashboardUser]:
     if not session_token:
         return None
     
+    # Expirované sessions maže TTL index, filtr pokrývá prodlevu TTL monitoru
     session = await db.user_sessions.find_one(
-        {"session_token": session_token},
+        {"session_token": session_token, "expires_at": {"$gt": datetime.now(timezone.utc)}},
         {"_id": 0}
     )
     
     if not session:
         return None
     
-    # Check expiry
-    expires_at = session.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if expires_at < datetime.now(timezone.utc):
-        return None
-    
     user = await db.dashboard_users.find_one(
         {"user_id": session["user_id"]},
         {"_id": 0}
@@ -150,7 +145,7 @@ async def create_session(request: Request, response: Response):
     await db.user_sessions.insert_one({
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
+        "expires_at": expires_at,
         "created_at": datetime.now(timezone.utc).isoformat()
     })
     
@@ -689,12 +684,15 @@ async def get_guild_bot_settings(guild_id: str):
 async def update_guild_bot_settings(guild_id: str, request: Request):
     """Update bot settings for specific guild"""
     data = await request.json()
+    data.pop("_id", None)
+    data.pop("version", None)
     data["guild_id"] = guild_id
     data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
+    # Bot drží nastavení v paměti a podle změny "version" si ho znovu načte
     await db.guild_bot_settings.update_one(
         {"guild_id": guild_id},
-        {"$set": data},
+        {"$set": data, "$inc": {"version": 1}},
         upsert=True
     )
     
@@ -741,14 +739,77 @@ async def get_player_profile(user_id: str):
         logger.error(f"Player profile error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Zdroj XP v ledgeru -> typ položky historie pro frontend
+HISTORY_TYPES = {
+    "quiz_music": "music",
+    "quiz_film": "film",
+    "truth": "truth",
+}
+
 @api_router.get("/player/{user_id}/history")
-async def get_player_history(user_id: str, limit: int = 20):
-    """Get player quiz history"""
+async def get_player_history(user_id: str, limit: int = 20, before: Optional[str] = None, before_id: Optional[str] = None):
+    """Get player XP history from the XP ledger (newest first).
+    `before` and `before_id` are the date and id of the last item of the previous page -
+    položky se stejným časem (např. úkol a herní XP z jednoho zápisu) se tak mezi stránkami neztratí."""
+    before_ts = None
+    if before:
+        try:
+            before_ts = datetime.fromisoformat(before)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid 'before' date")
+    before_oid = None
+    if before_id:
+        if not before_ts:
+            raise HTTPException(status_code=400, detail="'before_id' requires 'before'")
+        try:
+            before_oid = ObjectId(before_id)
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid 'before_id'")
+    
     try:
-        history = await db.quiz_history.find(
-            {"user_id": int(user_id)},
-            {"_id": 0}
-        ).sort("date", -1).limit(limit).to_list(limit)
+        limit = max(1, min(limit, 100))
+        query = {"user_id": int(user_id)}
+        if before_oid:
+            query["$or"] = [
+                {"ts": {"$lt": before_ts}},
+                {"ts": before_ts, "_id": {"$lt": before_oid}}
+            ]
+        elif before_ts:
+            query["ts"] = {"$lt": before_ts}
+        
+        # Index user_ts_id - kurzor čte jen požadovanou stránku
+        entries = await db.xp_ledger.find(query).sort([("ts", -1), ("_id", -1)]).limit(limit).to_list(limit)
+        history = [
+            {
+                "type": HISTORY_TYPES.get(entry["source"], entry["source"]),
+                "source": entry["source"],
+                "guild_id": entry["guild_id"],
+                "correct": entry["source"] in HISTORY_TYPES,
+                "xp_earned": entry["amount"],
+                "date": entry["ts"].replace(tzinfo=timezone.utc).isoformat(),
+                "id": str(entry["_id"])
+            }
+            for entry in entries
+        ]
+        
+        # Starší historie je zkompaktovaná do denních souhrnů
+        if len(history) < limit:
+            summary_query = {"user_id": int(user_id)}
+            oldest = entries[-1]["ts"] if entries else before_ts
+            if oldest:
+                summary_query["day"] = {"$lt": oldest.strftime("%Y-%m-%d")}
+            remaining = limit - len(history)
+            summaries = await db.xp_daily_summary.find(summary_query, {"_id": 0}).sort("day", -1).limit(remaining).to_list(remaining)
+            history.extend(
+                {
+                    "type": "summary",
+                    "guild_id": summary["guild_id"],
+                    "by_source": summary["by_source"],
+                    "xp_earned": summary["total"],
+                    "date": summary["day"]
+                }
+                for summary in summaries
+            )
         
         return history
     except Exception as e:
@@ -767,6 +828,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def migrate_session_expiry():
+    """Převeď expires_at uložené jako ISO string na BSON datum (TTL index jinak dokument ignoruje)"""
+    migrated = 0
+    async for session in db.user_sessions.find({"expires_at": {"$type": "string"}}, {"expires_at": 1}):
+        expires_at = datetime.fromisoformat(session["expires_at"])
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        await db.user_sessions.update_one({"_id": session["_id"]}, {"$set": {"expires_at": expires_at}})
+        migrated += 1
+    if migrated:
+        logger.info(f"Migrated expires_at of {migrated} sessions to BSON dates")
+
+@app.on_event("startup")
+async def ensure_db_indexes():
+    try:
+        await migrate_session_expiry()
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Index bootstrap error: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -0,0 +1,167 @@
+"""
+Časovače bota (konec giveawaye, konec ankety, odpočty, zpožděné mazání zpráv).
+
+Místo samostatné asyncio.sleep úlohy pro každý časovač drží TimerService
+všechny časovače v jedné haldě seřazené podle času a jedna smyčka spí do
+nejbližšího z nich. Trvalé časovače se ukládají do MongoDB - zápisy i mazání
+se sbírají a odcházejí dávkově - a po restartu se načtou zpět, takže žádný
+konec giveawaye ani ankety se restartem neztratí. Netrvalé časovače (tiky
+živých zpráv, mazání krátkodobých odpovědí) žijí jen v paměti.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import ReplaceOne
+
+
+class TimerService:
+    """Halda časovačů s jednou probouzecí smyčkou a perzistencí v MongoDB"""
+
+    def __init__(self, collection):
+        self._collection = collection  # {_id, kind, due, payload}
+        self._handlers = {}            # kind -> async handler(payload)
+        self._heap = []                # [(due timestamp, pořadí, timer_id)]
+        self._timers = {}              # timer_id -> (časovač, trvalý?)
+        self._unsaved = {}             # timer_id -> časovač čekající na zápis
+        self._deleted = set()          # timer_id čekající na smazání z DB
+        self._running = set()          # timer_id, jejichž obsluha právě běží (záznam v DB ještě je)
+        self._loaded = False
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.metrics = {"scheduled": 0, "fired": 0, "cancelled": 0, "errors": 0}
+
+    def handler(self, kind: str):
+        """Dekorátor - zaregistruj obsluhu časovačů daného druhu"""
+        def register(func):
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def schedule(self, kind: str, due: datetime, payload: dict, timer_id: str = None, persist: bool = True) -> str:
+        """Naplánuj časovač (bez čekání na DB - zápis proběhne dávkově ve smyčce)"""
+        timer_id = timer_id or uuid.uuid4().hex
+        timer = {"_id": timer_id, "kind": kind, "due": due, "payload": payload}
+        self._timers[timer_id] = (timer, persist)
+        if persist:
+            self._unsaved[timer_id] = timer
+            self._deleted.discard(timer_id)
+        heapq.heappush(self._heap, (due.timestamp(), next(self._order), timer_id))
+        self.metrics["scheduled"] += 1
+        self._wakeup.set()
+        return timer_id
+
+    def cancel(self, timer_id: str) -> bool:
+        """Zruš časovač (záznam v haldě se zahodí, až na něj přijde řada)"""
+        entry = self._timers.pop(timer_id, None)
+        if entry is None:
+            return False
+        self._forget(timer_id, entry[1])
+        self.metrics["cancelled"] += 1
+        self._wakeup.set()
+        return True
+
+    def pending(self, kind: str) -> list:
+        """Čekající časovače daného druhu"""
+        return [timer for timer, _ in self._timers.values() if timer["kind"] == kind]
+
+    def _forget(self, timer_id: str, persist: bool):
+        # Neuložený časovač stačí vyřadit z fronty zápisů, uložený se smaže z DB
+        if persist and self._unsaved.pop(timer_id, None) is None:
+            self._deleted.add(timer_id)
+
+    async def load(self) -> int:
+        """Načti trvalé časovače z DB (jednou po startu bota)"""
+        if self._loaded:
+            return 0
+        self._loaded = True
+        loaded = 0
+        async for timer in self._collection.find({}):
+            timer_id = timer["_id"]
+            # Běžící obsluha smaže záznam z DB až po doběhnutí - znovu ji nespouštěj
+            if timer_id in self._timers or timer_id in self._deleted or timer_id in self._running:
+                continue
+            self._timers[timer_id] = (timer, True)
+            heapq.heappush(self._heap, (timer["due"].timestamp(), next(self._order), timer_id))
+            loaded += 1
+        self._wakeup.set()
+        return loaded
+
+    async def sync(self):
+        """Zapiš nové a smaž dokončené trvalé časovače - dvě dávkové operace"""
+        if self._unsaved:
+            unsaved, self._unsaved = self._unsaved, {}
+            try:
+                await self._collection.bulk_write(
+                    [ReplaceOne({"_id": timer_id}, timer, upsert=True) for timer_id, timer in unsaved.items()],
+                    ordered=False
+                )
+            except Exception:
+                unsaved.update(self._unsaved)
+                self._unsaved = unsaved
+                raise
+        if self._deleted:
+            deleted, self._deleted = self._deleted, set()
+            try:
+                await self._collection.delete_many({"_id": {"$in": list(deleted)}})
+            except Exception:
+                self._deleted |= deleted
+                raise
+
+    def start(self):
+        """Spusť probouzecí smyčku (jen jednou)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"❌ [TIMER] Chyba při ukládání časovačů: {e}", flush=True)
+
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, timer_id = heapq.heappop(self._heap)
+                entry = self._timers.pop(timer_id, None)
+                if entry is None:
+                    continue  # zrušený nebo přeplánovaný
+                timer, persist = entry
+                if timer["due"].timestamp() > now:
+                    # Přeplánovaný pod stejným ID - platí novější záznam v haldě
+                    self._timers[timer_id] = entry
+                    continue
+                self._running.add(timer_id)
+                asyncio.create_task(self._fire(timer, persist))
+
+            timeout = max(0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, timer: dict, persist: bool):
+        handler = self._handlers.get(timer["kind"])
+        try:
+            if handler is None:
+                print(f"❌ [TIMER] Neznámý druh časovače: {timer['kind']}", flush=True)
+            else:
+                await handler(timer["payload"])
+            self.metrics["fired"] += 1
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"❌ [TIMER] Chyba časovače {timer['kind']}: {e}", flush=True)
+        finally:
+            self._running.discard(timer["_id"])
+            # Z DB až po doběhnutí obsluhy - pád uprostřed ji po restartu spustí znovu.
+            # Obsluha mohla pod stejným ID naplánovat nový trvalý časovač - ten zůstává.
+            current = self._timers.get(timer["_id"])
+            if current is None or not current[1]:
+                self._forget(timer["_id"], persist)
+            self._wakeup.set()
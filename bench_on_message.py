@@ -0,0 +1,111 @@
+"""
+Benchmark on_message - kolik zpráv za sekundu bot zpracuje.
+
+Spouští handler on_message nad falešnými zprávami (bez Discordu i bez DB -
+statistiky zpráv jdou jen do write-behind bufferu) ve dvou situacích:
+běžný chat v kanálu bez kvízu a špatné odpovědi v kanálu s běžícím kvízem.
+
+Použití:
+    python bench_on_message.py                       # aktuální backend/discord_bot.py
+    python bench_on_message.py --module old_bot.py   # jiná verze (např. z git show)
+
+Výsledky se připisují do bench_output.txt.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import io
+import contextlib
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+
+def load_bot_module(path):
+    """Načti modul bota ze souboru (import spouští jen setup, ne bot.run)"""
+    sys.path.insert(0, BACKEND_DIR)
+    spec = importlib.util.spec_from_file_location("discord_bot", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["discord_bot"] = module
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+
+def make_message(bot_module, channel_id, user_id, content):
+    return SimpleNamespace(
+        _state=bot_module.bot._connection,
+        author=SimpleNamespace(bot=False, id=user_id, display_name=f"Uživatel {user_id}"),
+        guild=SimpleNamespace(id=1),
+        channel=SimpleNamespace(id=channel_id),
+        content=content,
+    )
+
+
+def start_quiz(bot_module, channel_id):
+    """Nastav běžící hudební kvíz s otevřenou otázkou"""
+    bot_module.active_music_quiz[channel_id] = {
+        "active": True,
+        "genre": "rock",
+        "current_round": 1,
+        "total_rounds": 5,
+        "scores": {},
+        "current_question": {"artist": "Kabát", "song": "Pohoda", "hint": "K____"},
+        "answered": False,
+        "quiz_time": 60,
+        "guild_id": 1,
+    }
+    if hasattr(bot_module, "build_answer_matcher"):
+        question = bot_module.active_music_quiz[channel_id]["current_question"]
+        bot_module.active_music_quiz[channel_id]["matcher"] = bot_module.build_answer_matcher(
+            question["artist"], question, bot_module.ARTIST_ALIASES
+        )
+    if hasattr(bot_module, "register_answer_consumer"):
+        bot_module.register_answer_consumer(channel_id, "music", bot_module.handle_music_answer)
+
+
+async def run_scenario(bot_module, messages):
+    start = time.perf_counter()
+    for message in messages:
+        await bot_module.on_message(message)
+    elapsed = time.perf_counter() - start
+    bot_module.stats_buffer.clear()
+    return len(messages) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default=os.path.join(BACKEND_DIR, "discord_bot.py"))
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--label", default=None)
+    args = parser.parse_args()
+
+    bot_module = load_bot_module(args.module)
+    bot_module.bot._connection.user = SimpleNamespace(id=0)  # bot "přihlášený" pro get_context
+
+    # Menší počet uživatelů, aby buffer nevynutil flush do DB
+    chat = [make_message(bot_module, 100, i % 50, f"ahoj jak se máte dneska {i}") for i in range(args.messages)]
+    start_quiz(bot_module, 200)
+    answers = [make_message(bot_module, 200, i % 50, f"špatná odpověď číslo {i}") for i in range(args.messages)]
+
+    results = {
+        "chat bez kvízu": await run_scenario(bot_module, chat),
+        "odpovědi v kvízu": await run_scenario(bot_module, answers),
+    }
+
+    label = args.label or os.path.relpath(args.module, ROOT_DIR)
+    lines = [f"[on_message] {label} ({args.messages} zpráv na scénář)"]
+    lines += [f"  {name}: {rate:,.0f} zpráv/s" for name, rate in results.items()]
+    report = "\n".join(lines)
+    print(report)
+    with open(os.path.join(ROOT_DIR, "bench_output.txt"), "a", encoding="utf-8") as output:
+        output.write(report + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -36,7 +36,7 @@ source venv/bin/activate
 # Instalace Python balíčků
 echo "📦 Instaluji Python balíčky..."
 pip install --upgrade pip
-pip install discord.py[voice] pymongo python-dotenv aiohttp PyNaCl yt-dlp
+pip install discord.py[voice] pymongo motor python-dotenv aiohttp PyNaCl yt-dlp
 
 echo ""
 echo "✅ Základní instalace dokončena!"
@@ -197,6 +197,26 @@ function LeaderboardPage({ onBack, onViewProfile }) {
 
 // ============== Player Profile Page ==============
 
+// Typy položek historie XP (viz /api/player/{user_id}/history)
+const HISTORY_ICONS = {
+  music: '🎵',
+  film: '🎬',
+  truth: '🤔',
+  daily: '🎁',
+  game_time: '🕹️',
+  quest: '🎯',
+  unlock: '🔓',
+  summary: '📅',
+};
+
+const HISTORY_LABELS = {
+  daily: '🎁 Denní bonus',
+  game_time: '🕹️ Hraní her',
+  quest: '🎯 Splněný úkol',
+  unlock: '🔓 Odemčená hra',
+  summary: '📅 Souhrn dne',
+};
+
 function PlayerProfilePage({ player, onBack }) {
   const [profile, setProfile] = useState(null);
   const [history, setHistory] = useState([]);
@@ -303,11 +323,11 @@ function PlayerProfilePage({ player, onBack }) {
                 {history.map((item, index) => (
                   <div key={index} className="history-item">
                     <span className="history-type">
-                      {item.type === 'music' ? '🎵' : item.type === 'film' ? '🎬' : '🤔'}
+                      {HISTORY_ICONS[item.type] || '🤔'}
                     </span>
                     <div className="history-info">
                       <span className="history-result">
-                        {item.won ? '🏆 Výhra' : item.correct ? '✅ Správně' : '❌ Špatně'}
+                        {item.won ? '🏆 Výhra' : item.correct ? '✅ Správně' : HISTORY_LABELS[item.type] || '❌ Špatně'}
                       </span>
                       <span className="history-date">{new Date(item.date).toLocaleDateString('cs-CZ')}</span>
                     </div>
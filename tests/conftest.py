@@ -0,0 +1,130 @@
+import operator
+import os
+import shutil
+import sys
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+
+COMPARISONS = {"$lt": operator.lt, "$lte": operator.le, "$gt": operator.gt, "$gte": operator.ge}
+
+
+def matches(document: dict, query: dict) -> bool:
+    """Zjednodušené vyhodnocení MongoDB filtru (rovnost, $exists, $ne, $in, porovnání, $or)"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+            continue
+        value = document.get(field)
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            for op, operand in condition.items():
+                if op == "$exists" and (field in document) != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op in COMPARISONS and (value is None or not COMPARISONS[op](value, operand)):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = list(documents)
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction or 1)]
+        for field, order in reversed(keys):
+            self._documents.sort(key=lambda doc: doc[field], reverse=order < 0)
+        return self
+
+    def limit(self, count):
+        self._documents = self._documents[:count]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._documents:
+            yield document
+
+    async def to_list(self, length=None):
+        return self._documents[:length]
+
+
+class FakeCollection:
+    """Kolekce bez DB - drží dokumenty v seznamu a zaznamenává zápisy"""
+
+    def __init__(self, name="fake", documents=None):
+        self.name = name
+        self.documents = list(documents or [])
+        self.calls = []
+        self.fail = None  # výjimka, kterou vyhodí další zápis
+        self.aggregate_result = []
+
+    def _maybe_fail(self):
+        if self.fail is not None:
+            error, self.fail = self.fail, None
+            raise error
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(doc for doc in self.documents if matches(doc, query or {}))
+
+    async def find_one(self, query=None, projection=None):
+        return next((doc for doc in self.documents if matches(doc, query or {})), None)
+
+    def aggregate(self, pipeline):
+        self.calls.append(("aggregate", pipeline))
+        return FakeCursor(self.aggregate_result)
+
+    async def update_one(self, query, update, upsert=False):
+        self.calls.append(("update_one", query, update, upsert))
+        self._maybe_fail()
+        document = next((doc for doc in self.documents if matches(doc, query)), None)
+        if document is None:
+            return SimpleNamespace(matched_count=0, modified_count=0)
+        document.update(update.get("$set", {}))
+        return SimpleNamespace(matched_count=1, modified_count=1)
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append(("bulk_write", operations, ordered))
+        self._maybe_fail()
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls.append(("insert_many", documents, ordered))
+        self._maybe_fail()
+
+
+@pytest.fixture
+def fake_collection():
+    return FakeCollection
+
+
+@pytest.fixture(scope="session")
+def bot_module():
+    """Modul bota (import nespouští bot.run ani připojení k DB)"""
+    which = shutil.which
+    # Import nesmí zkoušet instalovat FFmpeg přes apt-get
+    with mock.patch("shutil.which", lambda cmd, *a, **k: "/usr/bin/ffmpeg" if cmd == "ffmpeg" else which(cmd, *a, **k)):
+        import discord_bot
+    return discord_bot
+
+
+@pytest.fixture(scope="session")
+def server_module():
+    """Modul dashboard API (klient MongoDB se připojí až při prvním dotazu)"""
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "quiz_bot_test")
+    import server
+    return server
@@ -0,0 +1,60 @@
+import pytest
+
+from answer_matcher import AnswerMatcher, allowed_typos, bounded_distance, normalize_answer
+
+
+def test_normalize_strips_case_accents_and_punctuation():
+    assert normalize_answer("  Žluťoučký KŮŇ, úpěl! ") == "zlutoucky kun upel"
+
+
+@pytest.mark.parametrize("length, typos", [(3, 0), (5, 0), (6, 1), (9, 1), (10, 2), (25, 2)])
+def test_typo_tolerance_scales_conservatively(length, typos):
+    assert allowed_typos(length) == typos
+
+
+def test_bounded_distance_stops_past_limit():
+    assert bounded_distance("kabat", "kabat", 1) == 0
+    assert bounded_distance("kabat", "kabut", 1) == 1
+    assert bounded_distance("kabat", "xyz", 1) == 2
+
+
+@pytest.mark.parametrize("answer, guess", [
+    ("Klus", "plus"),
+    ("Klus", "klub"),
+    ("Klus", "kluk"),
+    ("Sedm", "sem"),
+    ("Gott", "got"),
+    ("Gott", "goth"),
+    ("Kabát", "kabel"),
+    ("Queen", "green"),
+])
+def test_short_answers_reject_near_miss_chat_words(answer, guess):
+    assert not AnswerMatcher([answer]).matches(guess)
+
+
+@pytest.mark.parametrize("answer, guess", [
+    ("Klus", "klus"),
+    ("Gott", "Karel Gott"),
+    ("Kabát", "kabat!"),
+    ("Pelíšky", "pelisky"),
+    ("Pelíšky", "pelišk"),             # 7 znaků, 1 překlep
+    ("Metallica", "metalica"),         # 9 znaků, 1 překlep
+    ("Nirvana", "nirvanna"),
+    ("Lucie Bílá", "lucie bila"),
+    ("Pelíšky", "to byly pelisky"),    # odpověď jako celé slovo ve zprávě
+    ("Olympic Beatles", "olympik beatls"),  # 15 znaků, 2 překlepy
+])
+def test_answers_and_tolerated_typos_match(answer, guess):
+    assert AnswerMatcher([answer]).matches(guess)
+
+
+def test_medium_answers_allow_only_one_typo():
+    matcher = AnswerMatcher(["Metallica"])
+    assert not matcher.matches("metlica")
+
+
+def test_aliases_are_all_accepted():
+    matcher = AnswerMatcher(["Karel Gott", "Gott", ""])
+    assert matcher.answers == {"karel gott", "gott"}
+    assert matcher.matches("gott")
+    assert not matcher.matches("")
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+
+class Channel:
+    def __init__(self):
+        self.bulk = []
+        self.single = []
+
+    async def delete_messages(self, objects):
+        self.bulk.append([obj.id for obj in objects])
+
+    def get_partial_message(self, message_id):
+        channel = self
+
+        class Partial:
+            async def delete(self):
+                channel.single.append(message_id)
+        return Partial()
+
+
+def snowflake(age):
+    return discord.utils.time_snowflake(datetime.now(timezone.utc) - age)
+
+
+@pytest.fixture
+def deletions(bot_module, monkeypatch):
+    channel = Channel()
+    monkeypatch.setattr(bot_module, "bot", SimpleNamespace(get_channel={1: channel}.get))
+    monkeypatch.setattr(bot_module, "BULK_DELETE_WINDOW", 0)
+    monkeypatch.setattr(bot_module, "pending_deletions", {})
+    return bot_module, channel
+
+
+def test_due_replies_in_one_channel_are_deleted_in_one_call(deletions):
+    bot, channel = deletions
+    ids = [snowflake(timedelta(minutes=n)) for n in range(1, 4)]
+
+    async def main():
+        await asyncio.gather(*(
+            bot.delete_message_timer({"channel_id": 1, "message_id": message_id}) for message_id in ids
+        ))
+
+    asyncio.run(main())
+
+    assert channel.bulk == [ids]
+    assert channel.single == []
+
+
+def test_old_and_lone_messages_fall_back_to_single_deletes(deletions):
+    bot, channel = deletions
+    old = snowflake(timedelta(days=15))
+    recent = snowflake(timedelta(minutes=1))
+
+    asyncio.run(bot.delete_messages_bulk(1, [old, recent]))
+
+    assert channel.bulk == []
+    assert sorted(channel.single) == sorted([old, recent])
+
+
+def test_batches_respect_bulk_limit(deletions, monkeypatch):
+    bot, channel = deletions
+    monkeypatch.setattr(bot, "BULK_DELETE_LIMIT", 2)
+    ids = [snowflake(timedelta(minutes=n)) for n in range(1, 6)]
+
+    asyncio.run(bot.delete_messages_bulk(1, ids))
+
+    assert [len(chunk) for chunk in channel.bulk] == [2, 2, 1]  # zbytek po jedné zprávě řeší discord.py
+    assert channel.single == []
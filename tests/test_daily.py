@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+class FakeUsers:
+    """Profil hráče s podmíněným update_user jako v MongoDB"""
+
+    def __init__(self, last_daily=None, streak=0):
+        self.user = {"guild_id": 1, "user_id": 7, "xp": 0, "last_daily": last_daily, "streak": streak}
+        self.cached = dict(self.user)
+
+    async def get_user_data(self, guild_id, user_id):
+        return self.cached
+
+    async def update_user(self, guild_id, user_id, update, extra_filter=None, upsert=False):
+        await asyncio.sleep(0)  # souběžné volání se může vmísit
+        if any(self.user.get(field) != value for field, value in extra_filter.items()):
+            self.cached = dict(self.user)  # invalidace a nové načtení
+            return None
+        self.user["xp"] += update["$inc"]["xp"]
+        self.user.update(update["$set"])
+        self.cached = dict(self.user)
+        return dict(self.user)
+
+
+@pytest.fixture
+def users(bot_module, monkeypatch):
+    def install(**profile):
+        fake = FakeUsers(**profile)
+        monkeypatch.setattr(bot_module, "get_user_data", fake.get_user_data)
+        monkeypatch.setattr(bot_module, "update_user", fake.update_user)
+        monkeypatch.setattr(bot_module, "xp_ledger_buffer", [])
+        return fake
+    return install
+
+
+def test_concurrent_claims_award_daily_once(bot_module, users):
+    fake = users()
+
+    async def both():
+        return await asyncio.gather(
+            bot_module.claim_daily(1, 7, "Eva"),
+            bot_module.claim_daily(1, 7, "Eva"),
+        )
+
+    results = asyncio.run(both())
+
+    rewards = [reward for reward, _ in results if reward]
+    assert len(rewards) == 1
+    assert fake.user["xp"] == bot_module.XP_REWARDS["daily"]
+    assert len(bot_module.xp_ledger_buffer) == 1
+    (_, remaining), = [result for result in results if result[0] is None]
+    assert remaining > bot_module.DAILY_COOLDOWN_SECONDS - 60
+
+
+def test_streak_continues_within_48_hours(bot_module, users):
+    fake = users(last_daily=datetime.now(timezone.utc) - timedelta(hours=30), streak=3)
+
+    reward, _ = asyncio.run(bot_module.claim_daily(1, 7, "Eva"))
+
+    assert reward["streak"] == 4
+    assert reward["total_xp"] == bot_module.XP_REWARDS["daily"] + 3 * bot_module.XP_REWARDS["streak_bonus"]
+    assert fake.user["streak"] == 4
+
+
+def test_claim_within_cooldown_is_refused(bot_module, users):
+    fake = users(last_daily=datetime.now(timezone.utc) - timedelta(hours=1), streak=2)
+
+    reward, remaining = asyncio.run(bot_module.claim_daily(1, 7, "Eva"))
+
+    assert reward is None and remaining > 22 * 3600
+    assert fake.user["xp"] == 0
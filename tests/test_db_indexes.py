@@ -0,0 +1,119 @@
+import asyncio
+
+from db_indexes import REQUIRED_INDEXES, ensure_indexes
+
+
+class IndexedCollection:
+    def __init__(self, existing):
+        self.existing = existing
+        self.created = []
+        self.dropped = []
+
+    async def index_information(self):
+        return self.existing
+
+    async def create_index(self, keys, **options):
+        self.created.append(options["name"])
+
+    async def drop_index(self, name):
+        self.dropped.append(name)
+
+
+class FakeDb:
+    client = None  # currentOp se přeskočí
+
+    def __init__(self, existing):
+        self.collections = {}
+        self.existing = existing
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = IndexedCollection(self.existing.get(name, {}))
+        return self.collections[name]
+
+
+def test_game_sessions_expire_by_heartbeat_not_start():
+    ttl = [(keys, options) for keys, options in REQUIRED_INDEXES["game_sessions"] if "expireAfterSeconds" in options]
+    assert [keys for keys, _ in ttl] == [[("last_seen", 1)]]
+
+
+def test_obsolete_start_ttl_is_dropped_and_heartbeat_ttl_created():
+    db = FakeDb({"game_sessions": {
+        "_id_": {"key": [("_id", 1)]},
+        "user_id": {"key": [("user_id", 1)], "unique": True},
+        "start_ttl": {"key": [("start", 1)], "expireAfterSeconds": 86400},
+    }})
+
+    result = asyncio.run(ensure_indexes(db))
+
+    sessions = db.collections["game_sessions"]
+    assert sessions.dropped == ["start_ttl"]
+    assert sessions.created == ["last_seen_ttl"]
+    assert "game_sessions.last_seen_ttl" in result["created"]
+
+
+def test_existing_indexes_are_skipped_and_missing_created():
+    existing = {
+        name: {options["name"]: {"key": keys, **options} for keys, options in indexes}
+        for name, indexes in REQUIRED_INDEXES.items()
+    }
+    existing["xp_ledger"] = {"_id_": {"key": [("_id", 1)]}}
+    db = FakeDb(existing)
+
+    result = asyncio.run(ensure_indexes(db))
+
+    assert result == {"created": ["xp_ledger.user_ts_id", "xp_ledger.ts"], "failed": []}
+
+
+def test_failed_unique_index_is_reported():
+    from pymongo.errors import OperationFailure
+
+    class DuplicateData(IndexedCollection):
+        async def create_index(self, keys, **options):
+            raise OperationFailure("E11000 duplicate key")
+
+    db = FakeDb({})
+    db.collections["bot_guilds"] = DuplicateData({})
+
+    result = asyncio.run(ensure_indexes(db))
+
+    assert result["failed"] == ["bot_guilds.id"]
+
+
+def test_non_unique_index_with_same_keys_is_rebuilt():
+    db = FakeDb({"poll_votes": {
+        "_id_": {"key": [("_id", 1)]},
+        "poll_id_1_user_id_1": {"key": [("poll_id", 1), ("user_id", 1)]},
+    }})
+
+    result = asyncio.run(ensure_indexes(db))
+
+    votes = db.collections["poll_votes"]
+    assert votes.dropped == ["poll_id_1_user_id_1"]
+    assert votes.created == ["poll_user"]
+    assert "poll_votes.poll_user" in result["created"]
+
+
+def test_ttl_with_different_expiry_is_rebuilt():
+    db = FakeDb({"game_sessions": {
+        "user_id": {"key": [("user_id", 1)], "unique": True},
+        "last_seen_ttl": {"key": [("last_seen", 1)], "expireAfterSeconds": 60},
+    }})
+
+    asyncio.run(ensure_indexes(db))
+
+    sessions = db.collections["game_sessions"]
+    assert sessions.dropped == ["last_seen_ttl"]
+    assert sessions.created == ["last_seen_ttl"]
+
+
+def test_matching_options_are_left_alone():
+    db = FakeDb({"game_sessions": {
+        "user_id": {"key": [("user_id", 1)], "unique": True},
+        "last_seen_ttl": {"key": [("last_seen", 1)], "expireAfterSeconds": 24 * 3600},
+    }})
+
+    asyncio.run(ensure_indexes(db))
+
+    sessions = db.collections["game_sessions"]
+    assert not sessions.dropped and not sessions.created
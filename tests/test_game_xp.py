@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+
+def evaluate(expr, doc):
+    """Vyhodnoť agregační výraz (jen operátory použité v add_game_xp)"""
+    if isinstance(expr, str) and expr == "$$ROOT":
+        return doc
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = doc
+        for part in expr[1:].split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+    if isinstance(expr, dict) and len(expr) == 1:
+        (op, args), = expr.items()
+        if op == "$literal":
+            return args
+        values = [evaluate(arg, doc) for arg in args] if isinstance(args, list) else None
+        if op == "$add":
+            return sum(values)
+        if op == "$subtract":
+            return values[0] - values[1]
+        if op == "$min":
+            return min(values)
+        if op == "$max":
+            return max(values)
+        if op == "$eq":
+            return values[0] == values[1]
+        if op == "$cond":
+            return values[1] if values[0] else values[2]
+        if op == "$ifNull":
+            return values[0] if values[0] is not None else values[1]
+        if op == "$mergeObjects":
+            merged = {}
+            for value in values:
+                merged.update(value or {})
+            return merged
+    if isinstance(expr, dict):
+        return {key: evaluate(value, doc) for key, value in expr.items()}
+    return expr
+
+
+def run_pipeline(doc, pipeline):
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$replaceRoot":
+            doc = evaluate(spec["newRoot"], doc)
+        elif op == "$set":
+            updated = dict(doc)
+            for field, expr in spec.items():
+                value = evaluate(expr, doc)
+                target = updated
+                *parents, leaf = field.split(".")
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[leaf] = value
+            doc = updated
+        elif op == "$unset":
+            doc = {key: value for key, value in doc.items() if key != spec}
+    return doc
+
+
+@pytest.fixture
+def game_xp(bot_module, monkeypatch):
+    store = {}
+
+    async def update_user(guild_id, user_id, update, extra_filter=None, upsert=False):
+        store[user_id] = run_pipeline(store.get(user_id, {"guild_id": guild_id, "user_id": user_id}), update)
+        return store[user_id]
+
+    async def no_quests(*args):
+        return 0
+
+    async def no_level_up(*args):
+        return False
+
+    monkeypatch.setattr(bot_module, "update_user", update_user)
+    monkeypatch.setattr(bot_module, "check_and_complete_quests", no_quests)
+    monkeypatch.setattr(bot_module, "announce_level_up", no_level_up)
+    monkeypatch.setattr(bot_module, "xp_ledger_buffer", [])
+    return bot_module, store
+
+
+def test_game_xp_is_capped_at_daily_limit(game_xp):
+    bot, store = game_xp
+    limit = bot.GAME_XP_DAILY_LIMIT
+    minutes_to_limit = limit // bot.GAME_XP_PER_10_MIN * 10
+
+    first = asyncio.run(bot.add_game_xp(1, 7, "Eva", minutes_to_limit - 10, "Tetris"))
+    second = asyncio.run(bot.add_game_xp(1, 7, "Eva", 60, "Tetris"))
+    third = asyncio.run(bot.add_game_xp(1, 7, "Eva", 60, "Tetris"))
+
+    assert first + second == limit and third == 0
+    assert store[7]["daily_game_xp"] == limit
+    assert store[7]["xp"] == limit
+    assert store[7]["game_times"]["Tetris"] == minutes_to_limit + 110
+    assert [entry["amount"] for entry in bot.xp_ledger_buffer] == [first, second]
+
+
+def test_new_day_resets_counter(game_xp):
+    bot, store = game_xp
+    store[7] = {**bot.default_user_data(1, 7), "xp": 500, "daily_game_xp": bot.GAME_XP_DAILY_LIMIT, "game_xp_day": "2000-01-01"}
+
+    earned = asyncio.run(bot.add_game_xp(1, 7, "Eva", 20))
+
+    assert earned == 2 * bot.GAME_XP_PER_10_MIN
+    assert store[7]["game_xp_day"] == datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    assert store[7]["daily_game_xp"] == earned
+    assert bot.daily_game_xp_of(store[7]) == earned
+
+
+def test_counter_from_another_day_reads_as_zero(bot_module):
+    assert bot_module.daily_game_xp_of({"daily_game_xp": 80, "game_xp_day": "2000-01-01"}) == 0
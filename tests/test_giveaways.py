@@ -0,0 +1,154 @@
+import asyncio
+import random
+from unittest import mock
+
+import discord
+import pytest
+
+
+class Entries:
+    """giveaway_entries s $match/$sample - vzorek smí obsahovat duplicity jako u velké kolekce"""
+
+    def __init__(self, user_ids, duplicates=False):
+        self.user_ids = user_ids
+        self.duplicates = duplicates
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        match = pipeline[0]["$match"]
+        excluded = set(match.get("user_id", {}).get("$nin", []))
+        pool = [user_id for user_id in self.user_ids if user_id not in excluded]
+        size = pipeline[1]["$sample"]["size"]
+        if self.duplicates and pool:
+            sample = [pool[0]] * size  # nejhorší případ: pořád stejný dokument
+        else:
+            sample = random.sample(pool, min(size, len(pool)))
+        docs = [{"user_id": user_id} for user_id in sample]
+
+        class Cursor:
+            async def to_list(self, length):
+                return docs
+        return Cursor()
+
+
+@pytest.fixture
+def entries(bot_module, monkeypatch):
+    def install(collection):
+        monkeypatch.setattr(bot_module, "giveaway_entries_collection", collection)
+        return collection
+    return install
+
+
+def test_draws_distinct_winners_in_db(bot_module, entries):
+    collection = entries(Entries(list(range(100))))
+
+    winners = asyncio.run(bot_module.draw_giveaway_winners("g", 3))
+
+    assert len(set(winners)) == 3
+    assert "$sample" in collection.pipelines[0][1]
+
+
+def test_reroll_excludes_previous_winners(bot_module, entries):
+    entries(Entries([1, 2, 3, 4]))
+
+    winners = asyncio.run(bot_module.draw_giveaway_winners("g", 2, exclude=[1, 2]))
+
+    assert sorted(winners) == [3, 4]
+
+
+def test_duplicate_samples_are_topped_up(bot_module, entries):
+    collection = entries(Entries([1, 2, 3], duplicates=True))
+
+    winners = asyncio.run(bot_module.draw_giveaway_winners("g", 3))
+
+    assert winners == [1, 2, 3]
+    assert collection.pipelines[1][0]["$match"]["user_id"] == {"$nin": [1]}
+
+
+def test_fewer_entries_than_winners(bot_module, entries):
+    entries(Entries([5]))
+
+    assert asyncio.run(bot_module.draw_giveaway_winners("g", 3)) == [5]
+
+
+class Channel:
+    def __init__(self, message=None):
+        self.message = message
+        self.sent = []
+
+    async def fetch_message(self, message_id):
+        if self.message is None:
+            raise discord.NotFound(mock.Mock(status=404, reason="Not Found"), "Unknown Message")
+        return self.message
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+class View:
+    stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def ending(bot_module, entries, fake_collection, monkeypatch):
+    giveaways = fake_collection("giveaways", [{"giveaway_id": "g", "participants_count": 2, "ended": False}])
+    edits = []
+
+    async def edit_now(message, **kwargs):
+        edits.append(kwargs)
+
+    entries(Entries([1, 2]))
+    monkeypatch.setattr(bot_module, "giveaways_collection", giveaways)
+    monkeypatch.setattr(bot_module.message_edits, "edit_now", edit_now)
+    monkeypatch.setattr(bot_module, "active_giveaways", {})
+
+    def start(channel):
+        view = View()
+        bot_module.active_giveaways["g"] = {
+            "giveaway_id": "g", "channel_id": 10, "message_id": 20,
+            "prize": "Klíč", "winners_count": 1, "view": view,
+        }
+        monkeypatch.setattr(bot_module.bot, "get_channel", lambda channel_id: channel)
+        return view
+    return bot_module, giveaways, edits, start
+
+
+def test_result_is_stored_even_without_channel(ending):
+    bot, giveaways, edits, start = ending
+    view = start(None)
+
+    asyncio.run(bot.end_giveaway("g"))
+
+    stored = giveaways.documents[0]
+    assert stored["ended"] is True and len(stored["winners"]) == 1
+    assert "g" not in bot.active_giveaways and view.stopped
+    assert not edits
+
+
+def test_deleted_message_still_announces_stored_winner(ending):
+    bot, giveaways, edits, start = ending
+    channel = Channel()
+    start(channel)
+
+    asyncio.run(bot.end_giveaway("g"))
+
+    winner, = giveaways.documents[0]["winners"]
+    assert channel.sent and f"<@{winner}>" in channel.sent[0]
+    assert not edits
+
+
+def test_already_ended_giveaway_is_not_redrawn(ending):
+    bot, giveaways, edits, start = ending
+    giveaways.documents[0].update({"ended": True, "winners": [1]})
+    channel = Channel(message=object())
+    start(channel)
+
+    asyncio.run(bot.end_giveaway("g"))
+
+    assert giveaways.documents[0]["winners"] == [1]
+    assert not channel.sent and not edits
+    assert "g" not in bot.active_giveaways
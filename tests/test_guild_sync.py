@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+def guild(guild_id, name, members=10):
+    return SimpleNamespace(id=guild_id, name=name, icon=None, member_count=members)
+
+
+@pytest.fixture
+def sync(bot_module, fake_collection, monkeypatch):
+    collection = fake_collection("bot_guilds", [
+        {"id": "1", "name": "Valhalla", "icon": None, "memberCount": 10},
+        {"id": "2", "name": "Starý", "icon": None, "memberCount": 5},
+    ])
+    fake_bot = SimpleNamespace(guilds=[guild(1, "Valhalla"), guild(3, "Nový")])
+
+    async def save_bot_stats():
+        pass
+
+    monkeypatch.setattr(bot_module, "bot_guilds_collection", collection)
+    monkeypatch.setattr(bot_module, "bot", fake_bot)
+    monkeypatch.setattr(bot_module, "synced_guilds", None)
+    monkeypatch.setattr(bot_module, "save_bot_stats", save_bot_stats)
+    return bot_module, collection, fake_bot
+
+
+def test_only_changed_guilds_are_written(sync):
+    bot, collection, _ = sync
+
+    asyncio.run(bot.sync_guilds())
+
+    (_, operations, ordered), = collection.calls
+    upserted = [op._filter["id"] for op in operations if hasattr(op, "_doc")]
+    assert upserted == ["3"]
+    assert operations[-1]._filter == {"id": {"$in": ["2"]}}
+    assert ordered is False
+
+
+def test_reconnect_without_changes_writes_nothing(sync):
+    bot, collection, _ = sync
+
+    asyncio.run(bot.sync_guilds())
+    asyncio.run(bot.sync_guilds())
+
+    assert len(collection.calls) == 1
+
+
+def test_guild_update_writes_only_real_changes(sync):
+    bot, collection, fake_bot = sync
+    asyncio.run(bot.sync_guilds())
+
+    asyncio.run(bot.save_guild(guild(1, "Valhalla")))
+    asyncio.run(bot.save_guild(guild(1, "Valhalla", members=11)))
+
+    assert [call[0] for call in collection.calls] == ["bulk_write", "update_one"]
+    assert bot.synced_guilds["1"]["memberCount"] == 11
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from leaderboard import GuildLeaderboard
+
+
+def test_top_is_sorted_by_xp_then_user_id():
+    leaderboard = GuildLeaderboard()
+    leaderboard.update(1, 100, "Eva")
+    leaderboard.update(2, 300, "Adam")
+    leaderboard.update(3, 100)
+
+    assert [row["user_id"] for row in leaderboard.top(3)] == [2, 1, 3]
+    assert leaderboard.top(1) == [{"user_id": 2, "xp": 300, "name": "Adam"}]
+    assert leaderboard.top(3)[2]["name"] == "Hráč 3"
+
+
+def test_update_moves_player_and_rank_follows():
+    leaderboard = GuildLeaderboard()
+    for user_id, xp in ((1, 10), (2, 20), (3, 30)):
+        leaderboard.update(user_id, xp)
+
+    leaderboard.update(1, 50)
+
+    assert leaderboard.rank(1) == 1
+    assert leaderboard.rank(3) == 2
+    assert len(leaderboard) == 3
+
+
+def test_remove_drops_player():
+    leaderboard = GuildLeaderboard()
+    leaderboard.update(1, 10, "Eva")
+    leaderboard.update(2, 20)
+
+    leaderboard.remove(1)
+    leaderboard.remove(99)
+
+    assert leaderboard.rank(1) is None
+    assert [row["user_id"] for row in leaderboard.top()] == [2]
+
+
+class SlowUsers:
+    """Kurzor přes game_users, během kterého proběhne zápis profilu"""
+
+    def __init__(self, bot, documents):
+        self.bot = bot
+        self.documents = documents
+        self.seen_loaded = []
+
+    def find(self, query, projection):
+        return self._scan()
+
+    async def _scan(self):
+        for document in self.documents:
+            self.seen_loaded.append(self.bot.leaderboards_loaded)
+            yield document
+            # Souběžný zápis: hráč 1 mezitím získal XP
+            self.bot.update_leaderboard({"guild_id": 1, "user_id": 1, "xp": 500, "name": "Eva"})
+
+
+@pytest.fixture
+def boards(bot_module, monkeypatch):
+    old = {1: GuildLeaderboard()}
+    old[1].update(9, 999)
+    monkeypatch.setattr(bot_module, "leaderboards", old)
+    monkeypatch.setattr(bot_module, "leaderboards_loaded", False)
+    return bot_module
+
+
+def test_load_swaps_in_new_boards_and_replays_writes_during_scan(boards, monkeypatch):
+    users = SlowUsers(boards, [
+        {"guild_id": 1, "user_id": 1, "xp": 10, "name": "Eva"},
+        {"guild_id": 1, "user_id": 2, "xp": 20, "name": "Adam"},
+    ])
+    monkeypatch.setattr(boards, "users_collection", users)
+
+    asyncio.run(boards.load_leaderboards())
+
+    assert users.seen_loaded == [False, False]
+    assert boards.leaderboards_loaded
+    assert boards.leaderboard_updates_during_load is None
+    assert boards.leaderboards[1].top(3) == [
+        {"user_id": 1, "xp": 500, "name": "Eva"},
+        {"user_id": 2, "xp": 20, "name": "Adam"},
+    ]
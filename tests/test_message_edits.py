@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from message_edits import MessageEditScheduler
+
+
+class Message:
+    def __init__(self, message_id, channel_id=1):
+        self.id = message_id
+        self.channel = SimpleNamespace(id=channel_id)
+        self.edits = []
+
+    async def edit(self, **fields):
+        self.edits.append(fields)
+
+
+def run(scenario):
+    """Spusť scénář a nech worker plánovače doběhnout"""
+    async def main():
+        scheduler = MessageEditScheduler()
+        await scenario(scheduler)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        if scheduler._task is not None:
+            scheduler._task.cancel()
+        return scheduler
+    return asyncio.run(main())
+
+
+def test_pending_edits_coalesce_to_latest_state():
+    message = Message(1)
+
+    async def scenario(scheduler):
+        for n in range(5):
+            scheduler.schedule(message, content=f"stav {n}")
+
+    scheduler = run(scenario)
+
+    assert message.edits == [{"content": "stav 4"}]
+    assert scheduler.metrics["coalesced"] == 4
+
+
+def test_unchanged_content_is_not_sent_again():
+    message = Message(1)
+
+    async def scenario(scheduler):
+        scheduler.schedule(message, embed=discord.Embed(title="Anketa"))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        scheduler.schedule(message, embed=discord.Embed(title="Anketa"))
+
+    scheduler = run(scenario)
+
+    assert len(message.edits) == 1
+    assert scheduler.metrics["skipped"] == 1
+
+
+def test_sent_fingerprints_are_bounded():
+    messages = [Message(n) for n in range(10)]
+
+    async def scenario(scheduler):
+        scheduler.max_tracked = 3
+        scheduler.rate = 100
+        for message in messages:
+            scheduler.schedule(message, content="x")
+
+    scheduler = run(scenario)
+
+    assert all(message.edits for message in messages)
+    assert list(scheduler._sent) == [7, 8, 9]
+
+
+def test_edit_now_forgets_pending_state():
+    message = Message(1)
+
+    async def scenario(scheduler):
+        scheduler.schedule(message, content="tik")
+        await scheduler.edit_now(message, content="konec")
+
+    scheduler = run(scenario)
+
+    assert message.edits == [{"content": "konec"}]
+    assert 1 not in scheduler._sent
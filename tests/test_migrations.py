@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+
+@pytest.fixture
+def migration(bot_module, fake_collection, monkeypatch):
+    source = fake_collection("server_stats", [{
+        "_id": "s1",
+        "guild_id": 1,
+        "daily_user_messages": {"2024-01-01": {"5": 3}},
+        "daily_user_voice": {"2024-01-01": {"5": 10}, "2024-01-02": {"6": 4}},
+        "user_names": {"5": "Eva"},
+    }])
+    target = fake_collection("daily_user_stats")
+    markers = fake_collection("bot_migrations")
+    monkeypatch.setattr(bot_module, "server_stats_collection", source)
+    monkeypatch.setattr(bot_module, "daily_stats_collection", target)
+    monkeypatch.setattr(bot_module, "migrations_collection", markers)
+    return bot_module, source, target, markers
+
+
+def test_one_guarded_upsert_per_target_document(migration):
+    bot, source, target, markers = migration
+    asyncio.run(bot.migrate_daily_user_stats())
+
+    (_, operations, _), = target.calls
+    by_key = {(op._filter["day"], op._filter["user_id"]): op for op in operations}
+    assert set(by_key) == {("2024-01-01", 5), ("2024-01-02", 6)}
+    first = by_key[("2024-01-01", 5)]
+    assert first._filter["legacy_migrated"] == {"$ne": True}
+    assert first._doc["$inc"] == {"messages": 3, "voice_minutes": 10}
+    assert first._doc["$setOnInsert"] == {"user_name": "Eva"}
+    assert source.calls[0][2]["$unset"].keys() >= {"daily_user_messages", "daily_user_voice"}
+    assert markers.calls[0][1] == {"_id": "daily_user_stats"}
+
+
+def test_rerun_after_crash_skips_already_migrated_documents(migration):
+    bot, source, target, markers = migration
+    # Předchozí běh zapsal cílové dokumenty, ale spadl před $unset
+    target.fail = BulkWriteError({"writeErrors": [{"code": 11000, "index": 0, "errmsg": "duplicate key"}]})
+
+    asyncio.run(bot.migrate_daily_user_stats())
+
+    assert source.calls and source.calls[0][0] == "update_one"
+    assert markers.calls
+
+
+def test_other_write_errors_abort_migration(migration):
+    bot, source, target, markers = migration
+    target.fail = BulkWriteError({"writeErrors": [{"code": 121, "index": 0, "errmsg": "validation"}]})
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(bot.migrate_daily_user_stats())
+    assert not source.calls and not markers.calls
+
+
+def test_finished_migration_does_not_run_again(migration):
+    bot, source, target, markers = migration
+    markers.documents.append({"_id": "daily_user_stats"})
+
+    asyncio.run(bot.migrate_daily_user_stats())
+
+    assert not target.calls and not source.calls
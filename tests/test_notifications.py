@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from notifications import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, NotificationDispatcher, RateWindow
+
+
+class Channel:
+    def __init__(self, channel_id=1, fail=None):
+        self.id = channel_id
+        self.sent = []
+        self.fail = fail
+
+    async def send(self, content=None, embeds=None):
+        if self.fail is not None:
+            error, self.fail = self.fail, None
+            raise error
+        self.sent.append((content, [embed.title for embed in embeds]))
+
+
+def embed(title):
+    return discord.Embed(title=title)
+
+
+def test_burst_is_sent_as_one_message_ordered_by_priority():
+    channel = Channel()
+
+    async def main():
+        dispatcher = NotificationDispatcher(lambda channel_id: None, coalesce_delay=0.01)
+        dispatcher.notify(channel, embed("xp"), PRIORITY_LOW)
+        dispatcher.notify(channel, embed("level"), PRIORITY_NORMAL)
+        dispatcher.notify(channel, embed("úkol"), PRIORITY_HIGH, ping="<@&1>")
+        dispatcher.notify(channel, embed("hra"), PRIORITY_HIGH, ping="<@&1>")
+        await dispatcher.flush()
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert channel.sent == [("<@&1>", ["úkol", "hra", "level", "xp"])]
+    assert dispatcher.metrics["sent_messages"] == 1
+    assert dispatcher.metrics["sent_embeds"] == 4
+
+
+def test_large_burst_is_split_by_embed_limit():
+    channel = Channel()
+
+    async def main():
+        dispatcher = NotificationDispatcher(lambda channel_id: None, coalesce_delay=0.01)
+        for n in range(23):
+            dispatcher.notify(channel, embed(str(n)))
+        await dispatcher.flush()
+
+    asyncio.run(main())
+
+    assert [len(titles) for _, titles in channel.sent] == [10, 10, 3]
+
+
+def test_channel_id_resolved_and_unknown_channel_dropped():
+    channel = Channel(channel_id=5)
+
+    async def main():
+        dispatcher = NotificationDispatcher({5: channel}.get, coalesce_delay=0.01)
+        dispatcher.notify(5, embed("ok"))
+        dispatcher.notify(6, embed("nikam"))
+        await dispatcher.flush()
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert channel.sent == [(None, ["ok"])]
+    assert dispatcher.metrics["dropped"] == 1
+
+
+def test_rate_limited_batch_is_retried():
+    response = SimpleNamespace(status=429, reason="Too Many Requests")
+    channel = Channel(fail=discord.HTTPException(response, "rate limited"))
+
+    async def main():
+        dispatcher = NotificationDispatcher(lambda channel_id: None, coalesce_delay=0.01, per=0.01)
+        dispatcher.notify(channel, embed("level"))
+        await dispatcher.flush()
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert channel.sent == [(None, ["level"])]
+    assert dispatcher.metrics["rate_limited"] == 1
+
+
+def test_rate_window_limits_requests():
+    window = RateWindow(2, 60)
+    assert window.delay() == 0
+    window.record()
+    window.record()
+    assert window.delay() > 59
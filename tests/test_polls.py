@@ -0,0 +1,58 @@
+import pytest
+
+
+@pytest.fixture
+def poll(bot_module, monkeypatch):
+    scheduled = []
+
+    class Timers:
+        def schedule(self, kind, due, payload, timer_id=None, persist=True):
+            scheduled.append((kind, timer_id, persist))
+
+    monkeypatch.setattr(bot_module, "timers", Timers())
+    monkeypatch.setattr(bot_module, "active_polls", {"p": bot_module.new_poll_state(["Pizza", "Burger"])})
+    return bot_module, bot_module.active_polls["p"], scheduled
+
+
+def test_votes_update_counts_and_voters_incrementally(poll):
+    bot, data, _ = poll
+    bot.record_poll_vote(data, 1, "Eva", 0)
+    bot.record_poll_vote(data, 2, "Adam", 0)
+    bot.record_poll_vote(data, 1, "Eva", 1)  # změna hlasu
+
+    assert data["counts"] == [1, 1]
+    assert data["votes"] == {1: 1, 2: 0}
+    assert data["voters"] == [{2: "Adam"}, {1: "Eva"}]
+
+
+def test_voter_preview_is_bounded_and_keeps_vote_order(poll):
+    bot, data, _ = poll
+    for user_id in range(12):
+        bot.record_poll_vote(data, user_id, f"Hráč {user_id}", 0)
+
+    names, others = bot.voter_preview(data, 0, 5)
+
+    assert names == [f"Hráč {n}" for n in range(5)]
+    assert others == 7
+    assert bot.voter_preview(data, 1, 5) == ([], 0)
+
+
+def test_results_text_uses_counts(poll):
+    bot, data, _ = poll
+    for user_id, option in ((1, 0), (2, 0), (3, 0), (4, 1)):
+        bot.record_poll_vote(data, user_id, f"Hráč {user_id}", option)
+
+    text = bot.get_poll_results("p", data["options"], None)
+
+    assert "75.0% (3)" in text and "25.0% (1)" in text
+    assert "Hráč 1, Hráč 2, Hráč 3" in text
+
+
+def test_burst_of_votes_schedules_one_refresh(poll):
+    bot, data, scheduled = poll
+    for user_id in range(10):
+        bot.record_poll_vote(data, user_id, "x", 0)
+        bot.mark_poll_dirty("p")
+
+    assert scheduled == [("poll_refresh", "p:refresh", False)]
+    assert data["dirty"]
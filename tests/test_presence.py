@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def presence(bot_module, fake_collection, monkeypatch):
+    sessions = fake_collection("game_sessions")
+    finished = []
+
+    async def finish_game_session(user_id, session, ended_at):
+        finished.append((user_id, session["game"], ended_at))
+
+    async def unlock_game(*args):
+        pass
+
+    monkeypatch.setattr(bot_module, "game_sessions_collection", sessions)
+    monkeypatch.setattr(bot_module, "finish_game_session", finish_game_session)
+    monkeypatch.setattr(bot_module, "unlock_game", unlock_game)
+    monkeypatch.setattr(bot_module, "presence_pending", {})
+    monkeypatch.setattr(bot_module, "active_gaming_sessions", {})
+    monkeypatch.setattr(bot_module, "presence_metrics", dict.fromkeys(bot_module.presence_metrics, 0))
+    return bot_module, sessions, finished
+
+
+T0 = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def test_flapping_activity_is_debounced(presence):
+    bot, sessions, _ = presence
+    bot.queue_presence_change(7, 1, "Eva", "Tetris", at(0))
+    bot.queue_presence_change(7, 1, "Eva", None, at(2))  # vrátila se zpět dřív, než změna vydržela
+
+    asyncio.run(bot.commit_presence_changes(at(60)))
+
+    assert not sessions.calls
+    assert bot.presence_metrics["debounced"] == 1
+
+
+def test_duplicate_events_from_other_guilds_are_ignored(presence):
+    bot, _, _ = presence
+    for guild_id in (1, 2, 3):
+        bot.queue_presence_change(7, guild_id, "Eva", "Tetris", at(0))
+
+    assert bot.presence_metrics["duplicates"] == 2
+    assert bot.presence_pending[7]["guild_id"] == 1
+
+
+def test_settled_changes_are_written_in_one_bulk(presence):
+    bot, sessions, finished = presence
+    bot.active_gaming_sessions[8] = {"game": "Doom", "start": at(-3600), "guild_id": 1, "user_name": "Adam"}
+    bot.queue_presence_change(7, 1, "Eva", "Tetris", at(0))
+    bot.queue_presence_change(8, 1, "Adam", None, at(1))
+
+    asyncio.run(bot.commit_presence_changes(at(bot.PRESENCE_DEBOUNCE_SECONDS + 1)))
+
+    (_, operations, _), = sessions.calls
+    assert len(operations) == 2
+    started = operations[0]._doc["$set"]
+    assert started["game"] == "Tetris" and started["start"] == at(0) and "last_seen" in started
+    assert finished == [(8, "Doom", at(1))]
+    now = at(bot.PRESENCE_DEBOUNCE_SECONDS + 1)
+    assert bot.active_gaming_sessions == {7: {"game": "Tetris", "start": at(0), "guild_id": 1, "user_name": "Eva", "last_seen": now}}
+
+
+def test_changes_wait_for_debounce_period(presence):
+    bot, sessions, _ = presence
+    bot.queue_presence_change(7, 1, "Eva", "Tetris", at(0))
+
+    asyncio.run(bot.commit_presence_changes(at(bot.PRESENCE_DEBOUNCE_SECONDS - 1)))
+
+    assert not sessions.calls
+    assert 7 in bot.presence_pending
@@ -0,0 +1,52 @@
+import asyncio
+
+
+class FakeUsers:
+    """Profil hráče s podmíněným update_user jako v MongoDB"""
+
+    def __init__(self):
+        self.user = {"guild_id": 1, "user_id": 7, "xp": 0, "completed_quests": {}}
+
+    async def get_user_data(self, guild_id, user_id):
+        return {**self.user, "completed_quests": {}}  # zastaralá kopie z cache
+
+    async def update_user(self, guild_id, user_id, update, extra_filter=None, upsert=False):
+        await asyncio.sleep(0)  # souběžné volání se může vmísit
+        ((field, condition),) = extra_filter.items()
+        game = field.split(".", 1)[1]
+        done = self.user["completed_quests"].setdefault(game, [])
+        if condition["$ne"] in done:
+            return None
+        done.append(condition["$ne"])
+        self.user["xp"] += update["$inc"]["xp"]
+        return dict(self.user)
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    def notify(self, channel, embed, priority=None, ping=None):
+        self.sent.append(embed)
+
+
+def test_concurrent_presence_updates_award_quest_once(bot_module, monkeypatch):
+    users = FakeUsers()
+    recorder = Recorder()
+    monkeypatch.setattr(bot_module, "get_user_data", users.get_user_data)
+    monkeypatch.setattr(bot_module, "update_user", users.update_user)
+    monkeypatch.setattr(bot_module, "notifications", recorder)
+    monkeypatch.setattr(bot_module, "xp_ledger_buffer", [])
+
+    async def both():
+        return await asyncio.gather(
+            bot_module.check_and_complete_quests(1, 7, "Eva", "Tetris", 61, channel=1),
+            bot_module.check_and_complete_quests(1, 7, "Eva", "Tetris", 61, channel=1),
+        )
+
+    awarded = asyncio.run(both())
+
+    assert sorted(awarded) == [0, 50]
+    assert users.user["xp"] == 50
+    assert [embed.title for embed in recorder.sent].count("🎯 ÚKOL SPLNĚN!") == 1
+    assert len(bot_module.xp_ledger_buffer) == 1
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from answer_matcher import AnswerMatcher
+
+
+class Channel:
+    def __init__(self):
+        self.id = 200
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append((content, embed))
+
+
+def make_message(channel, content, user_id=7):
+    author = SimpleNamespace(
+        id=user_id, display_name="Eva", mention=f"<@{user_id}>", display_avatar=SimpleNamespace(url="https://x/a.png")
+    )
+    return SimpleNamespace(channel=channel, content=content, author=author, guild=SimpleNamespace(id=1))
+
+
+@pytest.fixture
+def quiz(bot_module, monkeypatch):
+    awarded = []
+
+    async def add_xp(guild_id, user_id, user_name, amount, channel=None, extra_inc=None, source="other"):
+        awarded.append((user_id, amount, source))
+
+    monkeypatch.setattr(bot_module, "add_xp", add_xp)
+    monkeypatch.setattr(bot_module, "answer_consumers", {})
+    return bot_module, awarded
+
+
+def start_round(quizzes, channel, question, answer):
+    quizzes[channel.id] = {
+        "active": True,
+        "current_question": question,
+        "answered": False,
+        "scores": {},
+        "guild_id": 1,
+        "matcher": AnswerMatcher([answer]),
+        "round_event": asyncio.Event(),
+    }
+    return quizzes[channel.id]
+
+
+@pytest.mark.parametrize("kind, question, answer, fields", [
+    ("music", {"artist": "Kabát", "song": "Pohoda"}, "Kabát", ["🎤 Interpret", "🎵 Píseň"]),
+    ("film", {"film": "Pelíšky", "year": 1999}, "Pelíšky", ["🎬 Film", "📅 Rok"]),
+])
+def test_correct_answer_scores_once_and_ends_round(quiz, monkeypatch, kind, question, answer, fields):
+    bot, awarded = quiz
+    quizzes = {}
+    monkeypatch.setattr(bot, f"active_{kind}_quiz", quizzes)
+    channel = Channel()
+    data = start_round(quizzes, channel, question, answer)
+    handler = getattr(bot, f"handle_{kind}_answer")
+
+    async def answers():
+        await handler(make_message(channel, "něco jiného"))
+        await handler(make_message(channel, answer))
+        await handler(make_message(channel, answer, user_id=8))
+
+    asyncio.run(answers())
+
+    assert awarded == [(7, bot.XP_REWARDS["quiz_correct"], f"quiz_{kind}")]
+    assert data["scores"] == {7: {"name": "Eva", "score": 1}}
+    assert data["round_event"].is_set()
+    (_, embed), = channel.sent
+    assert [field.name for field in embed.fields][:2] == fields
+
+
+def test_finished_quiz_unregisters_consumer(quiz, monkeypatch):
+    bot, awarded = quiz
+    monkeypatch.setattr(bot, "active_film_quiz", {})
+    channel = Channel()
+    bot.register_answer_consumer(channel.id, "film", bot.handle_film_answer)
+
+    asyncio.run(bot.handle_film_answer(make_message(channel, "Pelíšky")))
+
+    assert channel.id not in bot.answer_consumers
+    assert not awarded
@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+
+def test_round_wakes_up_as_soon_as_it_is_answered(bot_module):
+    async def main():
+        quiz_data = {"round_event": asyncio.Event()}
+        asyncio.get_running_loop().call_later(0.01, bot_module.end_quiz_round, quiz_data)
+        start = time.monotonic()
+        await bot_module.wait_for_quiz_round(quiz_data, 5)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) < 1
+
+
+def test_unanswered_round_ends_after_quiz_time(bot_module):
+    async def main():
+        quiz_data = {"round_event": asyncio.Event()}
+        await bot_module.wait_for_quiz_round(quiz_data, 0.01)
+        return quiz_data["round_event"].is_set()
+
+    assert asyncio.run(main()) is False
+
+
+def test_end_round_without_event_is_noop(bot_module):
+    bot_module.end_quiz_round({})
+
+
+def test_matcher_accepts_aliases(bot_module):
+    matcher = bot_module.build_answer_matcher("Karel Gott", {"aliases": ["Zlatý slavík"]}, {"Karel Gott": ["Gott"]})
+    assert matcher.matches("gott")
+    assert matcher.matches("zlaty slavik")
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+class Member:
+    def __init__(self):
+        self.display_name = "Eva"
+        self.roles = []
+
+    async def add_roles(self, role, reason=None):
+        self.roles.append(role)
+
+    async def remove_roles(self, role, reason=None):
+        self.roles.remove(role)
+
+
+@pytest.fixture
+def roles(bot_module, fake_collection, monkeypatch):
+    member = Member()
+    role = SimpleNamespace(id=55, name="Hráč")
+    guild = SimpleNamespace(get_member=lambda user_id: member, get_role=lambda role_id: role if role_id == 55 else None)
+    monkeypatch.setattr(bot_module, "bot", SimpleNamespace(user=SimpleNamespace(id=0), get_guild=lambda guild_id: guild))
+    monkeypatch.setattr(bot_module, "reaction_role_index", {})
+    monkeypatch.setattr(bot_module, "reaction_roles_collection", fake_collection("reaction_roles", [
+        {"message_id": 100, "emoji": "🎮", "role_id": 55},
+        {"message_id": 200, "type": "multi", "roles": [
+            {"emoji": "🔫", "role_id": 55}, {"emoji": "🔫", "role_id": 66}, {"emoji": "⛏️", "role_id": 77},
+        ]},
+    ]))
+    return bot_module, member, role
+
+
+def reaction(message_id, emoji):
+    return SimpleNamespace(user_id=7, guild_id=1, message_id=message_id, emoji=emoji)
+
+
+def test_load_builds_index_and_first_duplicate_emoji_wins(roles):
+    bot, _, _ = roles
+    bot.reaction_role_index[300] = {"🎲": 88}  # vytvořeno příkazem během načítání
+
+    asyncio.run(bot.load_reaction_roles())
+
+    assert bot.reaction_role_index == {100: {"🎮": 55}, 200: {"🔫": 55, "⛏️": 77}, 300: {"🎲": 88}}
+
+
+def test_reaction_adds_and_removes_indexed_role(roles):
+    bot, member, role = roles
+    asyncio.run(bot.load_reaction_roles())
+
+    asyncio.run(bot.on_raw_reaction_add(reaction(100, "🎮")))
+    assert member.roles == [role]
+
+    asyncio.run(bot.on_raw_reaction_remove(reaction(100, "🎮")))
+    assert member.roles == []
+
+
+def test_reactions_on_other_messages_are_ignored(roles):
+    bot, member, _ = roles
+    asyncio.run(bot.load_reaction_roles())
+
+    asyncio.run(bot.on_raw_reaction_add(reaction(999, "🎮")))
+    asyncio.run(bot.on_raw_reaction_add(reaction(100, "❓")))
+
+    assert member.roles == []
@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+
+def test_period_stats_sorts_by_day_before_taking_last_name(bot_module, fake_collection, monkeypatch):
+    daily = fake_collection("daily_user_stats")
+    daily.aggregate_result = [{"top_messages": [], "top_voice": []}]
+    monkeypatch.setattr(bot_module, "daily_stats_collection", daily)
+    monkeypatch.setattr(bot_module, "server_daily_collection", fake_collection("server_daily_stats"))
+
+    asyncio.run(bot_module.get_period_stats(1, 7))
+
+    (_, pipeline), = daily.calls
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages.index("$sort") < stages.index("$group")
+    assert pipeline[stages.index("$sort")]["$sort"] == {"day": 1}
+
+
+@pytest.fixture
+def backfill(bot_module, fake_collection, monkeypatch):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    daily = fake_collection("daily_user_stats")
+    daily.aggregate_result = [
+        {"_id": {"guild_id": 1, "day": "2024-01-01"}, "messages": 5, "voice_minutes": 2},
+        {"_id": {"guild_id": 1, "day": today}, "messages": 3, "voice_minutes": 0},
+    ]
+    server_daily = fake_collection("server_daily_stats", [{"guild_id": 1, "day": today, "messages": 1}])
+    markers = fake_collection("bot_migrations")
+    monkeypatch.setattr(bot_module, "daily_stats_collection", daily)
+    monkeypatch.setattr(bot_module, "server_daily_collection", server_daily)
+    monkeypatch.setattr(bot_module, "migrations_collection", markers)
+    return bot_module, today, daily, server_daily, markers
+
+
+def test_backfill_sets_closed_days_and_only_raises_today(backfill):
+    bot, today, _, server_daily, markers = backfill
+
+    asyncio.run(bot.backfill_server_daily_stats())
+
+    (_, operations, _), = server_daily.calls
+    updates = {op._filter["day"]: op._doc for op in operations}
+    assert updates["2024-01-01"] == {"$set": {"messages": 5, "voice_minutes": 2}}
+    assert updates[today] == {"$max": {"messages": 3, "voice_minutes": 0}}
+    assert markers.calls[0][1] == {"_id": "server_daily_stats"}
+
+
+def test_interrupted_backfill_runs_again(backfill):
+    bot, _, _, server_daily, markers = backfill
+    # Předchozí běh stihl zapsat část dnů, pak spadl
+    server_daily.documents.append({"guild_id": 1, "day": "2024-01-01", "messages": 5})
+    server_daily.fail = RuntimeError("spojení přerušeno")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(bot.backfill_server_daily_stats())
+    assert not markers.calls
+
+    asyncio.run(bot.backfill_server_daily_stats())
+    assert len(server_daily.calls) == 2
+    assert markers.calls
+
+
+def test_finished_backfill_does_not_run_again(backfill):
+    bot, _, daily, server_daily, markers = backfill
+    markers.documents.append({"_id": "server_daily_stats"})
+
+    asyncio.run(bot.backfill_server_daily_stats())
+
+    assert not daily.calls and not server_daily.calls
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def startup(bot_module, monkeypatch):
+    calls = []
+
+    async def run_startup():
+        calls.append("startup")
+
+    async def sync_guilds():
+        calls.append("sync_guilds")
+
+    monkeypatch.setattr(bot_module, "startup_done", False)
+    monkeypatch.setattr(bot_module, "run_startup", run_startup)
+    monkeypatch.setattr(bot_module, "sync_guilds", sync_guilds)
+    monkeypatch.setattr(bot_module, "start_background_tasks", lambda: None)
+    monkeypatch.setattr(bot_module, "active_gaming_sessions", {})
+    monkeypatch.setattr(bot_module, "game_sessions_loaded", asyncio.Event())
+    return bot_module, calls
+
+
+def test_reconnect_does_not_repeat_startup(startup):
+    bot, calls = startup
+
+    async def reconnects():
+        for _ in range(3):
+            await bot.on_ready()
+
+    asyncio.run(reconnects())
+
+    assert calls.count("startup") == 1
+    assert calls.count("sync_guilds") == 3
+
+
+def test_failed_session_load_still_releases_presence_worker(startup, monkeypatch):
+    bot, _ = startup
+
+    class BrokenSessions:
+        def find(self, query):
+            raise RuntimeError("DB nedostupná")
+
+    monkeypatch.setattr(bot, "game_sessions_collection", BrokenSessions())
+    asyncio.run(bot.load_game_sessions())
+
+    assert bot.game_sessions_loaded.is_set()
+
+
+def test_session_load_keeps_live_sessions(startup, monkeypatch, fake_collection):
+    bot, _ = startup
+    old = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    live = {"game": "Tetris", "start": datetime.now(timezone.utc), "guild_id": 1, "user_name": "Eva"}
+    bot.active_gaming_sessions[7] = live
+    monkeypatch.setattr(bot, "game_sessions_collection", fake_collection("game_sessions", [
+        {"user_id": 7, "game": "Tetris", "start": old, "guild_id": 1, "user_name": "Eva"},
+        {"user_id": 8, "game": "Doom", "start": old, "guild_id": 1, "user_name": "Adam"},
+    ]))
+
+    asyncio.run(bot.load_game_sessions())
+
+    assert bot.active_gaming_sessions[7] is live
+    assert bot.active_gaming_sessions[8]["start"] == old
+
+
+@pytest.fixture
+def sweep(startup, monkeypatch, fake_collection):
+    bot, _ = startup
+    sessions = fake_collection("game_sessions")
+    calls = []
+    finished = []
+
+    async def update_many(query, update):
+        calls.append(("update_many", query, update))
+
+    async def delete_many(query):
+        calls.append(("delete_many", query))
+
+    async def finish_game_session(user_id, session, ended_at):
+        finished.append((user_id, session["game"], ended_at))
+
+    sessions.update_many = update_many
+    sessions.delete_many = delete_many
+    monkeypatch.setattr(bot, "game_sessions_collection", sessions)
+    monkeypatch.setattr(bot, "finish_game_session", finish_game_session)
+    monkeypatch.setattr(bot, "presence_pending", {})
+    monkeypatch.setattr(bot, "is_still_playing", lambda guild_id, user_id, game: user_id == 7)
+    return bot, calls, finished
+
+
+def test_sweep_refreshes_heartbeat_of_running_sessions(sweep):
+    bot, calls, _ = sweep
+    bot.active_gaming_sessions.update({
+        7: {"game": "Tetris", "guild_id": 1},
+        8: {"game": "Doom", "guild_id": 1},
+    })
+
+    asyncio.run(bot.sweep_game_sessions())
+
+    (_, heartbeat_query, heartbeat), (_, stale_query) = calls
+    assert heartbeat_query == {"user_id": {"$in": [7]}}
+    assert bot.active_gaming_sessions[7]["last_seen"] == heartbeat["$set"]["last_seen"]
+    assert stale_query == {"user_id": {"$in": [8]}}
+    assert list(bot.active_gaming_sessions) == [7]
+
+
+def test_sweep_credits_stale_session_up_to_last_heartbeat(sweep):
+    bot, _, finished = sweep
+    start = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    last_seen = datetime(2024, 1, 1, 13, tzinfo=timezone.utc)
+    bot.active_gaming_sessions.update({
+        8: {"game": "Doom", "start": start, "guild_id": 1, "user_name": "Adam", "last_seen": last_seen},
+        9: {"game": "Quake", "start": start, "guild_id": 1, "user_name": "Petr", "last_seen": None},
+    })
+
+    asyncio.run(bot.sweep_game_sessions())
+
+    assert finished == [(8, "Doom", last_seen)]
+    assert not bot.active_gaming_sessions
+
+
+def test_sweep_skips_users_with_pending_presence_change(sweep):
+    bot, calls, finished = sweep
+    session = {"game": "Doom", "start": datetime(2024, 1, 1, tzinfo=timezone.utc), "guild_id": 1, "user_name": "Adam"}
+    bot.active_gaming_sessions[8] = session
+    bot.presence_pending[8] = {"game": None, "since": datetime.now(timezone.utc)}
+
+    asyncio.run(bot.sweep_game_sessions())
+
+    assert bot.active_gaming_sessions[8] is session
+    assert not calls and not finished
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def stats(bot_module, fake_collection):
+    bot_module.stats_buffer.clear()
+    for key in bot_module.stats_buffer_metrics:
+        bot_module.stats_buffer_metrics[key] = 0
+    yield bot_module, fake_collection("server_stats")
+    bot_module.stats_buffer.clear()
+
+
+def test_flush_writes_one_update_per_filter(stats):
+    bot, collection = stats
+    for _ in range(3):
+        bot.buffer_stats_update(collection, {"guild_id": 1}, {"total_messages": 1}, {"user_names.5": "Eva"})
+
+    asyncio.run(bot.flush_stats_buffer())
+
+    (_, operations, ordered), = collection.calls
+    assert len(operations) == 1 and ordered is False
+    assert operations[0]._doc == {"$inc": {"total_messages": 3}, "$set": {"user_names.5": "Eva"}}
+    assert bot.stats_buffer_metrics["flushed_ops"] == 3
+    assert not bot.stats_buffer
+
+
+def test_failed_flush_keeps_counts_and_newer_names(stats):
+    bot, collection = stats
+    bot.buffer_stats_update(collection, {"guild_id": 1}, {"total_messages": 1}, {"user_names.5": "Stará"})
+    bot.buffer_stats_update(collection, {"guild_id": 1}, {"total_messages": 1}, {"user_names.5": "Stará"})
+
+    async def failing_write(operations, ordered=True):
+        # Během zápisu přijde nová zpráva s novým jménem, pak zápis selže
+        bot.buffer_stats_update(collection, {"guild_id": 1}, {"total_messages": 1}, {"user_names.5": "Nová"})
+        raise RuntimeError("DB nedostupná")
+
+    collection.bulk_write = failing_write
+    asyncio.run(bot.flush_stats_buffer())
+
+    (entry,) = bot.stats_buffer.values()
+    assert entry["inc"] == {"total_messages": 3}
+    assert entry["set"] == {"user_names.5": "Nová"}
+    assert entry["ops"] == 3
+    assert bot.stats_buffer_metrics["buffered_ops"] == 3
+    assert bot.stats_buffer_metrics["buffered_keys"] == 2
+    assert bot.stats_buffer_metrics["errors"] == 1
@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from timers import TimerService
+
+
+class TimerStore:
+    """Kolekce timers - dokumenty podle _id"""
+
+    def __init__(self, docs=()):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def find(self, query):
+        docs = list(self.docs.values())
+
+        async def iterate():
+            for doc in docs:
+                yield doc
+        return iterate()
+
+    async def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            self.docs[op._filter["_id"]] = op._doc
+
+    async def delete_many(self, query):
+        for timer_id in query["_id"]["$in"]:
+            self.docs.pop(timer_id, None)
+
+
+def past(seconds=1):
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+def future(seconds=60):
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+async def settle(service, rounds=20):
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+def test_due_timer_fires_and_leaves_db():
+    store = TimerStore()
+
+    async def main():
+        service = TimerService(store)
+        fired = []
+
+        @service.handler("ping")
+        async def ping(payload):
+            fired.append(payload["n"])
+
+        service.schedule("ping", past(), {"n": 1}, timer_id="a")
+        service.schedule("ping", future(), {"n": 2}, timer_id="b")
+        service.start()
+        await settle(service)
+        service._task.cancel()
+        return service, fired
+
+    service, fired = asyncio.run(main())
+
+    assert fired == [1]
+    assert list(store.docs) == ["b"]
+    assert service.metrics["fired"] == 1
+
+
+def test_cancelled_timer_never_fires():
+    store = TimerStore()
+
+    async def main():
+        service = TimerService(store)
+        fired = []
+
+        @service.handler("ping")
+        async def ping(payload):
+            fired.append(payload)
+
+        service.schedule("ping", past(), {}, timer_id="a")
+        assert service.cancel("a")
+        assert not service.cancel("a")
+        service.start()
+        await settle(service)
+        service._task.cancel()
+        return fired
+
+    assert asyncio.run(main()) == []
+    assert not store.docs
+
+
+def test_non_persistent_timer_is_not_written():
+    store = TimerStore()
+
+    async def main():
+        service = TimerService(store)
+        service.schedule("delete_message", future(), {}, persist=False)
+        await service.sync()
+
+    asyncio.run(main())
+    assert not store.docs
+
+
+def test_reload_during_running_handler_does_not_fire_twice():
+    store = TimerStore([{"_id": "g1", "kind": "giveaway_end", "due": past(), "payload": {}}])
+
+    async def main():
+        service = TimerService(store)
+        release = asyncio.Event()
+        fired = []
+
+        @service.handler("giveaway_end")
+        async def end(payload):
+            fired.append(payload)
+            await release.wait()  # obsluha čeká (např. na Discord)
+
+        await service.load()
+        service.start()
+        await settle(service)
+        assert fired and "g1" in store.docs  # záznam v DB do doběhnutí obsluhy
+
+        service._loaded = False  # i kdyby se load zavolal znovu (reconnect)
+        assert await service.load() == 0
+        release.set()
+        await settle(service)
+        service._task.cancel()
+        return fired
+
+    fired = asyncio.run(main())
+
+    assert len(fired) == 1
+    assert not store.docs
+
+
+def test_load_runs_once():
+    store = TimerStore([{"_id": "p1", "kind": "poll_end", "due": future(), "payload": {}}])
+
+    async def main():
+        service = TimerService(store)
+        return await service.load(), await service.load(), service.pending("poll_end")
+
+    first, second, pending = asyncio.run(main())
+
+    assert (first, second) == (1, 0)
+    assert len(pending) == 1
+
+
+def test_handler_can_reschedule_same_persistent_id():
+    store = TimerStore()
+
+    async def main():
+        service = TimerService(store)
+        runs = []
+
+        @service.handler("repeat")
+        async def repeat(payload):
+            runs.append(payload["n"])
+            if payload["n"] == 1:
+                service.schedule("repeat", future(), {"n": 2}, timer_id="r")
+
+        service.schedule("repeat", past(), {"n": 1}, timer_id="r")
+        service.start()
+        await settle(service)
+        await service.sync()
+        service._task.cancel()
+        return runs
+
+    runs = asyncio.run(main())
+
+    assert runs == [1]
+    assert store.docs["r"]["payload"] == {"n": 2}
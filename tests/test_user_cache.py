@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+
+class FakeUsers:
+    def __init__(self, result):
+        self.result = result
+
+    async def find_one_and_update(self, filter_doc, update, upsert=False, return_document=None):
+        return self.result
+
+
+@pytest.fixture
+def cache(bot_module, monkeypatch):
+    monkeypatch.setattr(bot_module, "user_cache", bot_module.OrderedDict())
+    monkeypatch.setattr(bot_module, "leaderboards_loaded", False)
+    return bot_module
+
+
+def test_update_user_writes_through_to_cache(cache, monkeypatch):
+    user = {"guild_id": 1, "user_id": 7, "xp": 30}
+    monkeypatch.setattr(cache, "users_collection", FakeUsers(user))
+
+    asyncio.run(cache.update_user(1, 7, {"$inc": {"xp": 30}}))
+
+    assert cache.get_cached_user(1, 7) is user
+
+
+def test_unmatched_conditional_update_invalidates_stale_profile(cache, monkeypatch):
+    cache.cache_user({"guild_id": 1, "user_id": 7, "xp": 0, "completed_quests": {}})
+    monkeypatch.setattr(cache, "users_collection", FakeUsers(None))
+
+    result = asyncio.run(cache.update_user(
+        1, 7, {"$addToSet": {"completed_quests.Tetris": 0}}, extra_filter={"completed_quests.Tetris": {"$ne": 0}}
+    ))
+
+    assert result is None
+    assert cache.get_cached_user(1, 7) is None
+
+
+def test_lru_evicts_oldest_profile(cache, monkeypatch):
+    monkeypatch.setattr(cache, "USER_CACHE_MAX_SIZE", 2)
+    for user_id in (1, 2, 3):
+        cache.cache_user({"guild_id": 1, "user_id": user_id})
+
+    assert cache.get_cached_user(1, 1) is None
+    assert cache.get_cached_user(1, 3) is not None
+
+
+class CountingUsers(FakeUsers):
+    def __init__(self, result):
+        super().__init__(result)
+        self.writes = 0
+
+    async def find_one_and_update(self, filter_doc, update, upsert=False, return_document=None):
+        self.writes += 1
+        return self.result
+
+
+def test_unlock_of_cached_unlocked_game_skips_db(cache, monkeypatch):
+    cache.cache_user({"guild_id": 1, "user_id": 7, "xp": 0, "unlocked_games": ["Valheim"]})
+    users = CountingUsers(None)
+    monkeypatch.setattr(cache, "users_collection", users)
+
+    assert asyncio.run(cache.unlock_game(1, 7, "Eva", "Valheim")) is False
+    assert users.writes == 0
+    assert cache.get_cached_user(1, 7) is not None
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+
+class VoiceStore:
+    """voice_sessions kolekce s dokumenty podle user_id"""
+
+    def __init__(self):
+        self.docs = {}
+        self.log = []
+
+    def find(self, query):
+        docs = [dict(doc) for doc in self.docs.values()]
+
+        class Cursor:
+            async def to_list(self, length):
+                return docs
+        return Cursor()
+
+    async def bulk_write(self, operations, ordered=True):
+        for op in operations:
+            user_id = op._filter["user_id"]
+            if hasattr(op, "_doc"):
+                self.docs[user_id] = {**self.docs.get(user_id, {}), **op._doc["$set"]}
+            else:
+                self.docs.pop(user_id, None)
+        self.log.append("checkpoint")
+
+    async def delete_one(self, query):
+        self.docs.pop(query["user_id"], None)
+        self.log.append(("delete", query["user_id"]))
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["user_id"]] = {**self.docs.get(query["user_id"], {}), **update["$set"]}
+        self.log.append(("update", query["user_id"]))
+
+
+@pytest.fixture
+def voice(bot_module, monkeypatch):
+    store = VoiceStore()
+    credited = []
+
+    async def add_voice_time(guild_id, user_id, user_name, minutes):
+        store.log.append(("credit", user_id))
+        credited.append((user_id, minutes))
+
+    monkeypatch.setattr(bot_module, "voice_sessions_collection", store)
+    monkeypatch.setattr(bot_module, "add_voice_time", add_voice_time)
+    monkeypatch.setattr(bot_module, "voice_sessions", {})
+    monkeypatch.setattr(bot_module, "voice_sessions_ended", set())
+    monkeypatch.setattr(bot_module, "voice_sessions_saved", set())
+    monkeypatch.setattr(bot_module, "voice_checkpoint_lock", asyncio.Lock())
+    monkeypatch.setattr(bot_module, "bot", SimpleNamespace(guilds=[]))
+    return bot_module, store, credited
+
+
+def member(user_id=7):
+    return SimpleNamespace(id=user_id, bot=False, display_name="Eva", guild=SimpleNamespace(id=1))
+
+
+def state(channel_id=None):
+    return SimpleNamespace(channel=SimpleNamespace(id=channel_id, name=f"kanál {channel_id}") if channel_id else None)
+
+
+def joined_minutes_ago(bot, minutes, user_id=7, channel_id=10):
+    bot.voice_sessions[user_id] = {
+        "join_time": datetime.now(timezone.utc) - timedelta(minutes=minutes),
+        "channel_id": channel_id,
+        "guild_id": 1,
+        "user_name": "Eva",
+    }
+
+
+def test_leave_deletes_checkpoint_before_crediting(voice):
+    bot, store, credited = voice
+    joined_minutes_ago(bot, 30)
+
+    async def scenario():
+        await bot.checkpoint_voice_sessions()
+        await bot.on_voice_state_update(member(), state(10), state(None))
+
+    asyncio.run(scenario())
+
+    assert store.log == ["checkpoint", ("delete", 7), ("credit", 7)]
+    assert credited == [(7, 30)]
+    assert not store.docs
+
+
+def test_leave_without_checkpoint_skips_db(voice):
+    bot, store, credited = voice
+    joined_minutes_ago(bot, 3)
+
+    asyncio.run(bot.on_voice_state_update(member(), state(10), state(None)))
+
+    assert store.log == [("credit", 7)]
+
+
+def test_channel_switch_writes_new_join_time_immediately(voice):
+    bot, store, credited = voice
+    joined_minutes_ago(bot, 20)
+
+    async def scenario():
+        await bot.checkpoint_voice_sessions()
+        await bot.on_voice_state_update(member(), state(10), state(11))
+
+    asyncio.run(scenario())
+
+    assert store.log == ["checkpoint", ("update", 7), ("credit", 7)]
+    assert store.docs[7]["channel_id"] == 11
+    assert store.docs[7]["join_time"] == bot.voice_sessions[7]["join_time"]
+
+
+def test_restore_credits_finished_session_once(voice):
+    bot, store, credited = voice
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    store.docs[7] = {"user_id": 7, "guild_id": 1, "user_name": "Eva", "join_time": start,
+                     "checkpoint_at": start + timedelta(minutes=45), "channel_id": 10}
+
+    asyncio.run(bot.restore_voice_sessions())
+    # Pád hned po obnově - další start už session nenajde
+    asyncio.run(bot.restore_voice_sessions())
+
+    assert credited == [(7, 45)]
+    assert not store.docs
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+
+@pytest.fixture
+def ledger(bot_module, fake_collection, monkeypatch):
+    collection = fake_collection("xp_ledger")
+    monkeypatch.setattr(bot_module, "xp_ledger_collection", collection)
+    monkeypatch.setattr(bot_module, "xp_ledger_buffer", [])
+    for amount in (10, 20, 30):
+        bot_module.record_xp(1, 7, "quiz_music", amount)
+    return bot_module, collection
+
+
+def test_network_failure_rebuffers_every_entry(ledger):
+    bot, collection = ledger
+
+    async def insert_many(documents, ordered=True):
+        # pymongo doplní _id všem dokumentům ještě před odesláním
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        raise ServerSelectionTimeoutError("no servers")
+
+    collection.insert_many = insert_many
+    asyncio.run(bot.flush_xp_ledger())
+
+    assert [entry["amount"] for entry in bot.xp_ledger_buffer] == [10, 20, 30]
+    assert all("_id" in entry for entry in bot.xp_ledger_buffer)
+
+
+def test_retry_ignores_entries_written_by_earlier_attempt(ledger):
+    bot, collection = ledger
+    collection.fail = BulkWriteError({"writeErrors": [
+        {"index": 0, "code": 11000, "errmsg": "duplicate key"},
+        {"index": 2, "code": 121, "errmsg": "validation"},
+    ]})
+
+    asyncio.run(bot.flush_xp_ledger())
+
+    (_, _, ordered), = collection.calls
+    assert ordered is False
+    assert [entry["amount"] for entry in bot.xp_ledger_buffer] == [30]
+
+
+def test_successful_flush_empties_buffer(ledger):
+    bot, collection = ledger
+
+    asyncio.run(bot.flush_xp_ledger())
+
+    assert not bot.xp_ledger_buffer
+    assert len(collection.calls[0][1]) == 3
+
+
+def test_history_rejects_malformed_before(server_module):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server_module.get_player_history("7", before="včera"))
+    assert error.value.status_code == 400
+
+
+def test_history_pages_do_not_skip_entries_sharing_a_timestamp(server_module, fake_collection, monkeypatch):
+    ts = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    ledger = [
+        {"_id": ObjectId(), "user_id": 7, "guild_id": 1, "source": source, "amount": amount, "ts": ts}
+        for source, amount in (("game", 10), ("quest", 50), ("game", 20))
+    ]
+    ledger.append({"_id": ObjectId(), "user_id": 7, "guild_id": 1, "source": "daily", "amount": 5, "ts": datetime(2024, 1, 1, 11, tzinfo=timezone.utc)})
+    monkeypatch.setattr(server_module, "db", SimpleNamespace(
+        xp_ledger=fake_collection("xp_ledger", ledger), xp_daily_summary=fake_collection("xp_daily_summary")
+    ))
+
+    seen = []
+    before = before_id = None
+    while True:
+        page = asyncio.run(server_module.get_player_history("7", limit=2, before=before, before_id=before_id))
+        if not page:
+            break
+        seen.extend(item["xp_earned"] for item in page)
+        before, before_id = page[-1]["date"], page[-1]["id"]
+
+    assert sorted(seen) == [5, 10, 20, 50]
+    assert seen[-1] == 5
+
+
+def test_history_rejects_malformed_before_id(server_module):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server_module.get_player_history("7", before="2024-01-01T12:00:00+00:00", before_id="x"))
+    assert error.value.status_code == 400